@@ -0,0 +1,126 @@
+"""Ticket attachment archiving: throughput, deduplication and memory while closing tickets.
+
+Seeds `--tickets` ticket channels of 100 messages. 30% of the messages carry an attachment
+drawn from a pool of `--blobs` images of 256 KB to 8 MB, so the same files recur across tickets.
+Transcripts for every ticket then run concurrently against the fake CDN (benchmarks/fake_discord.py):
+  * cold  - empty archive: wall time, MB downloaded and MB stored (duplicates stored once),
+            longest event-loop stall
+  * warm  - the same tickets again with tracemalloc on: everything is a duplicate, and the
+            peak Python heap shows downloads are streamed rather than buffered
+
+Usage: python benchmarks/bench_attachments.py [--tickets 20] [--blobs 40] [--api-latency-ms 0]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-attachments-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["COMMAND_HASH_FILE"] = os.path.join(WORKDIR, "command_hash.json")
+os.environ["ATTACHMENT_ARCHIVE_DIR"] = os.path.join(WORKDIR, "attachments")
+os.environ["METRICS_PORT"] = "0"
+os.environ["TRACE_EXPORT"] = ""
+os.environ["SLOW_CALL_LOG"] = ""
+os.environ["SLOW_CALL_MS"] = "inf"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+GUILD_ID = 1429220984988238000
+MESSAGES_PER_TICKET = 100
+
+
+def archive_bytes() -> int:
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(main.ATTACHMENT_ARCHIVE_DIR):
+        if os.path.basename(dirpath) != "tmp":
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+    return total
+
+
+async def max_loop_stall(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - t - interval)
+    return worst
+
+
+async def close_all(channels, guild):
+    stop = asyncio.Event()
+    stall = asyncio.create_task(max_loop_stall(stop))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(main.send_transcript(channel, guild) for channel in channels))
+    wall = time.perf_counter() - t0
+    stop.set()
+    return wall, await stall
+
+
+async def run(tickets: int, blobs: int, api_latency: float):
+    main.persistence_ready.set()
+    main.outbound.burst = main.outbound.refill = float("inf")
+    fake = FakeDiscord(main.bot, GUILD_ID, main.get_guild_config(GUILD_ID), api_latency=api_latency)
+    await fake.start()
+    rng = random.Random(13)
+    pool = [(f"blob{i:04d}", rng.randint(256 * 1024, 8 * 1024 * 1024)) for i in range(blobs)]
+    category = fake.guild.get_channel(fake.config["ticket_category"])
+    channels, offered = [], 0
+    try:
+        for t in range(tickets):
+            channel = await fake.guild.create_text_channel(name=f"ticket-{t}", category=category)
+            attachments = {}
+            for i in range(MESSAGES_PER_TICKET):
+                if rng.random() < 0.3:
+                    blob, size = rng.choice(pool)
+                    attachments[i] = [fake.attachment_payload(blob, size, f"{blob}.png")]
+                    offered += size
+            fake.seed_history(channel.id, MESSAGES_PER_TICKET, authors=[1, 2], attachments=attachments)
+            channels.append(channel)
+
+        before = asyncio.all_tasks()
+        fake.requests.clear()
+        wall, stall = await close_all(channels, fake.guild)
+        await fake.drain(before)
+        downloads = fake.requests["GET /cdn"]
+        stored = archive_bytes()
+        print(f"{tickets} tickets, {downloads} attachments, {offered / 1e6:.0f} MB offered, pool of {blobs} distinct files")
+        print(f"cold: {wall:.2f}s, {offered / 1e6 / wall:.0f} MB/s, stored {stored / 1e6:.0f} MB "
+              f"({offered / max(1, stored):.1f}x dedup), longest loop stall {stall * 1000:.1f} ms")
+
+        tracemalloc.start()
+        wall, stall = await close_all(channels, fake.guild)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        await fake.drain(before)
+        largest = max(size for _, size in pool)
+        print(f"warm: {wall:.2f}s, stored {archive_bytes() / 1e6:.0f} MB (unchanged), "
+              f"peak heap {peak / 1e6:.1f} MB while downloading (largest file {largest / 1e6:.1f} MB)")
+    finally:
+        await fake.stop()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=20)
+    parser.add_argument("--blobs", type=int, default=40)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="simulated latency per request")
+    args = parser.parse_args()
+    asyncio.run(run(args.tickets, args.blobs, args.api_latency_ms / 1000))
+
+
+if __name__ == "__main__":
+    try:
+        main_bench()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,69 @@
+"""Autocomplete latency on a 100k-entry source: linear substring scan vs. PrefixIndex.
+
+Measures the per-keystroke query (top 25) for typical prefixes, plus incremental add/remove
+and the full rebuild done when persistence loads.
+
+Usage: python benchmarks/bench_autocomplete.py
+"""
+import os
+import random
+import string
+import sys
+import time
+import timeit
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+ENTRIES = 100_000
+QUERIES = ["", "h", "hx", "hx1", "hx12", "zz9", "q"]
+
+
+def linear_scan(options, current: str):
+    """What the per-command handlers used to do on every keystroke."""
+    return [o for o in options if current.lower() in o.lower()][:main.AUTOCOMPLETE_LIMIT]
+
+
+def per_call_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main_bench():
+    rng = random.Random(7)
+    letters = string.ascii_uppercase
+    plates = set()
+    while len(plates) < ENTRIES:
+        plates.add(f"{rng.choice(letters)}{rng.choice(letters)}{rng.randrange(100000):05d}")
+    plates = sorted(plates)
+    rng.shuffle(plates)
+
+    start = time.perf_counter()
+    index = main.PrefixIndex(plates)
+    build = time.perf_counter() - start
+
+    print(f"{'query':8} {'matches':>8} {'scan us':>10} {'index us':>10} {'speedup':>8}")
+    for query in QUERIES:
+        matches = len(index.search(query))
+        scan = per_call_us(lambda: linear_scan(plates, query), 5)
+        indexed = per_call_us(lambda: index.search(query), 2_000)
+        print(f"{query!r:8} {matches:>8} {scan:>10.1f} {indexed:>10.2f} {scan / indexed:>7.0f}x")
+
+    extra = [f"NEW{i:05d}" for i in range(1_000)]
+    start = time.perf_counter()
+    for plate in extra:
+        index.add(plate)
+    add = time.perf_counter() - start
+    start = time.perf_counter()
+    for plate in extra:
+        index.remove(plate)
+    remove = time.perf_counter() - start
+
+    print(f"rebuild     {ENTRIES} entries  {build:.3f}s")
+    print(f"add         {len(extra)} entries  {add / len(extra) * 1e6:.1f} us/entry")
+    print(f"remove      {len(extra)} entries  {remove / len(extra) * 1e6:.1f} us/entry")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,50 @@
+"""Embed construction cost per command: rebuilding from literals vs. cached templates.
+
+"rebuild" calls the template's builder every time (what each command used to do);
+"template" is render_embed() with the command's dynamic values. Both include the
+to_dict() serialisation that discord.py performs when the embed is sent.
+
+Usage: python benchmarks/bench_embeds.py
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+VALUES = {
+    "panel": {},
+    "staff_info_rules": {},
+    "staff_info_channels": {},
+    "staff_info_commands": {},
+    "serverad": {},
+    "comingsoon": {},
+    "prequirements": {"support_channel": main.SUPPORT_CHANNEL_ID},
+    "session_startup": {"host": "<@1234567890>", "goal": 6},
+    "session_reinvites": {},
+    "session_release": {"session_info": main.session_info({"frp": "60", "leo": "Active", "house": "Enabled", "aorp": "Greenville", "peacetime": "Strict"})},
+    "session_end": {"user": "<@1234567890>"},
+    "session_log": {"start": "2026-01-01 20:00:00", "end": "2026-01-01 21:10:00", "total": "1:10:00", "host": "<@1>",
+                    "cohosts": "N/A", "supervisors": "N/A", "notes": "N/A"},
+    "help": {"register": "Yes", "low": "Yes", "staff": "Yes", "high": "No", "ownership": "No", "dev": "No"},
+}
+
+
+def per_call_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main_bench(number: int = 20_000):
+    print(f"{'template':22} {'rebuild us':>11} {'template us':>12} {'speedup':>8}")
+    for name, template in main.embed_templates.items():
+        values = VALUES.get(name, {})
+        rebuild = per_call_us(lambda: template.builder().to_dict(), number)
+        cached = per_call_us(lambda: main.render_embed(name, **values).to_dict(), number)
+        print(f"{name:22} {rebuild:>11.2f} {cached:>12.2f} {rebuild / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,77 @@
+"""Link policy lookup cost as the allow/deny lists grow.
+
+For lists of 10 to 100k domains, measures per host:
+  * linear   - scanning the lists with endswith (what a plain list check costs)
+  * trie     - DomainTrie.match, uncached
+  * cached   - LinkPolicy.verdict for a host seen recently (LRU hit)
+and per message: has_blocked_link on a message carrying three links.
+
+Usage: python benchmarks/bench_links.py
+"""
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-links-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["METRICS_PORT"] = "0"
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+GUILD_ID = 1
+SIZES = (10, 1_000, 10_000, 100_000)
+
+
+def random_domain(rng: random.Random) -> str:
+    label = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+    return f"{label}.{rng.choice(['com', 'net', 'org', 'io', 'gg'])}"
+
+
+def linear_verdict(allow, deny, host):
+    for domain in deny:
+        if host == domain or host.endswith("." + domain):
+            return False
+    for domain in allow:
+        if host == domain or host.endswith("." + domain):
+            return True
+    return None
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def run():
+    rng = random.Random(9)
+    print(f"{'domains':>8} {'linear us':>10} {'trie us':>8} {'cached us':>10} {'message us':>11}")
+    for size in SIZES:
+        domains = list({random_domain(rng) for _ in range(size * 2)})[:size]
+        allow, deny = domains[: size // 2] + ["roblox.com"], domains[size // 2:]
+        settings = main.get_automod_settings(GUILD_ID)
+        settings.update(block_links=True, allow_domains=allow, deny_domains=deny)
+        main._link_policies.pop(GUILD_ID, None)
+        policy = main.link_policy(GUILD_ID)
+        host = "www.unlisted-example.com"
+        text = "clip: https://www.roblox.com/games/1 and https://cdn.unlisted.net/x.png or https://" + deny[-1] + "/p"
+
+        number = max(1, 20_000 // size)
+        linear = per_call_us(lambda: linear_verdict(allow, deny, host), number)
+        trie = per_call_us(lambda: policy.trie.match(host), 200_000)
+        policy.verdict(host)
+        cached = per_call_us(lambda: policy.verdict(host), 200_000)
+        message = per_call_us(lambda: main.has_blocked_link(GUILD_ID, text, settings), 100_000)
+        print(f"{size:>8} {linear:>10.2f} {trie:>8.2f} {cached:>10.2f} {message:>11.2f}")
+
+
+if __name__ == "__main__":
+    try:
+        run()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
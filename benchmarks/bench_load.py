@@ -0,0 +1,199 @@
+"""Offline load test: replay synthetic traffic through the real handlers against a fake Discord.
+
+Scenarios (see benchmarks/fake_discord.py for the gateway/REST stand-in):
+  * automod_flood   - messages through on_message (90% clean, 10% AutoMod violations)
+  * ticket_burst    - panel ticket creation via TicketTypeSelect.callback, dispatched as
+                      INTERACTION_CREATE; latency is until the "ticket created" followup
+  * transcript_10k  - send_transcript on a ticket holding 10,000 messages
+  * vehicle_register- vehicle registration write + vehicle log post
+
+Reports throughput and p50/p99 latency per scenario, plus REST calls per operation.
+`--json results.json` writes the numbers; `--check baseline.json` exits non-zero if
+p99 or throughput regressed by more than `--tolerance` (default 1.5x), for CI.
+
+Usage: python benchmarks/bench_load.py [--scale 1.0] [--api-latency-ms 0] [--json out.json] [--check baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-load-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["COMMAND_HASH_FILE"] = os.path.join(WORKDIR, "command_hash.json")
+os.environ["METRICS_PORT"] = "0"
+os.environ["TRACE_EXPORT"] = ""
+os.environ["SLOW_CALL_LOG"] = ""
+os.environ["SLOW_CALL_MS"] = "inf"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+GUILD_ID = 1429220984988238000
+TICKET_TYPES = ["Moderation Appeal", "Civilian Support", "Member Report", "Support Ticket", "Partnership Request"]
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+async def run_concurrent(jobs, concurrency: int):
+    """Await coroutine factories with bounded concurrency; returns (wall seconds, per-job latencies)."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(job):
+        async with sem:
+            t0 = time.perf_counter()
+            await job()
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(job) for job in jobs))
+    return time.perf_counter() - t0, latencies
+
+
+async def automod_flood(fake: FakeDiscord, count: int):
+    rng = random.Random(7)
+    channel_id = fake.config["support_channel"]
+    civilian = fake.config["civilian_role"]
+    bodies = ["hey is the session up yet?", "anyone want to run a traffic stop", "lol that pursuit was wild",
+              "which aorp are we using today", "brb grabbing food"]
+    jobs = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            content = "join my server discord.gg/abcdef"
+        elif roll < 0.10:
+            content = "WHY IS NOBODY RESPONDING TO MY TICKET"
+        else:
+            content = rng.choice(bodies)
+        message = fake.message(channel_id, 10_000 + rng.randrange(2_000), content, roles=[civilian])
+        jobs.append(lambda m=message: main.on_message(m))
+    return await run_concurrent(jobs, concurrency=64)
+
+
+async def ticket_burst(fake: FakeDiscord, count: int):
+    rng = random.Random(11)
+    panel_channel = fake.config["support_channel"]
+
+    def job(user_id: int):
+        async def create():
+            await fake.select_interaction("hexville:panel:ticket_type", [rng.choice(TICKET_TYPES)], user_id, panel_channel)
+        return create
+
+    return await run_concurrent([job(500_000 + i) for i in range(count)], concurrency=count)
+
+
+async def transcript_export(fake: FakeDiscord, runs: int, size: int = 10_000):
+    category = fake.guild.get_channel(fake.config["ticket_category"])
+    channel = await fake.guild.create_text_channel(name="load-transcript", category=category,
+                                                   topic="ticket_owner:1|type:Support Ticket|status:open")
+    fake.seed_history(channel.id, size, authors=[1, 2, 3, 4])
+    jobs = [lambda: main.send_transcript(channel, fake.guild) for _ in range(runs)]
+    return await run_concurrent(jobs, concurrency=1)
+
+
+async def vehicle_register(fake: FakeDiscord, count: int):
+    members = [fake.add_member(700_000 + i) for i in range(count)]
+
+    def job(i: int):
+        async def register():
+            vehicle = {"year": "2021", "make": "Falcon", "model": "Advance", "color": "Blue",
+                       "plate": f"HX{i:05d}", "state": "Greenville", "usage": "Personal"}
+            await main.db_insert_vehicle(members[i].id, vehicle)
+            await main.db_log_vehicle_action(members[i], "Register", vehicle, fake.guild)
+        return register
+
+    return await run_concurrent([job(i) for i in range(count)], concurrency=32)
+
+
+SCENARIOS = [
+    ("automod_flood", automod_flood, 20_000),
+    ("ticket_burst", ticket_burst, 200),
+    ("transcript_10k", transcript_export, 5),
+    ("vehicle_register", vehicle_register, 1_000),
+]
+
+
+async def run(scale: float, api_latency: float):
+    main.register_persistent_views()
+    main.persistence_ready.set()
+    # The fake API has no rate limits; lift the per-channel pacing so this measures the bot, not the pacing
+    main.outbound.burst = main.outbound.refill = float("inf")
+    fake = FakeDiscord(main.bot, GUILD_ID, main.get_guild_config(GUILD_ID), api_latency=api_latency)
+    await fake.start()
+    results = {}
+    try:
+        for name, scenario, base in SCENARIOS:
+            count = max(1, int(base * scale))
+            fake.requests.clear()
+            before = asyncio.all_tasks()
+            wall, latencies = await scenario(fake, count)
+            await fake.drain(before)  # deferred REST calls count towards the scenario that caused them
+            results[name] = {
+                "ops": len(latencies),
+                "throughput": len(latencies) / wall if wall else 0.0,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "api_calls_per_op": sum(fake.requests.values()) / max(1, len(latencies)),
+            }
+    finally:
+        await fake.stop()
+    return results
+
+
+def check(results, baseline_path: str, tolerance: float) -> int:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = 0
+    for name, base in baseline.items():
+        got = results.get(name)
+        if got is None:
+            continue
+        if got["p99_ms"] > base["p99_ms"] * tolerance:
+            print(f"REGRESSION {name}: p99 {got['p99_ms']:.2f} ms vs baseline {base['p99_ms']:.2f} ms")
+            failures += 1
+        if got["throughput"] < base["throughput"] / tolerance:
+            print(f"REGRESSION {name}: throughput {got['throughput']:.0f}/s vs baseline {base['throughput']:.0f}/s")
+            failures += 1
+    return failures
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's operation count")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="simulated latency per REST call")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--check", help="baseline results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.scale, args.api_latency_ms / 1000))
+    print(f"{'scenario':18} {'ops':>7} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'api/op':>7}")
+    for name, r in results.items():
+        print(f"{name:18} {r['ops']:>7} {r['throughput']:>10.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['api_calls_per_op']:>7.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.check:
+        return 1 if check(results, args.check, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        code = main_bench()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+    sys.exit(code)
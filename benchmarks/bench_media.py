@@ -0,0 +1,170 @@
+"""Media blocklist: lookup cost as the blocklist grows, and hashing cost on and off the event loop.
+
+  * lookup  - for blocklists of 100 to 100k images, per lookup: a linear Hamming-distance scan
+              vs the multi-index hash (main.HammingIndex.nearest), for a near-copy of a listed
+              image and for an unlisted one
+  * hashing - `--images` 1920x1080 PNG screenshots hashed (SHA-256 + dHash) inline on the event
+              loop vs in the worker pool (main.run_in_worker): wall time and longest loop stall
+  * seen    - main.attachment_hashes for an attachment already in the seen cache
+
+Perceptual hashing needs Pillow; without it the hashing rows cover SHA-256 only.
+
+Usage: python benchmarks/bench_media.py [--images 40]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-media-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["COMMAND_HASH_FILE"] = os.path.join(WORKDIR, "command_hash.json")
+os.environ["METRICS_PORT"] = "0"
+os.environ["TRACE_EXPORT"] = ""
+os.environ["SLOW_CALL_LOG"] = ""
+os.environ["SLOW_CALL_MS"] = "inf"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+import workers  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+GUILD_ID = 1429220984988238000
+SIZES = (100, 1_000, 10_000, 100_000)
+
+
+def linear_nearest(entries, value: int, radius: int):
+    best = None
+    for phash, key in entries:
+        distance = (value ^ phash).bit_count()
+        if distance <= radius and (best is None or distance < best[0]):
+            best = (distance, key)
+    return best
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def bench_lookup():
+    rng = random.Random(21)
+    radius = main.MEDIA_PHASH_DISTANCE
+    print(f"{'blocklist':>9} {'linear us':>10} {'index hit us':>13} {'index miss us':>14}")
+    for size in SIZES:
+        entries = [(rng.getrandbits(64), i) for i in range(size)]
+        index = main.HammingIndex()
+        for phash, key in entries:
+            index.add(phash, key)
+        near = entries[size // 2][0] ^ 0b1001  # two bits off a listed image
+        unlisted = rng.getrandbits(64)
+        assert index.nearest(near, radius) == linear_nearest(entries, near, radius)
+        number = max(1, 20_000 // size)
+        linear = per_call_us(lambda: linear_nearest(entries, unlisted, radius), number)
+        hit = per_call_us(lambda: index.nearest(near, radius), 20_000)
+        miss = per_call_us(lambda: index.nearest(unlisted, radius), 20_000)
+        print(f"{size:>9} {linear:>10.1f} {hit:>13.1f} {miss:>14.1f}")
+
+
+def synthetic_image(rng: random.Random) -> bytes:
+    if workers.Image is None:
+        return rng.randbytes(2 * 1024 * 1024)
+    img = workers.Image.new("RGB", (96, 54))
+    img.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(96 * 54)])
+    buf = io.BytesIO()
+    img.resize((1920, 1080), workers.Image.Resampling.BILINEAR).save(buf, "PNG")
+    return buf.getvalue()
+
+
+async def max_loop_stall(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - t - interval)
+    return worst
+
+
+async def timed(work):
+    stop = asyncio.Event()
+    stall = asyncio.create_task(max_loop_stall(stop))
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    await work()
+    wall = time.perf_counter() - t0
+    stop.set()
+    return wall, await stall
+
+
+async def bench_hashing(count: int):
+    rng = random.Random(8)
+    images = [synthetic_image(rng) for _ in range(count)]
+    mb = sum(map(len, images)) / 1e6
+    kind = "PNG screenshots" if workers.Image is not None else "files (Pillow missing: SHA-256 only)"
+    print(f"\n{count} {kind}, {mb:.0f} MB, {main.WORKER_PROCESSES} worker processes")
+
+    async def inline():
+        for data in images:
+            workers.media_hashes(data, True)
+            await asyncio.sleep(0)
+
+    async def pooled():
+        await asyncio.gather(*(main.run_in_worker(workers.media_hashes, data, True) for data in images))
+
+    await pooled()  # start every worker before timing
+    print(f"{'where':8} {'wall s':>7} {'per image ms':>13} {'longest stall ms':>17}")
+    for name, work in (("inline", inline), ("pool", pooled)):
+        wall, stall = await timed(work)
+        print(f"{name:8} {wall:>7.2f} {wall / count * 1000:>13.1f} {stall * 1000:>17.1f}")
+
+
+async def bench_seen():
+    main.persistence_ready.set()
+    fake = FakeDiscord(main.bot, GUILD_ID, main.get_guild_config(GUILD_ID))
+    await fake.start()
+    try:
+        payload = fake.attachment_payload("seenblob", 512 * 1024, "seen.png")
+        message = fake.message(fake.config["support_channel"], 10_001, "", attachments=[payload])
+        attachment = message.attachments[0]
+        t0 = time.perf_counter()
+        await main.attachment_hashes(attachment)
+        cold = time.perf_counter() - t0
+        number = 20_000
+        t0 = time.perf_counter()
+        for _ in range(number):
+            await main.attachment_hashes(attachment)
+        warm = (time.perf_counter() - t0) / number
+        print(f"\nseen cache: first check {cold * 1000:.1f} ms (download + hash), repeat {warm * 1e6:.2f} us")
+    finally:
+        await fake.stop()
+
+
+async def run(images: int):
+    try:
+        await bench_hashing(images)
+        await bench_seen()
+    finally:
+        main.shutdown_workers()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=40)
+    args = parser.parse_args()
+    bench_lookup()
+    asyncio.run(run(args.images))
+
+
+if __name__ == "__main__":
+    try:
+        main_bench()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
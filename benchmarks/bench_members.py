@@ -0,0 +1,142 @@
+"""Member cache modes on a synthetic 100k-member guild: startup cost, memory and lookup latency.
+
+Each MEMBER_CACHE_MODE runs in its own interpreter (the mode is read at import):
+  * startup  - time to build and cache the guild's members from GUILD_MEMBERS_CHUNK payloads
+               (1000 per chunk, as Discord sends them); only "full" chunks at startup
+  * memory   - Python heap held by cached members after startup and after the lookup workload
+               (tracemalloc), plus the process's peak RSS
+  * lookups  - resolve_member() for a skewed set of active members (a few hundred IDs hit
+               most of the time), through the fake REST API when the member is not cached
+
+Usage: python benchmarks/bench_members.py [--members 100000] [--lookups 5000] [--api-latency-ms 0]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUILD_ID = 1429220984988238000
+CHUNK_SIZE = 1000
+MODES = ("full", "lazy", "low")
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+def load_members(fake, count: int):
+    """Feed `count` members to the guild the way startup chunking caches them."""
+    import discord
+    guild, state = fake.guild, fake.state
+    for start in range(0, count, CHUNK_SIZE):
+        payloads = [fake.member_payload(10_000 + i) for i in range(start, min(count, start + CHUNK_SIZE))]
+        for data in payloads:
+            guild._add_member(discord.Member(data=data, guild=guild, state=state))
+
+
+def clear_members(fake):
+    fake.guild._members = {fake.guild.me.id: fake.guild.me}
+    gc.collect()
+
+
+async def child(mode: str, members: int, lookups: int, api_latency: float):
+    import main
+    from fake_discord import FakeDiscord
+
+    chunk = main.bot._connection._chunk_guilds  # FakeDiscord.start() switches startup chunking off
+    fake = FakeDiscord(main.bot, GUILD_ID, main.get_guild_config(GUILD_ID), api_latency=api_latency)
+    await fake.start()
+    result = {"mode": mode}
+    try:
+        startup = 0.0
+        if chunk:
+            t0 = time.perf_counter()
+            load_members(fake, members)
+            startup = time.perf_counter() - t0
+            clear_members(fake)
+        result["startup_s"] = startup
+
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        if chunk:
+            load_members(fake, members)
+        gc.collect()
+        result["startup_mb"] = (tracemalloc.get_traced_memory()[0] - base) / 1e6
+        result["cached"] = len(fake.guild._members)
+
+        rng = random.Random(5)
+        active = [10_000 + rng.randrange(members) for _ in range(500)]
+        targets = [active[min(int(rng.paretovariate(1.2)) - 1, len(active) - 1)] if rng.random() < 0.9
+                   else 10_000 + rng.randrange(members) for _ in range(lookups)]
+        fake.requests.clear()
+        latencies = []
+        for user_id in targets:
+            t0 = time.perf_counter()
+            member = await main.resolve_member(fake.guild, user_id)
+            latencies.append(time.perf_counter() - t0)
+            assert member is not None and member.id == user_id
+        gc.collect()
+        result["after_lookups_mb"] = (tracemalloc.get_traced_memory()[0] - base) / 1e6
+        tracemalloc.stop()
+        result["lookup_p50_us"] = percentile(latencies, 0.50) * 1e6
+        result["lookup_p99_us"] = percentile(latencies, 0.99) * 1e6
+        result["rest_calls"] = sum(fake.requests.values())
+        result["lru_entries"] = len(main.member_lru)
+        result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    finally:
+        await fake.stop()
+    return result
+
+
+def run_mode(mode: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="hexville-members-")
+    env = dict(os.environ, DISCORD_TOKEN="benchmark", MEMBER_CACHE_MODE=mode, METRICS_PORT="0", TRACE_EXPORT="",
+               SLOW_CALL_LOG="", SLOW_CALL_MS="inf", PERSISTENCE_FILE=os.path.join(workdir, "store.json"),
+               COMMAND_HASH_FILE=os.path.join(workdir, "command_hash.json"))
+    try:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--members", str(args.members),
+                              "--lookups", str(args.lookups), "--api-latency-ms", str(args.api_latency_ms)],
+                             cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="simulated latency per REST call")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        print(json.dumps(asyncio.run(child(args.child, args.members, args.lookups, args.api_latency_ms / 1000))))
+        return
+
+    print(f"{args.members} members, {args.lookups} lookups")
+    print(f"{'mode':6} {'startup s':>10} {'cached':>8} {'heap MB':>8} {'+lookups':>9} {'p50 us':>8} {'p99 us':>9} "
+          f"{'REST':>6} {'LRU':>6} {'RSS MB':>7}")
+    for mode in MODES:
+        r = run_mode(mode, args)
+        print(f"{mode:6} {r['startup_s']:>10.2f} {r['cached']:>8} {r['startup_mb']:>8.1f} {r['after_lookups_mb']:>9.1f} "
+              f"{r['lookup_p50_us']:>8.1f} {r['lookup_p99_us']:>9.1f} {r['rest_calls']:>6} {r['lru_entries']:>6} "
+              f"{r['peak_rss_mb']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main_bench()
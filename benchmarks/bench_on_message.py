@@ -0,0 +1,96 @@
+"""Per-message on_message overhead by message kind.
+
+Awaits main.on_message sequentially (no concurrency, no AutoMod violations) for:
+  * exempt_role    - author holds an AutoMod-exempt role (Ownership+)
+  * exempt_channel - channel in the guild's AutoMod exempt list
+  * automod_off    - AutoMod disabled for the guild
+  * rule_chain     - ordinary member in an ordinary channel; the AutoMod rules run
+  * ticket         - ordinary member in a ticket channel (activity is recorded, rules run)
+
+Usage: python benchmarks/bench_on_message.py [--messages 50000]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-onmessage-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["COMMAND_HASH_FILE"] = os.path.join(WORKDIR, "command_hash.json")
+os.environ["METRICS_PORT"] = "0"
+os.environ["TRACE_EXPORT"] = ""
+os.environ["SLOW_CALL_LOG"] = ""
+os.environ["SLOW_CALL_MS"] = "inf"
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+GUILD_ID = 1429220984988238000
+BODY = "anyone want to run a traffic stop near the highway later tonight?"
+
+
+async def per_message_us(messages) -> float:
+    t0 = time.perf_counter()
+    for message in messages:
+        await main.on_message(message)
+    return (time.perf_counter() - t0) / len(messages) * 1e6
+
+
+async def run(count: int):
+    main.persistence_ready.set()
+    fake = FakeDiscord(main.bot, GUILD_ID, main.get_guild_config(GUILD_ID))
+    await fake.start()
+    cfg = fake.config
+    settings = main.get_automod_settings(GUILD_ID)
+    civilian = [cfg["civilian_role"]]
+    general = fake.config["support_channel"]
+    category = fake.guild.get_channel(cfg["ticket_category"])
+    ticket = await fake.guild.create_text_channel(name="ticket-bench", category=category)
+    quiet = await fake.guild.create_text_channel(name="bench-exempt")
+    settings["exempt_channels"] = [quiet.id]
+    main.invalidate_message_plan(GUILD_ID)
+
+    def batch(channel_id, roles):
+        return [fake.message(channel_id, 10_000 + i % 500, BODY, roles=roles) for i in range(count)]
+
+    scenarios = [
+        ("exempt_role", batch(general, [cfg["ownership_role"]])),
+        ("exempt_channel", batch(quiet.id, civilian)),
+        ("rule_chain", batch(general, civilian)),
+        ("ticket", batch(ticket.id, civilian)),
+    ]
+    results = {}
+    try:
+        for name, messages in scenarios:
+            await per_message_us(messages[:1000])  # warm caches
+            results[name] = await per_message_us(messages)
+        settings["enabled"] = False
+        main.invalidate_message_plan(GUILD_ID)
+        results["automod_off"] = await per_message_us(batch(general, civilian))
+    finally:
+        await fake.stop()
+    return results
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50_000)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.messages))
+    print(f"{'message kind':16} {'us/message':>11}")
+    for name, us in results.items():
+        print(f"{name:16} {us:>11.2f}")
+
+
+if __name__ == "__main__":
+    try:
+        main_bench()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,81 @@
+"""Replay synthetic join storms through the raid join-rate detector.
+
+Usage: python benchmarks/bench_raid.py
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def build_traffic(seed: int, baseline_hours: float, storms: int, storm_size: int, storm_seconds: float, young_ratio: float):
+    """Return a time-sorted list of (timestamp, member_id, young, is_storm)."""
+    rng = random.Random(seed)
+    events = []
+    t = 0.0
+    member_id = 1
+    end = baseline_hours * 3600
+    while t < end:
+        t += rng.expovariate(1 / 45)  # ~80 organic joins per hour
+        events.append((t, member_id, rng.random() < 0.1, False))
+        member_id += 1
+    for i in range(storms):
+        start = (i + 1) * end / (storms + 1)
+        for _ in range(storm_size):
+            events.append((start + rng.random() * storm_seconds, member_id, rng.random() < young_ratio, True))
+            member_id += 1
+    events.sort()
+    return events
+
+
+def replay(events):
+    detector = main.JoinRateDetector(main.RAID_JOIN_WINDOW_SECONDS, main.RAID_JOIN_THRESHOLD, main.RAID_YOUNG_JOIN_THRESHOLD)
+    false_trips = 0
+    storm_trips = 0
+    locked_until = -1.0
+    joins_before_trip = []
+    storm_joins_seen = 0
+    in_storm = False
+    start = time.perf_counter()
+    for ts, member_id, young, is_storm in events:
+        tripped = detector.record(1, ts, member_id, young)
+        if is_storm and not in_storm:
+            in_storm, storm_joins_seen = True, 0
+        if is_storm:
+            storm_joins_seen += 1
+        if tripped and ts > locked_until:
+            locked_until = ts + main.RAID_LOCKDOWN_MINUTES * 60
+            if is_storm:
+                storm_trips += 1
+                joins_before_trip.append(storm_joins_seen)
+            else:
+                false_trips += 1
+        if not is_storm:
+            in_storm = False
+    elapsed = time.perf_counter() - start
+    return elapsed, false_trips, storm_trips, joins_before_trip
+
+
+def main_bench():
+    scenarios = [
+        ("bot storm (90% young)", dict(storm_size=500, storm_seconds=10, young_ratio=0.9)),
+        ("mixed storm (30% young)", dict(storm_size=200, storm_seconds=20, young_ratio=0.3)),
+        ("slow drip (100 over 5min)", dict(storm_size=100, storm_seconds=300, young_ratio=0.8)),
+        ("mega storm (50k joins)", dict(storm_size=50_000, storm_seconds=60, young_ratio=0.95)),
+    ]
+    print(f"{'scenario':28} {'joins':>8} {'ns/join':>9} {'storms hit':>10} {'false':>6} {'joins-to-trip':>14}")
+    for name, params in scenarios:
+        events = build_traffic(seed=42, baseline_hours=24, storms=4, **params)
+        elapsed, false_trips, storm_trips, before = replay(events)
+        ns = elapsed / len(events) * 1e9
+        median_before = sorted(before)[len(before) // 2] if before else "-"
+        print(f"{name:28} {len(events):>8} {ns:>9.0f} {f'{storm_trips}/4':>10} {false_trips:>6} {median_before!s:>14}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,133 @@
+"""Event-loop lag while transcripts render.
+
+A sampler sleeps 5 ms in a loop and records how late each wake-up is, while a `--messages`
+transcript (synthetic records, some with attachments) is rendered to HTML:
+  * idle    - no rendering, for reference
+  * inline  - workers.render_transcript called on the event loop
+  * pool    - main.pack_records + main.render_artifact, in the worker processes (as send_transcript does)
+  * burst   - `--jobs` renders at once through main.render_artifact (RENDER_CONCURRENCY run,
+              the rest wait for a slot)
+
+Usage: python benchmarks/bench_render.py [--messages 20000] [--jobs 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-render-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["COMMAND_HASH_FILE"] = os.path.join(WORKDIR, "command_hash.json")
+os.environ["RENDER_DIR"] = os.path.join(WORKDIR, "renders")
+os.environ["METRICS_PORT"] = "0"
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import workers  # noqa: E402
+
+INTERVAL = 0.005
+WORDS = ("traffic", "stop", "highway", "unit", "copy", "responding", "suspect", "vehicle", "plate", "10-4")
+
+
+def synthetic_records(count: int):
+    rng = random.Random(4)
+    records = []
+    for i in range(count):
+        attachments = [(f"evidence{i}.png", f"https://cdn.example/{i}/evidence{i}.png")] if rng.random() < 0.05 else []
+        records.append({
+            "timestamp": f"2026-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+            "author": f"member{i % 7}",
+            "author_id": 10_000 + i % 7,
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30))),
+            "attachments": attachments
+        })
+    return records
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+async def sample_lag(stop: asyncio.Event, lags):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(INTERVAL)
+        lags.append(time.perf_counter() - t - INTERVAL)
+
+
+async def measure(work):
+    stop, lags = asyncio.Event(), []
+    sampler = asyncio.create_task(sample_lag(stop, lags))
+    await asyncio.sleep(INTERVAL * 2)
+    t0 = time.perf_counter()
+    paths = await work()
+    wall = time.perf_counter() - t0
+    stop.set()
+    await sampler
+    for path in paths:
+        os.remove(path)
+    return wall, lags
+
+
+async def run(messages: int, jobs: int):
+    records = synthetic_records(messages)
+    packed = await main.pack_records(records)
+    title = "Transcript — ticket-bench"
+
+    async def render():
+        return await main.render_artifact("transcript", workers.render_transcript, title,
+                                          await main.pack_records(records), main.TRANSCRIPT_INLINE_POSTS)
+
+    async def idle():
+        await asyncio.sleep(1.0)
+        return []
+
+    async def inline():
+        path, _, _ = workers.render_transcript(main.RENDER_DIR, title, packed, main.TRANSCRIPT_INLINE_POSTS)
+        return [path]
+
+    async def pool():
+        path, _, _ = await render()
+        return [path]
+
+    async def burst():
+        results = await asyncio.gather(*(render() for _ in range(jobs)))
+        return [path for path, _, _ in results]
+
+    try:
+        for path in await burst():  # start every worker before timing
+            os.remove(path)
+        path, size, _ = await main.render_artifact("transcript", workers.render_transcript, title, packed, 0)
+        os.remove(path)
+        print(f"{messages} messages, {size / 1e6:.1f} MB of HTML, {main.WORKER_PROCESSES} worker processes, "
+              f"{main.RENDER_CONCURRENCY} render slots")
+        print(f"{'scenario':8} {'wall s':>7} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+        for name, work in (("idle", idle), ("inline", inline), ("pool", pool), (f"burst x{jobs}", burst)):
+            wall, lags = await measure(work)
+            lags = lags or [0.0]
+            print(f"{name:8} {wall:>7.2f} {percentile(lags, 0.5) * 1000:>11.2f} {percentile(lags, 0.99) * 1000:>11.2f} "
+                  f"{max(lags) * 1000:>11.2f}")
+    finally:
+        main.shutdown_workers()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--jobs", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.jobs))
+
+
+if __name__ == "__main__":
+    try:
+        main_bench()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,64 @@
+"""Insert, persist, reload and drain 100k pending jobs through the job scheduler.
+
+Usage: python benchmarks/bench_scheduler.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+JOBS = 100_000
+
+
+def main_bench():
+    main.PERSISTENCE_FILE = ""  # keep the benchmark off disk; request_save() becomes a no-op
+    rng = random.Random(7)
+    now = time.time()
+    sched = main.JobScheduler()
+
+    start = time.perf_counter()
+    job_ids = [
+        sched.schedule("reminder", now + rng.uniform(-3600, 30 * 86400), {"channel_id": 1, "user_id": i, "message": "x"})
+        for i in range(JOBS)
+    ]
+    insert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for job_id in job_ids[::10]:
+        sched.cancel(job_id)
+    cancel = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blob = json.dumps(sched.dump())
+    dump = time.perf_counter() - start
+
+    reloaded = main.JobScheduler()
+    start = time.perf_counter()
+    reloaded.load(json.loads(blob))
+    load = time.perf_counter() - start
+    loaded = len(reloaded.jobs)
+
+    start = time.perf_counter()
+    overdue = reloaded.pop_due(now)
+    catch_up = time.perf_counter() - start
+
+    start = time.perf_counter()
+    drained = len(reloaded.pop_due(now + 31 * 86400))
+    drain = time.perf_counter() - start
+
+    print(f"insert      {JOBS} jobs  {insert:.3f}s  ({insert / JOBS * 1e6:.2f} us/job)")
+    print(f"cancel      {len(job_ids[::10])} jobs  {cancel:.3f}s")
+    print(f"dump        {len(blob) / 1e6:.1f} MB  {dump:.3f}s")
+    print(f"load        {loaded} jobs  {load:.3f}s")
+    print(f"catch-up    {len(overdue)} overdue  {catch_up:.3f}s")
+    print(f"drain       {drained} jobs  {drain:.3f}s  ({drain / max(drained, 1) * 1e6:.2f} us/job)")
+
+
+if __name__ == "__main__":
+    main_bench()
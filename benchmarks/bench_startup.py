@@ -0,0 +1,141 @@
+"""Startup cost: module import, persistence load and setup_hook-to-ready.
+
+Builds a synthetic persistence file (vehicles, infraction ledger, 100k scheduled jobs),
+then measures:
+  * import     - `import main` in a fresh interpreter
+  * load       - reading the persistence file, building the merged vehicle index, applying
+                 the rest, and the longest event-loop stall while the background load runs
+  * ready      - setup_hook returning, persistence ready, command sync (first run
+                 syncs, second run is skipped because the tree hash is unchanged)
+
+Usage: python benchmarks/bench_startup.py
+"""
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="hexville-bench-")
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["PERSISTENCE_FILE"] = os.path.join(WORKDIR, "store.json")
+os.environ["COMMAND_HASH_FILE"] = os.path.join(WORKDIR, "command_hash.json")
+sys.path.insert(0, ROOT)
+
+SYNC_LATENCY = 0.8  # simulated bot.tree.sync() round trip
+
+
+def write_store(path: str, users: int = 20_000, jobs: int = 100_000, infractions: int = 10_000):
+    rng = random.Random(3)
+    now = time.time()
+    vehicles = {
+        str(uid): [
+            {"year": "2020", "make": "Falcon", "model": "Advance", "color": "Red", "plate": f"HX{uid:05d}{n}",
+             "state": "Greenville", "usage": "Personal", "registered_at": "2026-01-01T00:00:00"}
+            for n in range(2)
+        ]
+        for uid in range(users)
+    }
+    ledger = {}
+    for i in range(infractions):
+        uid = rng.randrange(users)
+        issued = now - rng.uniform(0, 40 * 86400)
+        ledger.setdefault(str(uid), []).append({
+            "id": i + 1, "level": 1, "reason": "r", "proof": "p", "by": 1,
+            "issued_at": issued, "expires_at": issued + 30 * 86400, "active": issued + 30 * 86400 > now
+        })
+    scheduled = [
+        {"id": f"reminder:{i}", "kind": "reminder", "run_at": now + rng.uniform(-600, 30 * 86400),
+         "payload": {"channel_id": 1, "user_id": i, "message": "x"}}
+        for i in range(jobs)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"vehicle_store": vehicles, "unregister_uses": {}, "infraction_ledger": ledger,
+                   "scheduled_jobs": scheduled}, f)
+    return os.path.getsize(path)
+
+
+def bench_import(runs: int = 5) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=os.environ.copy(),
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return sorted(samples)[len(samples) // 2]
+
+
+async def max_loop_stall(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - t - interval)
+    return worst
+
+
+async def bench_ready(main):
+    calls = []
+
+    async def fake_sync(guild=None):
+        calls.append(guild)
+        await asyncio.sleep(SYNC_LATENCY)
+        return []
+
+    main.bot.tree.sync = fake_sync
+    results = []
+    for attempt in ("first boot", "restart"):
+        main.persistence_ready.clear()
+        main.vehicle_store.clear()
+        main.infraction_ledger.clear()
+        main.scheduler.jobs.clear()
+        before = len(calls)
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(max_loop_stall(stop))
+        t0 = time.perf_counter()
+        await main.bot.setup_hook()
+        hook = time.perf_counter() - t0
+        await main.persistence_ready.wait()
+        ready = time.perf_counter() - t0
+        await asyncio.gather(*main._background_tasks)
+        settled = time.perf_counter() - t0
+        stop.set()
+        stall = await watcher
+        results.append((attempt, hook, ready, settled, stall, len(calls) - before))
+    return results
+
+
+def main_bench():
+    size = write_store(os.environ["PERSISTENCE_FILE"])
+    print(f"synthetic store: {size / 1e6:.1f} MB")
+    print(f"import main:         {bench_import() * 1000:8.1f} ms (median of 5, fresh interpreter)")
+
+    import main
+    t0 = time.perf_counter()
+    data = main.read_persistence()
+    read = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    vehicles = main.merge_vehicle_store(data.get("vehicle_store", {}))
+    merge = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    main.apply_persistence(data, vehicles)
+    apply = time.perf_counter() - t0
+    print(f"read persistence:    {read * 1000:8.1f} ms (off-loop in setup_hook)")
+    print(f"vehicle index:       {merge * 1000:8.1f} ms (off-loop in setup_hook)")
+    print(f"apply persistence:   {apply * 1000:8.1f} ms (on-loop merge)")
+
+    for attempt, hook, ready, settled, stall, syncs in asyncio.run(bench_ready(main)):
+        print(f"{attempt:10} setup_hook {hook * 1000:6.1f} ms | persistence ready {ready * 1000:7.1f} ms | "
+              f"background settled {settled * 1000:7.1f} ms | max loop stall {stall * 1000:6.1f} ms | syncs {syncs}")
+
+
+if __name__ == "__main__":
+    try:
+        main_bench()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,292 @@
+"""In-process stand-in for Discord, for offline load tests.
+
+* REST: a local aiohttp server that discord.py's HTTP client is pointed at (Route.BASE),
+  answering the endpoints the bot uses with realistic payloads. Every request is
+  counted per route, and an optional per-request latency simulates the real API.
+* CDN: attachment URLs point at the same server and stream deterministic bytes per blob.
+* Gateway: builds guild, member, message and interaction payloads and feeds them to
+  the bot's real ConnectionState, the same way the websocket would. discord.py
+  therefore parses real models and routes component interactions through its view
+  store, and channel creates/updates/deletes made over REST are echoed back as
+  gateway events so the caches behave like production.
+
+Nothing here touches the network beyond 127.0.0.1.
+"""
+import asyncio
+import bisect
+import itertools
+import json
+import time
+from collections import Counter as CounterDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import discord
+from aiohttp import web
+
+APP_ID = 900000000000000001
+BOT_USER_ID = 900000000000000002
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _json(data: Any) -> web.Response:
+    # discord.py only parses bodies whose Content-Type is exactly application/json (no charset)
+    return web.Response(body=json.dumps(data).encode(), content_type="application/json")
+
+
+class FakeDiscord:
+    def __init__(self, bot: discord.Client, guild_id: int, config: Dict[str, int], api_latency: float = 0.0):
+        self.bot = bot
+        self.state = bot._connection
+        self.guild_id = guild_id
+        self.config = config
+        self.api_latency = api_latency
+        self.requests: CounterDict = CounterDict()
+        self.histories: Dict[int, List[Dict[str, Any]]] = {}
+        self._history_ids: Dict[int, List[int]] = {}
+        self.followups: Dict[str, asyncio.Future] = {}
+        self.blobs: Dict[str, int] = {}  # CDN blob name -> size in bytes
+        self.cdn_base = ""
+        self._ids = itertools.count(1_000_000_000_000_000_000)
+        self._runner: Optional[web.AppRunner] = None
+        self.guild: Optional[discord.Guild] = None
+
+    # ---------- lifecycle ----------
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/api/v10/{path:.*}", self._handle)
+        app.router.add_get("/cdn/{blob}/{name}", self._cdn)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        discord.http.Route.BASE = f"http://127.0.0.1:{port}/api/v10"
+        self.cdn_base = f"http://127.0.0.1:{port}/cdn"
+
+        self.state._chunk_guilds = False
+        await self.bot._async_setup_hook()  # binds the running loop, as login() does; events can then be dispatched
+        data = await self.bot.http.static_login("benchmark")
+        self.state.user = discord.ClientUser(state=self.state, data=data)
+        self.state.application_id = APP_ID
+        self.guild = self.state._add_guild_from_data(self.guild_payload())
+        self.requests.clear()
+
+    async def stop(self):
+        await self.bot.http.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    @staticmethod
+    async def drain(before: set):
+        """Wait for tasks the bot spawned since `before` (e.g. delete_after timers), ignoring
+        the fake server's own connection handlers."""
+        while True:
+            pending = [
+                t for t in asyncio.all_tasks() - before
+                if t is not asyncio.current_task() and not t.get_coro().__qualname__.startswith("RequestHandler")
+            ]
+            if not pending:
+                return
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    # ---------- payload builders ----------
+    def user_payload(self, user_id: int, name: Optional[str] = None, bot: bool = False) -> Dict[str, Any]:
+        return {"id": str(user_id), "username": name or f"user{user_id % 100000}", "discriminator": "0",
+                "global_name": None, "avatar": None, "bot": bot}
+
+    def member_payload(self, user_id: int, roles: List[int] = ()) -> Dict[str, Any]:
+        return {"user": self.user_payload(user_id), "roles": [str(r) for r in roles], "joined_at": EPOCH.isoformat(),
+                "deaf": False, "mute": False, "flags": 0, "permissions": "0"}
+
+    def channel_payload(self, channel_id: int, name: str, kind: int = 0, parent_id: Optional[int] = None,
+                        topic: Optional[str] = None) -> Dict[str, Any]:
+        return {"id": str(channel_id), "type": kind, "guild_id": str(self.guild_id), "name": name, "position": 0,
+                "parent_id": str(parent_id) if parent_id else None, "topic": topic, "nsfw": False,
+                "permission_overwrites": [], "rate_limit_per_user": 0, "last_message_id": None}
+
+    def guild_payload(self) -> Dict[str, Any]:
+        cfg = self.config
+        role_keys = [k for k in cfg if k.endswith("_role")]
+        roles = [{"id": str(self.guild_id), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                  "hoist": False, "managed": False, "mentionable": False}]
+        roles += [{"id": str(cfg[k]), "name": k, "permissions": "0", "position": i + 1, "color": 0, "hoist": False,
+                   "managed": False, "mentionable": True} for i, k in enumerate(role_keys)]
+        channels = [self.channel_payload(cfg["ticket_category"], "tickets", kind=4)]
+        channels += [self.channel_payload(cfg[k], k) for k in cfg if k.endswith("_channel")]
+        return {"id": str(self.guild_id), "name": "HexVille Bench", "owner_id": "1", "roles": roles, "emojis": [],
+                "stickers": [], "features": [], "channels": channels, "threads": [],
+                "members": [self.member_payload(BOT_USER_ID)], "member_count": 1, "large": False,
+                "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0,
+                "mfa_level": 0, "premium_tier": 0, "nsfw_level": 0, "preferred_locale": "en-US",
+                "system_channel_flags": 0, "afk_timeout": 300}
+
+    def attachment_payload(self, blob: str, size: int, filename: str = "evidence.png") -> Dict[str, Any]:
+        """An attachment whose URL streams `size` bytes of `blob` from the fake CDN; equal blobs have equal bytes."""
+        self.blobs[blob] = size
+        url = f"{self.cdn_base}/{blob}/{filename}"
+        return {"id": str(self.next_id()), "filename": filename, "size": size, "url": url, "proxy_url": url}
+
+    def message_payload(self, channel_id: int, author_id: int, content: str = "", embeds: List[Any] = (),
+                        created: Optional[datetime] = None, message_id: Optional[int] = None,
+                        member_roles: Optional[List[int]] = None, attachments: List[Any] = ()) -> Dict[str, Any]:
+        data = {"id": str(message_id or self.next_id()), "channel_id": str(channel_id), "guild_id": str(self.guild_id),
+                "author": self.user_payload(author_id, bot=author_id == BOT_USER_ID), "content": content,
+                "timestamp": (created or datetime.now(timezone.utc)).isoformat(), "edited_timestamp": None,
+                "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+                "attachments": list(attachments),
+                "embeds": list(embeds), "pinned": False, "type": 0, "flags": 0, "components": []}
+        if member_roles is not None:
+            data["member"] = {k: v for k, v in self.member_payload(author_id, member_roles).items() if k != "user"}
+        return data
+
+    # ---------- gateway side ----------
+    def add_member(self, user_id: int, roles: List[int] = ()) -> discord.Member:
+        member = discord.Member(data=self.member_payload(user_id, roles), guild=self.guild, state=self.state)
+        self.guild._add_member(member)
+        return member
+
+    def message(self, channel_id: int, author_id: int, content: str, roles: List[int] = (),
+                attachments: List[Any] = ()) -> discord.Message:
+        """A MESSAGE_CREATE as discord.py would build it (the caller awaits on_message itself)."""
+        data = self.message_payload(channel_id, author_id, content, member_roles=list(roles), attachments=attachments)
+        channel = self.guild.get_channel(channel_id)
+        return discord.Message(state=self.state, channel=channel, data=data)
+
+    def select_interaction(self, custom_id: str, values: List[str], user_id: int, channel_id: int,
+                           roles: List[int] = ()) -> asyncio.Future:
+        """Dispatch an INTERACTION_CREATE for a string select; resolves when the bot's first followup arrives."""
+        token = f"tok{self.next_id()}"
+        message = self.message_payload(channel_id, BOT_USER_ID, "")
+        data = {"id": str(self.next_id()), "application_id": str(APP_ID), "type": 3, "token": token, "version": 1,
+                "guild_id": str(self.guild_id), "channel_id": str(channel_id),
+                "channel": {"id": str(channel_id), "type": 0}, "member": self.member_payload(user_id, roles),
+                "data": {"custom_id": custom_id, "component_type": 3, "values": values}, "message": message,
+                "locale": "en-US", "guild_locale": "en-US", "app_permissions": "0", "entitlements": [],
+                "authorizing_integration_owners": {}, "context": 0, "attachment_size_limit": 10 * 1024 * 1024}
+        done = self.followups[token] = asyncio.get_running_loop().create_future()
+        self.state.parse_interaction_create(data)
+        return done
+
+    def seed_history(self, channel_id: int, count: int, authors: List[int],
+                     attachments: Optional[Dict[int, List[Dict[str, Any]]]] = None):
+        """Fill a channel with `count` messages, oldest first, served by GET /channels/{id}/messages.
+        `attachments` maps a message index to its attachment payloads."""
+        start = datetime.now(timezone.utc) - timedelta(seconds=count)
+        attachments = attachments or {}
+        self.histories[channel_id] = [
+            self.message_payload(channel_id, authors[i % len(authors)], f"message {i} " + "lorem ipsum " * (i % 8),
+                                 created=start + timedelta(seconds=i), attachments=attachments.get(i, ()))
+            for i in range(count)
+        ]
+        self._history_ids[channel_id] = [int(m["id"]) for m in self.histories[channel_id]]
+
+    # ---------- REST side ----------
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        parts = request.match_info["path"].split("/")
+        method = request.method
+        shape = "/".join(p if not p.isdigit() and not p.startswith("tok") else "{id}" for p in parts)
+        self.requests[f"{method} /{shape}"] += 1
+        body = await self._body(request)
+
+        if parts == ["users", "@me"]:
+            return _json(self.user_payload(BOT_USER_ID, "HexVille", bot=True))
+        if parts[0] == "interactions":
+            kind = body.get("type", 4)
+            return _json({"interaction": {"id": parts[1], "type": 3},
+                                      "resource": {"type": kind}})
+        if parts[0] == "webhooks":
+            future = self.followups.pop(parts[2], None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+            if method == "POST":
+                return _json(self.message_payload(0, BOT_USER_ID, body.get("content") or "",
+                                                              body.get("embeds") or []))
+            return _json({})
+        if parts[0] == "guilds" and len(parts) == 4 and parts[2] == "members":
+            member = self.guild.get_member(int(parts[3]))
+            roles = body.get("roles") if "roles" in body else [str(r) for r in (member._roles if member else ())]
+            payload = self.member_payload(int(parts[3]), [int(r) for r in roles])
+            if method == "PATCH":
+                self.state.parse_guild_member_update({**payload, "guild_id": str(self.guild_id)})
+            return _json(payload)
+        if parts[0] == "guilds" and parts[2:] == ["channels"] and method == "POST":
+            payload = self.channel_payload(self.next_id(), body["name"], body.get("type", 0),
+                                           int(body["parent_id"]) if body.get("parent_id") else None, body.get("topic"))
+            payload["permission_overwrites"] = body.get("permission_overwrites", [])
+            self.state.parse_channel_create(payload)
+            return _json(payload)
+        if parts[0] == "channels":
+            channel_id = int(parts[1])
+            if len(parts) == 2:
+                channel = self.guild.get_channel(channel_id)
+                payload = self.channel_payload(channel_id, getattr(channel, "name", "channel"), 0,
+                                               getattr(channel, "category_id", None), getattr(channel, "topic", None))
+                if method == "PATCH":
+                    payload.update({k: v for k, v in body.items() if k in ("name", "topic")})
+                    self.state.parse_channel_update(payload)
+                elif method == "DELETE":
+                    self.histories.pop(channel_id, None)
+                    self._history_ids.pop(channel_id, None)
+                    self.state.parse_channel_delete(payload)
+                return _json(payload)
+            if parts[2] == "messages" and len(parts) == 3:
+                if method == "GET":
+                    return _json(self._history_page(channel_id, request.query))
+                return _json(self.message_payload(channel_id, BOT_USER_ID, body.get("content") or "",
+                                                              body.get("embeds") or []))
+            if parts[2] == "messages" and method == "DELETE":
+                return web.Response(status=204)
+            if parts[2] == "messages":
+                return _json(self.message_payload(channel_id, BOT_USER_ID, body.get("content") or "",
+                                                              body.get("embeds") or [], message_id=int(parts[3])))
+        return _json({})
+
+    async def _cdn(self, request: web.Request) -> web.StreamResponse:
+        blob = request.match_info["blob"]
+        size = self.blobs.get(blob)
+        if size is None:
+            raise web.HTTPNotFound()
+        self.requests["GET /cdn"] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        block = (blob.encode() * (65536 // len(blob) + 1))[:65536]
+        resp = web.StreamResponse(headers={"Content-Type": "application/octet-stream", "Content-Length": str(size)})
+        await resp.prepare(request)
+        for offset in range(0, size, len(block)):
+            await resp.write(block[:size - offset])
+        await resp.write_eof()
+        return resp
+
+    @staticmethod
+    async def _body(request: web.Request) -> Dict[str, Any]:
+        if not request.can_read_body:
+            return {}
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            raw = form.get("payload_json")
+            return json.loads(raw) if isinstance(raw, str) else {}
+        try:
+            return await request.json()
+        except Exception:
+            return {}
+
+    def _history_page(self, channel_id: int, query) -> List[Dict[str, Any]]:
+        """Discord semantics: newest first; `after` returns the oldest `limit` newer messages."""
+        history = self.histories.get(channel_id, [])
+        ids = self._history_ids.get(channel_id, [])
+        limit = int(query.get("limit", 50))
+        if "after" in query:
+            start = bisect.bisect_right(ids, int(query["after"]))
+            page = history[start:start + limit]
+        elif "before" in query:
+            end = bisect.bisect_left(ids, int(query["before"]))
+            page = history[max(0, end - limit):end]
+        else:
+            page = history[-limit:]
+        return page[::-1]
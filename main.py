@@ -1,19 +1,39 @@
 # merged_main_no_db.py
 import os
 import asyncio
+import bisect
+import concurrent.futures
+import contextvars
+import csv
 import io
+import logging
+import mimetypes
+import multiprocessing
+import pickle
+import random
 import re
-from datetime import datetime, timedelta
+import string
+import tempfile
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
 import functools
+import hashlib
+import heapq
+import itertools
 import json
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 import discord
 import aiohttp
+from aiohttp import web
 from discord.ext import commands
 from discord import app_commands, ui
 from dotenv import load_dotenv
 
+import workers
+
 # ================== LOAD ENV ==================
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
@@ -23,6 +43,22 @@ if not TOKEN:
 # For instant command registration during development, set TEST_GUILD_ID in env
 TEST_GUILD_ID = os.getenv("TEST_GUILD_ID")  # optional, string of guild id
 
+# Command sync only happens when the command tree's hash differs from the one stored here
+COMMAND_HASH_FILE = os.getenv("COMMAND_HASH_FILE", ".command_tree_hash")
+
+# Set AUTOSHARD=1 to run as an AutoShardedBot (optionally pin SHARD_COUNT)
+AUTOSHARD = os.getenv("AUTOSHARD", "").lower() in ("1", "true", "yes")
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+
+# MEMBER_CACHE_MODE: "full" chunks every guild at startup and caches all members;
+# "lazy" caches members as they show up (joins, updates) and requests the rest on demand;
+# "low" keeps no member cache and resolves members on demand through a small TTL'd LRU
+MEMBER_CACHE_MODE = os.getenv("MEMBER_CACHE_MODE", "full").lower()
+if MEMBER_CACHE_MODE not in ("full", "lazy", "low"):
+    raise RuntimeError("MEMBER_CACHE_MODE must be one of: full, lazy, low")
+MEMBER_LRU_SIZE = int(os.getenv("MEMBER_LRU_SIZE", "5000"))
+MEMBER_LRU_TTL = float(os.getenv("MEMBER_LRU_TTL", "600"))  # seconds before a resolved member is fetched again
+
 # ================== CONSTANTS ==================
 BOT_COLOR = discord.Color.from_str("#8fd6ff")
 
@@ -38,11 +74,17 @@ VEHICLE_LOG_CHANNEL_ID = 1456813290381643806
 SUPPORT_CHANNEL_ID = 1429227915526017054
 MUTE_HINT_CHANNEL_ID = 1429220984988238007
 MUTE_GIF_URL = "https://media.tenor.com/j0RsjzrynisAAAAd/discord.gif"
+MUTE_HINT_COOLDOWN_SECONDS = 600     # at most one mute hint per channel this often
+MUTE_HINT_SCROLL_MESSAGES = 25       # ...and only once the last one has scrolled out of view
+MUTE_HINT_DEBOUNCE_SECONDS = 3       # post after the burst that triggered it, not in the middle
 STAFF_INFO_CHANNEL_ID = 1454611781887459409
 
 # Ticket system
 TICKET_CATEGORY_ID = 1459706908075233331
 ticket_counter = 0
+TICKET_IDLE_WARN_HOURS = 20          # inactive tickets get a warning after this long
+TICKET_IDLE_CLOSE_HOURS = 24         # ...and are closed after this long (matches the ticket embed)
+TICKET_SWEEP_MINUTES = 15
 
 # ================== ROLE IDS ==================
 ADMIN_ROLE_ID = 1459341992525037835
@@ -54,6 +96,7 @@ DEVELOPER_USER_ID = 1239226604782354533
 INFRACT_1_ROLE_ID = 1457484364593238037
 INFRACT_2_ROLE_ID = 1457484411485556756
 INFRACT_3_ROLE_ID = 1457484458218356931
+INFRACT_ROLE_IDS = (INFRACT_1_ROLE_ID, INFRACT_2_ROLE_ID, INFRACT_3_ROLE_ID)  # index = level - 1
 
 # Session-related
 CIVILIAN_ROLE_ID = 1429222424393683074
@@ -85,10 +128,68 @@ STAFF_ROLE_IDS = {
     1431352511931093052
 }
 
+# Infraction decay
+INFRACTION_EXPIRY_DAYS = 30          # session warnings stop counting after this long
+INFRACTION_DECAY_MINUTES = 10        # how often expired warnings are swept
+INFRACTION_DECAY_BATCH = 10          # concurrent role edits per decay batch
+
+# ================== RAID DETECTION ==================
+RAID_JOIN_WINDOW_SECONDS = 30        # sliding window for the join-rate check
+RAID_JOIN_THRESHOLD = 10             # joins inside the window that trip lockdown
+RAID_YOUNG_JOIN_THRESHOLD = 5        # young-account joins inside the window that trip lockdown
+RAID_YOUNG_ACCOUNT_DAYS = 7          # accounts newer than this count as "young"
+RAID_LOCKDOWN_MINUTES = 15           # lockdown lifts this long after the last trip
+RAID_BATCH_SIZE = 5                  # concurrent API calls per lockdown/quarantine batch
+RAID_BATCH_DELAY = 1.0               # seconds between batches
+RAID_QUARANTINE_FLUSH_SECONDS = 3    # joiners are quarantined in batches on this cadence
+RAID_QUARANTINE_ROLE_ID = INVESTIGATION_ROLE_ID
+RAID_AUTOMOD_OVERRIDES = {
+    "enabled": True,
+    "block_invites": True,
+    "block_links": True,
+    "max_mentions": 2,
+    "max_caps_percent": 50,
+    "max_caps_min": 8
+}
+
+# ================== PER-GUILD CONFIG ==================
+# The IDs above are HexVille's; they are the defaults for every guild.
+# Partner guilds override individual keys with /guildconfig.
+GUILD_CONFIG_DEFAULTS: Dict[str, int] = {
+    "action_log_channel": ACTION_LOG_CHANNEL,
+    "session_log_channel": SESSION_LOG_CHANNEL_ID,
+    "vehicle_log_channel": VEHICLE_LOG_CHANNEL_ID,
+    "welcome_channel": WELCOME_CHANNEL_ID,
+    "support_channel": SUPPORT_CHANNEL_ID,
+    "mute_hint_channel": MUTE_HINT_CHANNEL_ID,
+    "staff_info_channel": STAFF_INFO_CHANNEL_ID,
+    "ticket_category": TICKET_CATEGORY_ID,
+    "admin_role": ADMIN_ROLE_ID,
+    "highcommand_role": HIGHCOMMAND_ROLE_ID,
+    "ownership_role": OWNERSHIP_ROLE_ID,
+    "staff_team_role": STAFF_TEAM_ROLE_ID,
+    "civilian_role": CIVILIAN_ROLE_ID,
+    "vip_vehicle_role": VIP_VEHICLE_ROLE_ID,
+    "quarantine_role": RAID_QUARANTINE_ROLE_ID,
+    "civilian_suspension_role": CIVILIAN_SUSPENSION_ROLE,
+    "staff_suspension_role": STAFF_SUSPENSION_ROLE_ID,
+    "staff_blacklist_role": STAFF_BLACKLIST_ROLE,
+    "staff_strike_1_role": STAFF_STRIKE_1,
+    "staff_strike_2_role": STAFF_STRIKE_2,
+    "staff_strike_3_role": STAFF_STRIKE_3,
+    "infract_1_role": INFRACT_1_ROLE_ID,
+    "infract_2_role": INFRACT_2_ROLE_ID,
+    "infract_3_role": INFRACT_3_ROLE_ID
+}
+
 # ================== STORAGE (IN-MEMORY) ==================
 sessions: Dict[int, Dict[str, Any]] = {}
 staff_strikes: Dict[int, int] = {}
-civilian_infractions: Dict[int, int] = {}
+civilian_infractions: Dict[int, int] = {}  # active (non-expired) session warnings per user
+infraction_ledger: Dict[int, List[Dict[str, Any]]] = {}  # user_id -> warnings, oldest first
+_infraction_expiry: List[Tuple[float, int, int]] = []  # heap of (expires_at, user_id, infraction_id)
+_infractions_by_id: Dict[int, Dict[str, Any]] = {}
+infraction_counter = 0
 notes_store: Dict[int, List[Dict[str, Any]]] = {}
 history_store: Dict[int, List[Dict[str, Any]]] = {}
 appeals_store: Dict[int, List[Dict[str, Any]]] = {}
@@ -97,9 +198,20 @@ session_log: Dict[int, Dict[str, Any]] = {}
 vehicle_store: Dict[int, List[Dict[str, Any]]] = {}
 unregister_uses: Dict[int, int] = {}
 _mute_gif_bytes: Optional[bytes] = None
+_mute_gif_cdn: Optional[Tuple[str, float]] = None  # (CDN url of the uploaded GIF, expiry)
+mute_hint_state: Dict[int, Dict[str, Any]] = {}  # channel_id -> {"last_at", "since", "pending"}
 automod_settings: Dict[int, Dict[str, Any]] = {}
+media_blocklist: Dict[int, Dict[str, Dict[str, Any]]] = {}  # guild_id -> sha256 -> {"phash", "label", "by", ...}
+raid_state: Dict[int, Dict[str, Any]] = {}
+guild_config_overrides: Dict[int, Dict[str, int]] = {}
+_guild_configs: Dict[int, Dict[str, int]] = {}  # merged defaults + overrides, built once per guild
+ticket_activity: "OrderedDict[int, float]" = OrderedDict()  # channel_id -> last activity, oldest first
+ticket_warned: Dict[int, int] = {}  # channel_id -> id of the inactivity warning message
 
 PERSISTENCE_FILE = os.getenv("PERSISTENCE_FILE", "vehicle_store.json")
+PERSISTENCE_LOAD_BATCH = 1000  # entries per store unpickled between loop yields on load
+persistence_ready = asyncio.Event()  # set once the background load in setup_hook has finished
+_background_tasks: set = set()
 
 # ================== EMOJIS ==================
 CHECKMARK = "<:checkmark:1455689105559130152>"
@@ -119,80 +231,1224 @@ AORP_OPTIONS = ["Greenville", "Highway", "Brookmere", "Horton"]
 HOUSE_OPTIONS = ["Enabled", "Disabled"]
 PEACETIME_OPTIONS = ["Normal", "Strict", "Off"]
 
+# ================== METRICS ==================
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 disables the endpoint
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AUTOMOD_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+def _label_str(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    # Metrics are only touched from the event loop thread, so plain dict updates need no locks
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values: Dict[Tuple[Any, ...], float] = {} if labels else {(): 0}
+
+    def inc(self, *label_values: Any, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_str(self.labels, k)} {v}" for k, v in self.values.items()]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self.values: Dict[Tuple[Any, ...], List[float]] = {}  # per-bucket counts + [+Inf, sum]
+
+    def observe(self, value: float, *label_values: Any):
+        counts = self.values.get(label_values)
+        if counts is None:
+            counts = self.values[label_values] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts in self.values.items():
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {running}")
+            running += counts[-2]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {running}")
+        return lines
+
+class Gauge:
+    """Evaluated at scrape time; `fn` returns a number or {label_value: number}."""
+
+    def __init__(self, name: str, help_text: str, fn, label: str = ""):
+        self.name, self.help, self.fn, self.label = name, help_text, fn, label
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            lines += [f'{self.name}{{{self.label}="{k}"}} {v}' for k, v in value.items()]
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, fn, label: str = "") -> Gauge:
+        metric = Gauge(name, help_text, fn, label)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+COMMAND_SECONDS = metrics.histogram("hexville_command_seconds", "Slash command handler latency", ("command",))
+COMMAND_ERRORS = metrics.counter("hexville_command_errors_total", "Slash commands that raised", ("command",))
+API_SECONDS = metrics.histogram("hexville_discord_api_seconds", "Discord REST call latency by route", ("route",))
+API_429 = metrics.counter("hexville_discord_429_total", "Discord REST responses with status 429", ("route",))
+RATELIMIT_HITS = metrics.counter("hexville_ratelimit_hits_total", "Rate-limit warnings logged by discord.http")
+AUTOMOD_SECONDS = metrics.histogram("hexville_automod_seconds", "AutoMod rule evaluation time per message", buckets=AUTOMOD_BUCKETS)
+AUTOMOD_ACTIONS = metrics.counter("hexville_automod_actions_total", "Messages removed by AutoMod", ("reason",))
+ATTACHMENTS_ARCHIVED = metrics.counter("hexville_attachments_archived_total", "Ticket attachments by archive outcome", ("result",))
+MEDIA_CHECKS_SKIPPED = metrics.counter("hexville_media_checks_skipped_total", "Attachments not checked against the media blocklist", ("reason",))
+RENDER_SECONDS = metrics.histogram("hexville_render_seconds", "Artifact render time in worker processes, including queueing", ("kind",))
+
+_ID_RE = re.compile(r"/\d{15,21}")
+_TOKEN_RE = re.compile(r"^(/(?:webhooks|interactions)/\{id\})/[^/]+")
+
+def api_route_label(method: str, path: str) -> str:
+    if path.startswith("/api/v"):
+        path = "/" + path.split("/", 3)[-1]
+    path = _TOKEN_RE.sub(r"\1/{token}", _ID_RE.sub("/{id}", path))
+    if path.startswith("/interactions/") and path.endswith("/callback"):
+        return "interaction_callback"  # defer / send_message / send_modal
+    if path.startswith("/webhooks/{id}/{token}"):
+        return "interaction_followup"  # followup.send / edit_original_response
+    return f"{method} {path}"
+
+async def _trace_request_start(session, ctx, params):
+    ctx.started = time.perf_counter()
+
+async def _trace_request_end(session, ctx, params):
+    route = api_route_label(params.method, params.url.path)
+    API_SECONDS.observe(time.perf_counter() - ctx.started, route)
+    if params.response.status == 429:
+        API_429.inc(route)
+
+http_trace = aiohttp.TraceConfig()
+http_trace.on_request_start.append(_trace_request_start)
+http_trace.on_request_end.append(_trace_request_end)
+
+class _RateLimitLogCounter(logging.Handler):
+    def emit(self, record: logging.LogRecord):
+        if isinstance(record.msg, str) and "rate limit" in record.msg.lower():
+            RATELIMIT_HITS.inc()
+
+_ratelimit_log_counter = _RateLimitLogCounter(level=logging.WARNING)
+logging.getLogger("discord.http").addHandler(_ratelimit_log_counter)
+
+metrics.gauge(
+    "hexville_gateway_latency_seconds", "Gateway heartbeat latency per shard",
+    lambda: dict(getattr(bot, "latencies", None) or [(0, bot.latency)]), label="shard"
+)
+metrics.gauge(
+    "hexville_store_entries", "Keys held by each in-memory store",
+    lambda: {
+        "history_store": len(history_store),
+        "vehicle_store": len(vehicle_store),
+        "sessions": len(sessions),
+        "session_log": len(session_log),
+        "notes_store": len(notes_store),
+        "appeals_store": len(appeals_store),
+        "media_blocklist": sum(len(v) for v in media_blocklist.values()),
+        "infraction_ledger": len(infraction_ledger),
+        "member_lru": len(member_lru)
+    },
+    label="store"
+)
+metrics.gauge(
+    "hexville_queue_depth", "Pending work per internal queue",
+    lambda: {
+        "scheduler": scheduler.pending(),
+        "raid_quarantine": sum(len(state["pending"]) for state in raid_state.values()),
+        "open_tickets": len(ticket_activity),
+        "outbound": outbound.pending(),
+        "storage": storage.pending(),
+        "background_tasks": len(_background_tasks)
+    },
+    label="queue"
+)
+
+async def start_metrics_server() -> Optional[web.AppRunner]:
+    if not METRICS_PORT:
+        return None
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    except OSError:
+        await runner.cleanup()
+        return None
+    return runner
+
+# ================== TRACING ==================
+# TRACE_EXPORT: "" (off), "jsonl" (append to TRACE_FILE) or "otlp" (OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))  # fraction of root spans exported
+TRACE_FLUSH_SECONDS = 5.0
+TRACE_BATCH_SIZE = 200
+# Spans slower than this are written to the slow-call log whether or not they were sampled
+SLOW_CALL_MS = float(os.getenv("SLOW_CALL_MS", "1000"))
+SLOW_CALL_LOG = os.getenv("SLOW_CALL_LOG", "slow_calls.log")
+
+slow_log = logging.getLogger("hexville.slow")
+if SLOW_CALL_LOG:
+    _slow_handler = logging.FileHandler(SLOW_CALL_LOG, delay=True, encoding="utf-8")
+    _slow_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_log.addHandler(_slow_handler)
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "sampled", "start_ns", "started", "duration_ms", "attrs", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, kind: str = "internal"):
+        self.name, self.kind = name, kind
+        if parent is None:
+            self.trace_id = "%032x" % random.getrandbits(128)
+            self.parent_id = None
+            self.sampled = bool(TRACE_EXPORT) and random.random() < TRACE_SAMPLE_RATE
+        else:
+            self.trace_id, self.parent_id, self.sampled = parent.trace_id, parent.span_id, parent.sampled
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self.attrs: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+            "error": self.error
+        }
+
+class TraceExporter:
+    def __init__(self):
+        self.buffer: List[Dict[str, Any]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def add(self, span: Span):
+        self.buffer.append(span.to_dict())
+        if len(self.buffer) >= TRACE_BATCH_SIZE:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(TRACE_FLUSH_SECONDS, self.flush)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self.buffer:
+            batch, self.buffer = self.buffer, []
+            spawn(self._export(batch))
+
+    async def _export(self, batch: List[Dict[str, Any]]):
+        async with self._lock:
+            try:
+                if TRACE_EXPORT == "otlp":
+                    await self._post_otlp(batch)
+                else:
+                    await storage.run(self._write_jsonl, batch)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _write_jsonl(batch: List[Dict[str, Any]]):
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(span, default=str) + "\n" for span in batch))
+
+    async def _post_otlp(self, batch: List[Dict[str, Any]]):
+        # Separate session without http_trace, so exporting never produces spans of its own
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        spans = []
+        for span in batch:
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 3 if span["kind"] == "client" else 1,
+                "startTimeUnixNano": str(span["start_ns"]),
+                "endTimeUnixNano": str(span["start_ns"] + int(span["duration_ms"] * 1_000_000)),
+                "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in span["attrs"].items()],
+                "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1}
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            spans.append(otlp_span)
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "hexville-bot"}}]},
+                "scopeSpans": [{"scope": {"name": "hexville"}, "spans": spans}]
+            }]
+        }
+        async with self._session.post(TRACE_OTLP_ENDPOINT, json=body) as resp:
+            await resp.read()
+
+trace_exporter = TraceExporter()
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+def finish_span(span: Span):
+    span.duration_ms = (time.perf_counter() - span.started) * 1000
+    if span.duration_ms >= SLOW_CALL_MS:
+        slow_log.warning(
+            "%s took %.0f ms (trace %s)%s %s",
+            span.name, span.duration_ms, span.trace_id, f" error={span.error}" if span.error else "", span.attrs
+        )
+    if span.sampled:
+        trace_exporter.add(span)
+
+def _span_attrs(args: Tuple[Any, ...]) -> Dict[str, Any]:
+    for arg in args:
+        if isinstance(arg, discord.Interaction):
+            attrs = {"user_id": arg.user.id if arg.user else None, "guild_id": arg.guild_id, "channel_id": arg.channel_id}
+            if arg.command:
+                attrs["command"] = arg.command.qualified_name
+            elif arg.data and "custom_id" in arg.data:
+                attrs["custom_id"] = arg.data["custom_id"]
+            return attrs
+        if isinstance(arg, discord.Message):
+            return {"guild_id": arg.guild.id if arg.guild else None, "channel_id": arg.channel.id, "author_id": arg.author.id}
+        if isinstance(arg, discord.Member):
+            return {"guild_id": arg.guild.id, "member_id": arg.id}
+    return {}
+
+def traced(func):
+    """Run an async handler inside a span. Place directly above the `async def`, under any
+    discord.py decorators; functools.wraps keeps the signature discord.py inspects."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        span = Span(func.__qualname__, current_span.get())
+        span.attrs = _span_attrs(args)
+        token = current_span.set(span)
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current_span.reset(token)
+            finish_span(span)
+    return wrapper
+
+# Discord REST calls run in the awaiting task, so the active handler span is visible here
+async def _span_request_start(session, ctx, params):
+    parent = current_span.get()
+    ctx.span = None
+    if parent is not None:
+        ctx.span = Span(api_route_label(params.method, params.url.path), parent, kind="client")
+
+async def _span_request_end(session, ctx, params):
+    span = getattr(ctx, "span", None)
+    if span is not None:
+        span.attrs["status"] = params.response.status
+        if params.response.status >= 400:
+            span.error = f"HTTP {params.response.status}"
+        finish_span(span)
+
+async def _span_request_exception(session, ctx, params):
+    span = getattr(ctx, "span", None)
+    if span is not None:
+        span.error = f"{type(params.exception).__name__}: {params.exception}"
+        finish_span(span)
+
+http_trace.on_request_start.append(_span_request_start)
+http_trace.on_request_end.append(_span_request_end)
+http_trace.on_request_exception.append(_span_request_exception)
+
 # ================== INTENTS & BOT ==================
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
-bot = commands.Bot(command_prefix="/", intents=intents)
+class HexVilleTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        # Commands read persisted stores. Waiting here for the background load could run past the
+        # 3 s interaction deadline on a large store, so answer straight away and let the user retry
+        if not persistence_ready.is_set():
+            try:
+                if interaction.type is discord.InteractionType.autocomplete:
+                    await interaction.response.autocomplete([])
+                else:
+                    await interaction.response.send_message("The bot is still starting up; try again in a few seconds.", ephemeral=True)
+            except Exception:
+                pass
+            return False
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        command = interaction.command.qualified_name if interaction.command else "unknown"
+        COMMAND_ERRORS.inc(command)
+        started = interaction.extras.get("started")
+        if started is not None:
+            COMMAND_SECONDS.observe(time.perf_counter() - started, command)
+        await super().on_error(interaction, error)
+
+class HexVilleBot(commands.AutoShardedBot if AUTOSHARD else commands.Bot):
+    async def setup_hook(self):
+        await on_setup()
+
+    async def close(self):
+        # Flush a pending debounced save and anything still queued for the storage thread
+        if _save_handle is not None and not _save_handle.cancelled():
+            _save_handle.cancel()
+            await persist()
+        await storage.drain()
+        shutdown_workers()
+        await super().close()
+
+bot_options: Dict[str, Any] = {}
+if AUTOSHARD and SHARD_COUNT:
+    bot_options["shard_count"] = int(SHARD_COUNT)
+if MEMBER_CACHE_MODE != "full":
+    bot_options["chunk_guilds_at_startup"] = False
+if MEMBER_CACHE_MODE == "low":
+    bot_options["member_cache_flags"] = discord.MemberCacheFlags.none()
+# Slash commands only: without the default prefix help command, on_message skips prefix parsing entirely
+bot = HexVilleBot(command_prefix="/", intents=intents, tree_cls=HexVilleTree, http_trace=http_trace, help_command=None, **bot_options)
+
+# ================== MEMBER RESOLUTION ==================
+MEMBER_QUERY_BATCH = 100  # user IDs per gateway member request (Discord's limit)
+
+class MemberLRU:
+    """(guild_id, user_id) -> Member for members the gateway cache does not hold, least recently used first.
+
+    Entries expire after `ttl` seconds, so role changes made elsewhere are picked up
+    on the next fetch even if no gateway event reached us.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, discord.Member]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, guild_id: int, user_id: int) -> Optional[discord.Member]:
+        key = (guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        self._entries[key] = (time.monotonic() + self.ttl, member)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def discard(self, guild_id: int, user_id: int):
+        self._entries.pop((guild_id, user_id), None)
+
+member_lru = MemberLRU(MEMBER_LRU_SIZE, MEMBER_LRU_TTL)
+_member_fetches: Dict[Tuple[int, int], asyncio.Task] = {}
+
+def cached_member(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    return guild.get_member(user_id) or member_lru.get(guild.id, user_id)
+
+def remember_member(member: discord.Member):
+    # Members in the gateway cache are kept current by events; only hold the others
+    if member.guild.get_member(member.id) is None:
+        member_lru.put(member)
+
+async def _fetch_member(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    try:
+        member = await guild.fetch_member(user_id)
+    except Exception:
+        return None
+    remember_member(member)
+    return member
+
+async def resolve_member(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    """Cached member, else one REST fetch shared by concurrent callers; None if they are not in the guild."""
+    member = cached_member(guild, user_id)
+    if member is not None:
+        return member
+    key = (guild.id, user_id)
+    task = _member_fetches.get(key)
+    if task is None:
+        task = _member_fetches[key] = asyncio.create_task(_fetch_member(guild, user_id))
+        task.add_done_callback(lambda _: _member_fetches.pop(key, None))
+    return await asyncio.shield(task)
+
+async def resolve_members(guild: discord.Guild, ids: List[int]) -> Tuple[List[discord.Member], List[int]]:
+    """Resolve many members with one gateway member request per 100 uncached IDs; returns (members, missing IDs)."""
+    found: Dict[int, discord.Member] = {}
+    unknown = []
+    for user_id in ids:
+        member = cached_member(guild, user_id)
+        if member is None:
+            unknown.append(user_id)
+        else:
+            found[user_id] = member
+    for start in range(0, len(unknown), MEMBER_QUERY_BATCH):
+        batch = unknown[start:start + MEMBER_QUERY_BATCH]
+        try:
+            members = await guild.query_members(user_ids=batch, limit=len(batch), cache=MEMBER_CACHE_MODE != "low")
+        except Exception:
+            # No gateway connection for this guild (or the request timed out): fall back to REST
+            members = [m for m in await asyncio.gather(*(resolve_member(guild, uid) for uid in batch)) if m]
+        for member in members:
+            remember_member(member)
+            found[member.id] = member
+    return [found[uid] for uid in ids if uid in found], [uid for uid in ids if uid not in found]
+
+# ================== SCHEDULER ==================
+SAVE_DEBOUNCE_SECONDS = 2.0
+SCHEDULER_MAX_SLEEP = 60.0  # re-check the heap at least this often (clock changes, missed wake-ups)
+
+class JobScheduler:
+    """Persisted min-heap job scheduler driven by a single wake-up task.
+
+    Inserts are O(log n). Jobs are keyed by id; rescheduling or cancelling leaves a
+    stale heap entry that is skipped when popped. Jobs that came due while the bot
+    was offline run as soon as the scheduler starts.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._handlers: Dict[str, Any] = {}
+        self._running: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._counter = 0
+
+    def handler(self, kind: str):
+        def decorator(func):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def schedule(self, kind: str, run_at: float, payload: Optional[Dict[str, Any]] = None,
+                 job_id: Optional[str] = None, every: Optional[float] = None) -> str:
+        if job_id is None:
+            self._counter += 1
+            job_id = f"{kind}:{int(time.time() * 1000)}:{self._counter}"
+        job = {"id": job_id, "kind": kind, "run_at": run_at, "payload": payload or {}}
+        if every:
+            job["every"] = every
+        self.jobs[job_id] = job
+        if not self._heap or run_at < self._heap[0][0]:
+            if self._wakeup:
+                self._wakeup.set()
+        heapq.heappush(self._heap, (run_at, job_id))
+        request_save()
+        return job_id
+
+    def schedule_in(self, kind: str, seconds: float, payload: Optional[Dict[str, Any]] = None,
+                    job_id: Optional[str] = None, every: Optional[float] = None) -> str:
+        return self.schedule(kind, time.time() + seconds, payload, job_id=job_id, every=every)
+
+    def cancel(self, job_id: str) -> bool:
+        if self.jobs.pop(job_id, None) is None:
+            return False
+        request_save()
+        return True
+
+    def pending(self) -> int:
+        return len(self.jobs)
+
+    def dump(self) -> List[Dict[str, Any]]:
+        return list(self.jobs.values())
+
+    def load(self, jobs: List[Dict[str, Any]]):
+        for job in jobs:
+            self.jobs[job["id"]] = job
+        self._heap = [(job["run_at"], job_id) for job_id, job in self.jobs.items()]
+        heapq.heapify(self._heap)
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def pop_due(self, now: float) -> List[Dict[str, Any]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, job_id = heapq.heappop(self._heap)
+            job = self.jobs.get(job_id)
+            if not job or job["run_at"] != run_at:
+                continue  # cancelled or rescheduled
+            if job.get("every"):
+                # Recurring jobs catch up once rather than once per missed interval
+                job["run_at"] = max(run_at + job["every"], now)
+                heapq.heappush(self._heap, (job["run_at"], job_id))
+            else:
+                del self.jobs[job_id]
+            due.append(job)
+        if due:
+            request_save()
+        return due
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            for job in self.pop_due(now):
+                func = self._handlers.get(job["kind"])
+                if func is None:
+                    continue
+                task = asyncio.create_task(func(job["payload"]))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            timeout = SCHEDULER_MAX_SLEEP
+            if self._heap:
+                timeout = min(max(self._heap[0][0] - time.time(), 0), SCHEDULER_MAX_SLEEP)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+scheduler = JobScheduler()
+_save_handle: Optional[asyncio.TimerHandle] = None
+
+def request_save(delay: float = SAVE_DEBOUNCE_SECONDS):
+    """Coalesce persistence writes: many changes inside `delay` seconds cost one save."""
+    global _save_handle
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return save_persistence()
+    if _save_handle is None or _save_handle.cancelled():
+        _save_handle = loop.call_later(delay, _flush_save)
+
+def _flush_save():
+    global _save_handle
+    _save_handle = None
+    if not storage.post("persistence", persistence_job):
+        request_save()  # storage queue is full; try again after another debounce
+
+# ================== STORAGE ==================
+STORAGE_QUEUE_SIZE = int(os.getenv("STORAGE_QUEUE_SIZE", "256"))  # queued writes before callers wait
+STORAGE_BATCH_MAX = 64  # writes committed per trip to the storage thread
+
+class StorageExecutor:
+    """A dedicated storage thread fed by a bounded queue.
+
+    submit(key, factory) queues a write. When its batch starts, `factory()` runs on the event
+    loop (where it can safely snapshot live state) and returns the blocking callable for the
+    storage thread. Everything queued by then is committed in one trip, and writes sharing a key
+    collapse into the latest one. Once the queue is full, submit() waits for room.
+    """
+
+    def __init__(self, maxsize: int = STORAGE_QUEUE_SIZE, batch_max: int = STORAGE_BATCH_MAX):
+        self.maxsize, self.batch_max = maxsize, batch_max
+        self.batches = 0
+        self.coalesced = 0
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="hexville-storage")
+        self._queue: Optional[asyncio.Queue] = None
+        self._waiting: Dict[Any, List[Any]] = {}  # key -> queued [key, factory, futures] not yet in a batch
+        self._task: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, key: Any, factory):
+        """Queue a write and return its result once the batch holding it has committed."""
+        future = asyncio.get_running_loop().create_future()
+        entry = self._waiting.get(key) if key is not None else None
+        if entry is not None:
+            entry[1] = factory
+            entry[2].append(future)
+            self.coalesced += 1
+        else:
+            entry = [key, factory, [future]]
+            self._ensure_writer()
+            await self._queue.put(entry)
+            if key is not None:
+                self._waiting[key] = entry
+        return await future
+
+    def post(self, key: Any, factory) -> bool:
+        """Queue a write nobody waits on; returns False (dropping it) if the queue is full."""
+        entry = self._waiting.get(key) if key is not None else None
+        if entry is not None:
+            entry[1] = factory
+            self.coalesced += 1
+            return True
+        self._ensure_writer()
+        if self._queue.full():
+            return False
+        entry = [key, factory, []]
+        self._queue.put_nowait(entry)
+        if key is not None:
+            self._waiting[key] = entry
+        return True
+
+    async def run(self, func, *args):
+        """Run a blocking call (e.g. a read from disk) on the storage thread, outside any batch."""
+        return await asyncio.get_running_loop().run_in_executor(self._pool, functools.partial(func, *args))
+
+    async def drain(self):
+        """Wait until everything queued so far has been written."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def _ensure_writer(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.maxsize)
+        if self._task is None or self._task.done():
+            self._task = spawn(self._run())
+
+    @staticmethod
+    def _commit(jobs) -> List[Tuple[bool, Any]]:
+        results = []
+        for job in jobs:
+            if isinstance(job, Exception):
+                results.append((False, job))
+                continue
+            try:
+                results.append((True, job()))
+            except Exception as e:
+                results.append((False, e))
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while not queue.empty():  # exits when idle; the next submit starts a new writer
+            batch = [queue.get_nowait()]
+            while len(batch) < self.batch_max and not queue.empty():
+                batch.append(queue.get_nowait())
+            entries: List[List[Any]] = []
+            by_key: Dict[Any, List[Any]] = {}
+            for entry in batch:
+                key = entry[0]
+                if key is not None:
+                    if self._waiting.get(key) is entry:
+                        del self._waiting[key]
+                    first = by_key.get(key)
+                    if first is not None:
+                        first[1] = entry[1]
+                        first[2].extend(entry[2])
+                        self.coalesced += 1
+                        continue
+                    by_key[key] = entry
+                entries.append(entry)
+            jobs = []
+            for entry in entries:
+                try:
+                    jobs.append(entry[1]())
+                except Exception as e:
+                    jobs.append(e)
+            try:
+                results = await loop.run_in_executor(self._pool, self._commit, jobs)
+            except Exception as e:
+                results = [(False, e)] * len(entries)
+            self.batches += 1
+            for entry, (ok, value) in zip(entries, results):
+                for future in entry[2]:
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+            for _ in batch:
+                queue.task_done()
+
+storage = StorageExecutor()
+
+async def persist():
+    """Queue a persistence snapshot and wait until it is on disk; concurrent calls share one write."""
+    await storage.submit("persistence", persistence_job)
+
+# ================== WORKER PROCESSES ==================
+# CPU-bound jobs (media hashing, rendering) run in a small process pool so they neither hold the GIL nor
+# stall the gateway heartbeat. Job functions live in workers.py and take plain data only. Start the
+# bot from run.py: spawned workers re-run the launching script, and run.py imports nothing at that point.
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+WORKER_NICE = int(os.getenv("WORKER_NICE", "10"))  # workers give way to the bot process when CPUs are scarce
+_worker_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+def worker_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _worker_pool
+    if _worker_pool is None:
+        # spawn, not fork: forking would copy the storage and executor threads mid-flight
+        _worker_pool = concurrent.futures.ProcessPoolExecutor(WORKER_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                                                              initializer=workers.init_worker, initargs=(WORKER_NICE,))
+    return _worker_pool
+
+async def run_in_worker(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(worker_pool(), functools.partial(func, *args))
+
+def shutdown_workers():
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=False, cancel_futures=True)
+        _worker_pool = None
+
+# ================== OUTBOUND QUEUE ==================
+# Priority classes, most urgent first. Interaction responses (defer/send_message/followups)
+# and moderation calls made directly in command handlers never wait in this queue; the bot's
+# background posts do, so a log flood or transcript dump can't crowd them out.
+PRIORITY_INTERACTION = 0
+PRIORITY_MODERATION = 1
+PRIORITY_USER_POST = 2
+PRIORITY_LOG = 3
+PRIORITY_TRANSCRIPT = 4
+OUTBOUND_MAX_INFLIGHT = 4  # queued requests in flight at once, well under Discord's 50/s global limit
+OUTBOUND_BUCKET_BURST = 5  # per destination: Discord allows ~5 messages per 5s per channel
+OUTBOUND_BUCKET_REFILL = 1.0  # tokens per second
+
+class OutboundScheduler:
+    """Strict priority between classes, round-robin between destinations within a class,
+    and a token bucket per destination so one busy channel can't starve the others.
+    A destination has at most one request in flight, so its posts arrive in order."""
+
+    def __init__(self, max_inflight: int = OUTBOUND_MAX_INFLIGHT, burst: float = OUTBOUND_BUCKET_BURST,
+                 refill: float = OUTBOUND_BUCKET_REFILL):
+        self.max_inflight, self.burst, self.refill = max_inflight, burst, refill
+        self.queues: List["OrderedDict[Any, deque]"] = [OrderedDict() for _ in range(PRIORITY_TRANSCRIPT + 1)]
+        self.tokens: Dict[Any, List[float]] = {}  # bucket -> [tokens, last refill]
+        self.busy: set = set()
+        self.inflight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        return sum(len(q) for buckets in self.queues for q in buckets.values())
+
+    async def submit(self, priority: int, bucket: Any, factory):
+        """Queue `factory()` (a coroutine function) and return its result once it has run."""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(priority, bucket, factory, future)
+        return await future
+
+    def post(self, priority: int, bucket: Any, factory):
+        """Fire-and-forget variant of submit for posts nobody waits on; failures are dropped."""
+        self._enqueue(priority, bucket, factory, None)
+
+    def _enqueue(self, priority: int, bucket: Any, factory, future: Optional[asyncio.Future]):
+        self.queues[priority].setdefault(bucket, deque()).append((factory, future, bucket))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def _take_token(self, bucket: Any, now: float) -> float:
+        """Spend one token; returns 0 on success, else seconds until one is available."""
+        state = self.tokens.get(bucket)
+        if state is None:
+            state = self.tokens[bucket] = [self.burst, now]
+        state[0] = min(self.burst, state[0] + (now - state[1]) * self.refill)
+        state[1] = now
+        if state[0] >= 1:
+            state[0] -= 1
+            return 0.0
+        return (1 - state[0]) / self.refill
+
+    def _pick(self, now: float) -> Tuple[Optional[Tuple[Any, ...]], Optional[float]]:
+        wait = None
+        for buckets in self.queues:
+            for _ in range(len(buckets)):
+                bucket, queue = next(iter(buckets.items()))
+                buckets.move_to_end(bucket)
+                while queue and queue[0][1] is not None and queue[0][1].cancelled():
+                    queue.popleft()
+                if not queue:
+                    del buckets[bucket]
+                    continue
+                if bucket in self.busy:
+                    continue
+                delay = self._take_token(bucket, now)
+                if delay:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                item = queue.popleft()
+                if not queue:
+                    del buckets[bucket]
+                return item, None
+        return None, wait
+
+    async def _execute(self, factory, future: Optional[asyncio.Future], bucket: Any):
+        try:
+            result = await factory()
+        except Exception as e:
+            if future is not None and not future.done():
+                future.set_exception(e)
+        else:
+            if future is not None and not future.done():
+                future.set_result(result)
+        finally:
+            self.inflight -= 1
+            self.busy.discard(bucket)
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            while self.inflight < self.max_inflight:
+                item, timeout = self._pick(time.monotonic())
+                if item is None:
+                    break
+                self.inflight += 1
+                self.busy.add(item[2])
+                spawn(self._execute(*item))
+            if timeout is None and not self.pending() and not self.inflight:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+outbound = OutboundScheduler()
+
+async def send_queued(destination: discord.abc.Messageable, priority: int, **kwargs) -> discord.Message:
+    """channel.send / user.send through the outbound queue, bucketed per destination."""
+    return await outbound.submit(priority, getattr(destination, "id", None), lambda: destination.send(**kwargs))
+
+def post_queued(destination: discord.abc.Messageable, priority: int, **kwargs):
+    """Queue a send without waiting for it, for logs and transcripts the caller doesn't need."""
+    outbound.post(priority, getattr(destination, "id", None), lambda: destination.send(**kwargs))
+
+# ================== RENDERING ==================
+# Transcripts, casefiles and exports are rendered from plain records by workers.render_* in the
+# worker processes, which write the artifact to RENDER_DIR. The loop only uploads the file, and
+# discord.File streams it from disk; the file is deleted once sent.
+RENDER_DIR = os.getenv("RENDER_DIR", os.path.join(tempfile.gettempdir(), "hexville-renders"))
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", "2"))  # render jobs at once; the rest wait their turn
+RENDER_BATCH = 1000  # records pickled per step by pack_records
+render_slots = asyncio.Semaphore(RENDER_CONCURRENCY)
+
+async def pack_records(records: List[Any]) -> List[bytes]:
+    """Pickle records in batches, yielding between them. Handing the pool 20k records as one argument
+    would pickle them in a single call that holds the GIL for tens of milliseconds; a list of bytes is just copied."""
+    batches = []
+    for start in range(0, len(records), RENDER_BATCH):
+        batches.append(pickle.dumps(records[start:start + RENDER_BATCH], protocol=pickle.HIGHEST_PROTOCOL))
+        await asyncio.sleep(0)
+    return batches
+
+async def render_artifact(kind: str, func, *args):
+    """Run a workers.render_* job under the render limit; returns what it returns (path first)."""
+    started = time.perf_counter()
+    async with render_slots:
+        result = await run_in_worker(func, RENDER_DIR, *args)
+    RENDER_SECONDS.observe(time.perf_counter() - started, kind)
+    return result
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+async def discard_artifact(path: str):
+    await storage.run(_remove_file, path)
 
 # ================== HELPERS ==================
-def save_persistence():
+def persistence_snapshot() -> Dict[str, Any]:
+    # Containers are copied so the storage thread can serialise them while the loop keeps
+    # mutating the live stores. Infraction and appeal rows gain keys when an appeal is opened or
+    # decided, and json.dump fails on a dict that grows mid-iteration, so those rows are copied
+    # too; vehicle and history rows are never changed after they are added, and stay shared
+    return {
+        "vehicle_store": {k: list(v) for k, v in vehicle_store.items()},
+        "unregister_uses": dict(unregister_uses),
+        "infraction_ledger": {k: [dict(e) for e in v] for k, v in infraction_ledger.items()},
+        "staff_strikes": dict(staff_strikes),
+        "history_store": {k: list(v) for k, v in history_store.items()},
+        "appeals_store": {k: [dict(a) for a in v] for k, v in appeals_store.items()},
+        "scheduled_jobs": scheduler.dump(),
+        "ticket_activity": dict(ticket_activity),
+        "ticket_warned": dict(ticket_warned),
+        "guild_config": {k: dict(v) for k, v in guild_config_overrides.items()},
+        "media_blocklist": {k: dict(v) for k, v in media_blocklist.items()},
+        "automod_settings": {k: {key: list(val) if isinstance(val, list) else val for key, val in v.items()}
+                             for k, v in automod_settings.items()},
+        "raid_state": {k: raid_snapshot(v) for k, v in raid_state.items() if v.get("active")}
+    }
+
+def write_persistence(data: Dict[str, Any]):
     if not PERSISTENCE_FILE:
         return
     try:
-        data = {"vehicle_store": vehicle_store, "unregister_uses": unregister_uses}
-        with open(PERSISTENCE_FILE, "w", encoding="utf-8") as f:
+        # Write-then-rename, so a crash mid-write leaves the previous snapshot intact
+        tmp = PERSISTENCE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(data, f, default=str)
+        os.replace(tmp, PERSISTENCE_FILE)
     except Exception:
         pass
 
-def load_persistence():
+def persistence_job():
+    """Storage-queue factory: snapshot on the loop, write on the storage thread."""
+    return functools.partial(write_persistence, persistence_snapshot())
+
+def save_persistence():
     if not PERSISTENCE_FILE:
         return
+    write_persistence(persistence_snapshot())
+
+def read_persistence() -> Optional[Dict[str, Any]]:
+    if not PERSISTENCE_FILE or not os.path.exists(PERSISTENCE_FILE):
+        return None
     try:
-        if not os.path.exists(PERSISTENCE_FILE):
-            return
         with open(PERSISTENCE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        vs = data.get("vehicle_store", {})
-        for k, v in vs.items():
-            vehicle_store[int(k)] = v
-        uu = data.get("unregister_uses", {})
-        for k, v in uu.items():
-            unregister_uses[int(k)] = v
+            return json.load(f)
+    except Exception:
+        return None
+
+def merge_vehicle_store(saved: Dict[str, List[Dict[str, Any]]]):
+    """(store, index): the live vehicle store with `saved` merged in, and build_vehicle_index() of it.
+    Only reads live state, so load_persistence_async runs it on the storage thread."""
+    store = dict(vehicle_store)
+    for k, v in saved.items():
+        store[int(k)] = v + vehicle_store.get(int(k), [])
+    return store, build_vehicle_index(store)
+
+def apply_persistence_steps(data: Dict[str, Any], vehicles=None):
+    """Merge a loaded snapshot into the live stores, keeping anything written since startup, one
+    store at a time: a generator that yields between stores, so an async caller can let the loop
+    run in between. `vehicles` is merge_vehicle_store()'s result, when it was already built off the loop."""
+    store, index = vehicles or merge_vehicle_store(data.get("vehicle_store", {}))
+    vehicle_store.clear()
+    vehicle_store.update(store)
+    install_vehicle_index(index)
+    yield
+    for k, v in data.get("unregister_uses", {}).items():
+        unregister_uses.setdefault(int(k), v)
+    for k, v in data.get("infraction_ledger", {}).items():
+        infraction_ledger[int(k)] = v + infraction_ledger.get(int(k), [])
+    for k, v in data.get("staff_strikes", {}).items():
+        staff_strikes.setdefault(int(k), v)
+    rebuild_infraction_index()
+    yield
+    for k, v in data.get("history_store", {}).items():
+        history_store[int(k)] = v + history_store.get(int(k), [])
+    for k, v in data.get("appeals_store", {}).items():
+        appeals_store[int(k)] = v + appeals_store.get(int(k), [])
+    rebuild_appeal_index()
+    yield
+    scheduler.load(data.get("scheduled_jobs", []))
+    yield
+    for k, v in data.get("ticket_activity", {}).items():
+        ticket_activity[int(k)] = max(v, ticket_activity.get(int(k), 0.0))
+    for channel_id, _ in sorted(ticket_activity.items(), key=lambda kv: kv[1]):
+        ticket_activity.move_to_end(channel_id)
+    for k, v in data.get("ticket_warned", {}).items():
+        ticket_warned.setdefault(int(k), v)
+    for k, v in data.get("guild_config", {}).items():
+        guild_config_overrides[int(k)] = {**v, **guild_config_overrides.get(int(k), {})}
+    _guild_configs.clear()
+    # Saved values win: entries created since startup only hold defaults (get_automod_settings
+    # fills them on first use), and the dicts are updated in place because message plans hold them
+    for k, v in data.get("automod_settings", {}).items():
+        get_automod_settings(int(k)).update(v)
+    _link_policies.clear()
+    for k, v in data.get("raid_state", {}).items():
+        restore_raid_state(int(k), v)
+    invalidate_message_plan()
+    for k, v in data.get("media_blocklist", {}).items():
+        media_blocklist[int(k)] = {**v, **media_blocklist.get(int(k), {})}
+    _media_indexes.clear()
+
+def apply_persistence(data: Dict[str, Any], vehicles=None):
+    try:
+        for _ in apply_persistence_steps(data, vehicles):
+            pass
     except Exception:
         pass
 
-load_persistence()
+def load_persistence():
+    data = read_persistence()
+    if data:
+        apply_persistence(data)
+
+async def read_persistence_async() -> Optional[Dict[str, Any]]:
+    """read_persistence without holding up the loop: json.load keeps the GIL for the whole parse, even
+    on the storage thread, so the file is parsed in a worker process and comes back in pickled parts
+    that are unpickled here one at a time."""
+    if not PERSISTENCE_FILE or not os.path.exists(PERSISTENCE_FILE):
+        return None
+    try:
+        parts = await run_in_worker(workers.load_json_parts, os.path.abspath(PERSISTENCE_FILE), PERSISTENCE_LOAD_BATCH)
+    except Exception:
+        return await storage.run(read_persistence)  # the pool is unavailable; parse here instead
+    if parts is None:
+        return None
+    data: Dict[str, Any] = {}
+    for key, kind, blob in parts:
+        value = pickle.loads(blob)
+        if kind == "dict":
+            data.setdefault(key, {}).update(value)
+        elif kind == "list":
+            data.setdefault(key, []).extend(value)
+        else:
+            data[key] = value
+        await asyncio.sleep(0)
+    return data
 
-def run_blocking(func, *args, **kwargs):
-    loop = asyncio.get_event_loop()
-    return loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+async def load_persistence_async():
+    try:
+        data = await read_persistence_async()
+        if data:
+            # Merging and indexing the vehicle store is most of the work; build it on the storage
+            # thread and swap it in. Commands, the only writers, wait for persistence_ready.
+            try:
+                vehicles = await storage.run(merge_vehicle_store, data.get("vehicle_store", {}))
+            except Exception:
+                vehicles = None
+            try:
+                for _ in apply_persistence_steps(data, vehicles):
+                    await asyncio.sleep(0)
+            except Exception:
+                pass
+    finally:
+        persistence_ready.set()
+
+def spawn(coro) -> asyncio.Task:
+    """Fire-and-forget a coroutine, keeping a reference so the task is not garbage collected."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+# Per-guild config
+def get_guild_config(guild_id: int) -> Dict[str, int]:
+    cfg = _guild_configs.get(guild_id)
+    if cfg is None:
+        cfg = _guild_configs[guild_id] = {**GUILD_CONFIG_DEFAULTS, **guild_config_overrides.get(guild_id, {})}
+    return cfg
+
+def guild_cfg(guild: Optional[discord.Guild]) -> Dict[str, int]:
+    return get_guild_config(guild.id) if guild else GUILD_CONFIG_DEFAULTS
+
+def member_cfg(user: Union[discord.Member, discord.User]) -> Dict[str, int]:
+    return guild_cfg(getattr(user, "guild", None))
+
+def set_guild_config(guild_id: int, key: str, value: Optional[int]):
+    overrides = guild_config_overrides.setdefault(guild_id, {})
+    if value is None:
+        overrides.pop(key, None)
+    else:
+        overrides[key] = value
+    _guild_configs.pop(guild_id, None)
+    invalidate_message_plan(guild_id)
+    request_save()
 
 # Permission helpers
 def has_role(user: discord.Member, role_id: int) -> bool:
-    return any(r.id == role_id for r in user.roles)
+    return any(r.id == role_id for r in getattr(user, "roles", ()))
 
 def is_staff(interaction: discord.Interaction) -> bool:
     u = interaction.user
-    return has_role(u, ADMIN_ROLE_ID) or has_role(u, HIGHCOMMAND_ROLE_ID) or has_role(u, OWNERSHIP_ROLE_ID)
+    cfg = member_cfg(u)
+    return has_role(u, cfg["admin_role"]) or has_role(u, cfg["highcommand_role"]) or has_role(u, cfg["ownership_role"])
 
 def is_highcommand(interaction: discord.Interaction) -> bool:
-    return has_role(interaction.user, HIGHCOMMAND_ROLE_ID)
+    return has_role(interaction.user, member_cfg(interaction.user)["highcommand_role"])
 
 def is_staffing(interaction: discord.Interaction) -> bool:
-    return has_role(interaction.user, STAFF_TEAM_ROLE_ID)
+    return has_role(interaction.user, member_cfg(interaction.user)["staff_team_role"])
 
 def is_ownership(interaction: discord.Interaction) -> bool:
-    return has_role(interaction.user, OWNERSHIP_ROLE_ID)
+    return has_role(interaction.user, member_cfg(interaction.user)["ownership_role"])
 
 def is_developer(interaction: discord.Interaction) -> bool:
     return interaction.user.id == DEVELOPER_USER_ID
 
 def is_ownership_plus(member: discord.Member) -> bool:
-    return has_role(member, OWNERSHIP_ROLE_ID) or has_role(member, ADMIN_ROLE_ID)
+    cfg = member_cfg(member)
+    return has_role(member, cfg["ownership_role"]) or has_role(member, cfg["admin_role"])
+
+def is_highcommand_plus(member: discord.Member) -> bool:
+    cfg = member_cfg(member)
+    return any(has_role(member, cfg[k]) for k in ("highcommand_role", "ownership_role", "admin_role"))
+
+def is_ticket_staff(member: discord.Member) -> bool:
+    cfg = member_cfg(member)
+    return any(has_role(member, cfg[k]) for k in ("admin_role", "highcommand_role", "ownership_role", "staff_team_role"))
+
+def infract_role_ids(guild_id: int) -> Tuple[int, ...]:
+    cfg = get_guild_config(guild_id)
+    return (cfg["infract_1_role"], cfg["infract_2_role"], cfg["infract_3_role"])
 
 def is_automod_exempt(member: discord.Member) -> bool:
     return is_ownership_plus(member)
 
 # Generic helpers
-def remove_all_staff_roles(member: discord.Member):
+def remove_all_staff_roles(member: discord.Member) -> List[discord.Role]:
+    """The member's staff roles, i.e. what termination/suspension strips (see staff_role_edit)."""
     return [r for r in member.roles if r.id in STAFF_ROLE_IDS]
 
 async def log_action(guild: discord.Guild, embed: discord.Embed):
-    channel = guild.get_channel(ACTION_LOG_CHANNEL)
+    channel = guild.get_channel(get_guild_config(guild.id)["action_log_channel"])
     if channel:
-        await channel.send(embed=embed)
+        # Queued behind interaction responses and moderation; callers don't wait for delivery
+        post_queued(channel, PRIORITY_LOG, embed=embed)
+
+async def run_batched(calls: List[Any], size: int = RAID_BATCH_SIZE, delay: float = RAID_BATCH_DELAY) -> int:
+    """Await zero-arg coroutine factories `size` at a time; returns how many failed."""
+    failed = 0
+    for i in range(0, len(calls), size):
+        results = await asyncio.gather(*(call() for call in calls[i:i + size]), return_exceptions=True)
+        failed += sum(1 for r in results if isinstance(r, Exception))
+        if i + size < len(calls):
+            await asyncio.sleep(delay)
+    return failed
 
 def session_info(s: dict) -> str:
     return (
@@ -211,10 +1467,11 @@ def add_history_entry(user_id: int, entry_type: str, action: str, by_id: int, ex
         "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
         "extra": extra
     })
+    request_save()
 
 async def safe_dm(user: discord.Member, embed: discord.Embed):
     try:
-        await user.send(embed=embed)
+        await send_queued(user, PRIORITY_MODERATION, embed=embed)
     except Exception:
         pass
 
@@ -226,7 +1483,10 @@ def get_automod_settings(guild_id: int) -> Dict[str, Any]:
         "block_words": [],
         "max_mentions": 5,
         "max_caps_percent": 70,
-        "max_caps_min": 12
+        "max_caps_min": 12,
+        "exempt_channels": [],
+        "allow_domains": [],
+        "deny_domains": []
     }
     settings = automod_settings.setdefault(guild_id, defaults.copy())
     for k, v in defaults.items():
@@ -234,13 +1494,85 @@ def get_automod_settings(guild_id: int) -> Dict[str, Any]:
     return settings
 
 INVITE_RE = re.compile(r"(discord\.gg/|discord\.com/invite/)", re.IGNORECASE)
-LINK_RE = re.compile(r"https?://", re.IGNORECASE)
+# Host of every http(s) URL in one scan: optional userinfo is skipped, the port and path end the host
+URL_HOST_RE = re.compile(r"https?://(?:[^\s/?#@]*@)?([\w.-]+)", re.IGNORECASE)
+DOMAIN_RE = re.compile(r"[\w-]+(?:\.[\w-]+)*")
+LINK_VERDICT_CACHE_SIZE = 1024  # recently seen hosts per guild
 
 def contains_invite(text: str) -> bool:
     return bool(INVITE_RE.search(text))
 
-def contains_link(text: str) -> bool:
-    return bool(LINK_RE.search(text))
+def link_hosts(text: str) -> List[str]:
+    return [host.lower().strip(".") for host in URL_HOST_RE.findall(text)]
+
+def normalize_domain(raw: str) -> Optional[str]:
+    """"https://*.Example.com/path" -> "example.com"; None if nothing domain-like is left."""
+    domain = raw.strip().lower()
+    if "://" in domain:
+        domain = domain.split("://", 1)[1]
+    domain = domain.split("/", 1)[0].rsplit("@", 1)[-1].split(":", 1)[0]
+    domain = domain.lstrip("*").strip(".")
+    return domain if DOMAIN_RE.fullmatch(domain) else None
+
+class DomainTrie:
+    """Suffix trie over reversed labels: "cdn.discordapp.com" is stored as com -> discordapp -> cdn.
+
+    A lookup walks the host's labels from the TLD, so it costs the same however many domains are
+    listed; a listed domain covers its subdomains and the deepest listed suffix wins.
+    """
+
+    _VERDICT = ""  # labels are never empty, so this key cannot clash with a child
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def add(self, domain: str, verdict: bool):
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        node[self._VERDICT] = verdict
+
+    def match(self, host: str) -> Optional[bool]:
+        node, verdict = self.root, None
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            verdict = node.get(self._VERDICT, verdict)
+        return verdict
+
+class LinkPolicy:
+    """A guild's allow/deny domain lists, compiled. verdict(host) is True (allowed), False (denied)
+    or None (not listed), memoised for recently seen hosts."""
+
+    def __init__(self, allow: List[str], deny: List[str]):
+        self.trie = DomainTrie()
+        for domain in allow:
+            self.trie.add(domain, True)
+        for domain in deny:  # a domain on both lists is denied
+            self.trie.add(domain, False)
+        self.verdict = functools.lru_cache(maxsize=LINK_VERDICT_CACHE_SIZE)(self.trie.match)
+
+_link_policies: Dict[int, LinkPolicy] = {}  # guild_id -> compiled lists, dropped when the lists change
+
+def link_policy(guild_id: int) -> LinkPolicy:
+    policy = _link_policies.get(guild_id)
+    if policy is None:
+        settings = get_automod_settings(guild_id)
+        policy = _link_policies[guild_id] = LinkPolicy(settings["allow_domains"], settings["deny_domains"])
+    return policy
+
+def has_blocked_link(guild_id: int, text: str, settings: Dict[str, Any]) -> bool:
+    """With block_links on, any link not on the allow list; otherwise only links on the deny list."""
+    if "://" not in text or not (settings["block_links"] or settings["deny_domains"]):
+        return False
+    verdict = link_policy(guild_id).verdict
+    default = not settings["block_links"]
+    for host in link_hosts(text):
+        allowed = verdict(host)
+        if not (default if allowed is None else allowed):
+            return True
+    return False
 
 def exceeds_caps(text: str, percent: int, min_len: int) -> bool:
     letters = [c for c in text if c.isalpha()]
@@ -249,6 +1581,202 @@ def exceeds_caps(text: str, percent: int, min_len: int) -> bool:
     upper = sum(1 for c in letters if c.isupper())
     return (upper / len(letters) * 100) >= percent
 
+def evaluate_automod(message: discord.Message, settings: Dict[str, Any]) -> str:
+    """Run the AutoMod rule chain; returns the violation reason, or "" if the message is fine."""
+    content = message.content or ""
+    if settings["block_invites"] and contains_invite(content):
+        return "Invite links are not allowed."
+    elif has_blocked_link(message.guild.id, content, settings):
+        return "That link is not allowed." if settings["allow_domains"] or not settings["block_links"] else "Links are not allowed."
+    elif settings["block_words"]:
+        lowered = content.lower()
+        if any(w in lowered for w in settings["block_words"]):
+            return "That word is not allowed."
+    elif exceeds_caps(content, settings["max_caps_percent"], settings["max_caps_min"]):
+        return "Please avoid excessive caps."
+    else:
+        mention_count = len(message.mentions) + len(message.role_mentions)
+        if message.mention_everyone:
+            mention_count += 5
+        if settings["max_mentions"] and mention_count > settings["max_mentions"]:
+            return "Too many mentions."
+    return ""
+
+# ================== MESSAGE DISPATCH ==================
+# What on_message has to do in a channel, as bit flags. Most channels resolve to a handful of
+# flags once; a message there costs two dict lookups before the work (or the early return).
+DISPATCH_TICKET = 1      # ticket channel: record activity for the inactivity sweep
+DISPATCH_MUTE_HINT = 2   # mute-hint channel: count towards the next prompt
+DISPATCH_AUTOMOD = 4     # run the AutoMod rule chain unless the author is exempt
+DISPATCH_COMMANDS = 8    # prefix commands; the bot registers none, slash commands arrive as interactions
+
+_message_plans: Dict[int, Dict[str, Any]] = {}  # guild_id -> dispatch plan, dropped when config or AutoMod settings change
+
+def build_message_plan(guild_id: int) -> Dict[str, Any]:
+    cfg = get_guild_config(guild_id)
+    settings = get_automod_settings(guild_id)
+    return {
+        "settings": settings,
+        "automod": settings["enabled"],
+        "exempt_roles": (cfg["ownership_role"], cfg["admin_role"]),  # is_automod_exempt
+        "exempt_channels": frozenset(settings["exempt_channels"]),
+        "ticket_category": cfg["ticket_category"],
+        "mute_hint_channel": cfg["mute_hint_channel"],
+        "channels": {}
+    }
+
+def message_plan(guild_id: int) -> Dict[str, Any]:
+    plan = _message_plans.get(guild_id)
+    if plan is None:
+        plan = _message_plans[guild_id] = build_message_plan(guild_id)
+    return plan
+
+def invalidate_message_plan(guild_id: Optional[int] = None):
+    if guild_id is None:
+        _message_plans.clear()
+    else:
+        _message_plans.pop(guild_id, None)
+
+def channel_dispatch_flags(plan: Dict[str, Any], channel: discord.abc.Messageable) -> int:
+    flags = DISPATCH_COMMANDS if bot.all_commands else 0
+    if getattr(channel, "category_id", None) == plan["ticket_category"]:
+        flags |= DISPATCH_TICKET
+    if channel.id == plan["mute_hint_channel"]:
+        flags |= DISPATCH_MUTE_HINT
+    # Threads follow their parent channel's exemption
+    exempt = plan["exempt_channels"]
+    if plan["automod"] and channel.id not in exempt and getattr(channel, "parent_id", None) not in exempt:
+        flags |= DISPATCH_AUTOMOD
+    return flags
+
+# ================== MEDIA BLOCKLIST ==================
+# Attachments are matched against a per-guild blocklist by exact SHA-256 and, for images, by a
+# 64-bit perceptual hash (workers.dhash) within MEDIA_PHASH_DISTANCE bits of a listed image.
+MEDIA_HASH_MAX_BYTES = int(os.getenv("MEDIA_HASH_MAX_BYTES", str(8 * 1024 * 1024)))  # larger files are not checked
+MEDIA_PHASH_DISTANCE = 6          # differing bits still counted as the same picture
+MEDIA_SEEN_CACHE_SIZE = 4096      # attachment id -> hashes, so a re-checked attachment is not hashed again
+# Downloads + hashes in flight; each holds up to MEDIA_HASH_MAX_BYTES. When every slot is busy the
+# attachment is let through unchecked rather than queued, so a flood cannot pile up reads in memory.
+MEDIA_HASH_CONCURRENCY = int(os.getenv("MEDIA_HASH_CONCURRENCY", "4"))
+media_hash_slots = asyncio.Semaphore(MEDIA_HASH_CONCURRENCY)
+
+class HammingIndex:
+    """Multi-index hash over 64-bit perceptual hashes. Each hash is filed under its four 16-bit
+    chunks; two hashes within `radius` bits must agree to within radius // 4 bits on at least one
+    chunk, so a lookup probes a handful of buckets instead of scanning the blocklist."""
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self.keys: Dict[int, Any] = {}  # hash -> key (first key wins for identical hashes)
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(self.CHUNKS)]
+
+    def add(self, value: int, key: Any):
+        if value in self.keys:
+            return
+        self.keys[value] = key
+        for i, table in enumerate(self.tables):
+            table.setdefault(value >> (i * self.CHUNK_BITS) & 0xFFFF, []).append(value)
+
+    def nearest(self, value: int, radius: int) -> Optional[Tuple[int, Any]]:
+        """(distance, key) of the closest entry within `radius` bits, or None."""
+        best = None
+        masks = _chunk_masks(radius // self.CHUNKS)
+        for i, table in enumerate(self.tables):
+            chunk = value >> (i * self.CHUNK_BITS) & 0xFFFF
+            for mask in masks:
+                for candidate in table.get(chunk ^ mask, ()):
+                    distance = (value ^ candidate).bit_count()
+                    if distance <= radius and (best is None or distance < best[0]):
+                        best = (distance, candidate)
+        return None if best is None else (best[0], self.keys[best[1]])
+
+@functools.lru_cache(maxsize=None)
+def _chunk_masks(bits: int) -> Tuple[int, ...]:
+    """Every 16-bit mask with at most `bits` bits set."""
+    return tuple(sum(1 << b for b in combo) for n in range(bits + 1)
+                 for combo in itertools.combinations(range(HammingIndex.CHUNK_BITS), n))
+
+_media_indexes: Dict[int, HammingIndex] = {}  # guild_id -> perceptual index, rebuilt after a removal or load
+_media_seen: "OrderedDict[int, Tuple[str, Optional[int]]]" = OrderedDict()
+
+def media_index(guild_id: int) -> HammingIndex:
+    index = _media_indexes.get(guild_id)
+    if index is None:
+        index = _media_indexes[guild_id] = HammingIndex()
+        for digest, entry in media_blocklist.get(guild_id, {}).items():
+            if entry.get("phash") is not None:
+                index.add(entry["phash"], digest)
+    return index
+
+def block_media(guild_id: int, digest: str, phash: Optional[int], label: str, by_id: int, filename: str):
+    media_blocklist.setdefault(guild_id, {})[digest] = {
+        "phash": phash,
+        "label": label,
+        "filename": filename,
+        "by": by_id,
+        "added_at": datetime.utcnow().isoformat(timespec="seconds")
+    }
+    if phash is not None and guild_id in _media_indexes:
+        _media_indexes[guild_id].add(phash, digest)
+    request_save()
+
+def unblock_media(guild_id: int, digest: str) -> bool:
+    if media_blocklist.get(guild_id, {}).pop(digest, None) is None:
+        return False
+    _media_indexes.pop(guild_id, None)
+    request_save()
+    return True
+
+def match_media(guild_id: int, digest: str, phash: Optional[int]) -> Optional[str]:
+    """The blocklisted SHA-256 this media matches, exactly or perceptually, if any."""
+    entries = media_blocklist.get(guild_id)
+    if not entries:
+        return None
+    if digest in entries:
+        return digest
+    if phash is not None:
+        hit = media_index(guild_id).nearest(phash, MEDIA_PHASH_DISTANCE)
+        if hit is not None:
+            return hit[1]
+    return None
+
+async def attachment_hashes(attachment: discord.Attachment) -> Optional[Tuple[str, Optional[int]]]:
+    """(sha256, perceptual hash) of an attachment, hashed in a worker process; None if too large,
+    unreadable, or every media_hash_slots slot is taken."""
+    hashes = _media_seen.get(attachment.id)
+    if hashes is not None:
+        _media_seen.move_to_end(attachment.id)
+        return hashes
+    if attachment.size > MEDIA_HASH_MAX_BYTES:
+        MEDIA_CHECKS_SKIPPED.inc("too_large")
+        return None
+    if media_hash_slots.locked():
+        MEDIA_CHECKS_SKIPPED.inc("busy")
+        return None
+    async with media_hash_slots:
+        try:
+            data = await attachment.read()
+            is_image = (attachment.content_type or "").startswith("image/")
+            hashes = await run_in_worker(workers.media_hashes, data, is_image)
+        except Exception:
+            MEDIA_CHECKS_SKIPPED.inc("failed")
+            return None
+    _media_seen[attachment.id] = hashes
+    if len(_media_seen) > MEDIA_SEEN_CACHE_SIZE:
+        _media_seen.popitem(last=False)
+    return hashes
+
+async def blocked_media(message: discord.Message) -> Optional[str]:
+    """The blocklist entry matched by any of the message's attachments."""
+    for hashes in await asyncio.gather(*(attachment_hashes(a) for a in message.attachments)):
+        if hashes is not None:
+            digest = match_media(message.guild.id, *hashes)
+            if digest is not None:
+                return digest
+    return None
+
 # ================== "DB" FUNCTIONS (IN-MEMORY) ==================
 def _insert_vehicle_local(user_id: int, vehicle: dict):
     vehicle_store.setdefault(user_id, []).append({
@@ -261,26 +1789,29 @@ def _insert_vehicle_local(user_id: int, vehicle: dict):
         "usage": vehicle.get("usage"),
         "registered_at": datetime.utcnow().isoformat(timespec="seconds")
     })
-    save_persistence()
+    index_vehicle(user_id, vehicle_store[user_id][-1])
 
 def _remove_vehicle_by_plate_local(user_id: int, plate: str):
     rows = vehicle_store.get(user_id, [])
     new_rows = [r for r in rows if str(r.get("plate", "")).lower() != plate.lower()]
     vehicle_store[user_id] = new_rows
-    save_persistence()
+    unindex_vehicle_plate(user_id, plate)
 
 def _get_vehicles_local(user_id: int):
     return vehicle_store.get(user_id, [])
 
+# The store lives in memory, so changes and reads happen on the loop; only the disk write
+# goes to the storage thread, batched with any other writes queued meanwhile
 async def db_insert_vehicle(user_id: int, vehicle: dict):
-    await run_blocking(_insert_vehicle_local, user_id, vehicle)
+    _insert_vehicle_local(user_id, vehicle)
+    await persist()
 
 async def db_remove_vehicle_by_plate(user_id: int, plate: str):
-    await run_blocking(_remove_vehicle_by_plate_local, user_id, plate)
+    _remove_vehicle_by_plate_local(user_id, plate)
+    await persist()
 
 async def db_get_vehicles(user_id: int):
-    rows = await run_blocking(_get_vehicles_local, user_id)
-    return rows or []
+    return _get_vehicles_local(user_id) or []
 
 async def db_log_vehicle_action(user: discord.Member, action_type: str, vehicle: dict, guild: discord.Guild):
     embed = discord.Embed(
@@ -296,41 +1827,697 @@ async def db_log_vehicle_action(user: discord.Member, action_type: str, vehicle:
     await log_vehicle_action(guild, embed)
 
 async def log_vehicle_action(guild: discord.Guild, embed: discord.Embed):
-    channel = guild.get_channel(VEHICLE_LOG_CHANNEL_ID)
+    channel = guild.get_channel(get_guild_config(guild.id)["vehicle_log_channel"])
     if channel:
-        await channel.send(embed=embed)
+        post_queued(channel, PRIORITY_LOG, embed=embed)
 
 # ================== VEHICLE HELPERS ==================
+def is_vip_vehicle(member: discord.Member) -> bool:
+    return has_role(member, member_cfg(member)["vip_vehicle_role"])
+
 def max_vehicle_slots_for(member: discord.Member) -> int:
-    if any(r.id == VIP_VEHICLE_ROLE_ID for r in member.roles):
+    if is_vip_vehicle(member):
         return 5
     return 2
 
 def remaining_unregister_uses_for(user_id: int, member: discord.Member) -> int:
-    if member and any(r.id == VIP_VEHICLE_ROLE_ID for r in member.roles):
+    if member and is_vip_vehicle(member):
         return 9999
     return unregister_uses.get(user_id, 2)
 
+def vehicle_slots_used(user_id: int) -> int:
+    return len(vehicle_store.get(user_id, ()))
+
 async def refresh_vehicle_cache(user_id: int):
     return await db_get_vehicles(user_id)
 
+# The check and the store change below never await, so two registrations racing on the loop
+# (double-submits during a session-start rush) can't both take the last slot or the same plate
+def try_register_vehicle(member: discord.Member, vehicle: Dict[str, str]) -> Tuple[Optional[Dict[str, Any]], str]:
+    limit = max_vehicle_slots_for(member)
+    if vehicle_slots_used(member.id) >= limit:
+        return None, f"You have used all {limit} of your vehicle slots."
+    if plate_owner(vehicle["plate"]) is not None:
+        return None, f"Plate **{vehicle['plate']}** is already registered."
+    _insert_vehicle_local(member.id, vehicle)
+    return vehicle_store[member.id][-1], ""
+
+def try_unregister_vehicle(member: discord.Member, plate: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    remaining = remaining_unregister_uses_for(member.id, member)
+    if remaining <= 0:
+        return None, "You have no unregister uses left."
+    row = next((r for r in vehicle_store.get(member.id, ()) if str(r.get("plate", "")).lower() == plate.lower()), None)
+    if row is None:
+        return None, "You have no vehicle registered with that plate."
+    _remove_vehicle_by_plate_local(member.id, plate)
+    if not is_vip_vehicle(member):
+        unregister_uses[member.id] = remaining - 1
+    return row, ""
+
+# ================== APPEALS ==================
+# appeals_store: user_id -> that user's appeals, oldest first. Indexes are rebuilt on load:
+# a min-heap of (created_at, id) over pending appeals, so the oldest pops in O(log n), plus
+# id sets by status and by the moderator who took the appealed action.
+APPEALABLE_HISTORY_TYPES = ("ban", "kick", "mute", "infraction", "suspension", "staff_suspension", "termination")
+APPEAL_STATUSES = ("pending", "reviewing", "accepted", "denied")
+_appeals_by_id: Dict[int, Dict[str, Any]] = {}
+_appeal_queue: List[Tuple[float, int]] = []
+_appeals_by_status: Dict[str, set] = {status: set() for status in APPEAL_STATUSES}
+_appeals_by_moderator: Dict[int, set] = {}
+appeal_counter = 0
+
+def rebuild_appeal_index():
+    global appeal_counter
+    _appeals_by_id.clear()
+    _appeal_queue.clear()
+    _appeals_by_moderator.clear()
+    for ids in _appeals_by_status.values():
+        ids.clear()
+    for entries in appeals_store.values():
+        for appeal in entries:
+            _index_appeal(appeal)
+            if appeal["status"] == "pending":
+                _appeal_queue.append((appeal["created_at"], appeal["id"]))
+    heapq.heapify(_appeal_queue)
+    appeal_counter = max(_appeals_by_id, default=0)
+
+def _index_appeal(appeal: Dict[str, Any]):
+    _appeals_by_id[appeal["id"]] = appeal
+    _appeals_by_status.setdefault(appeal["status"], set()).add(appeal["id"])
+    if appeal.get("moderator"):
+        _appeals_by_moderator.setdefault(appeal["moderator"], set()).add(appeal["id"])
+
+def _set_appeal_status(appeal: Dict[str, Any], status: str):
+    _appeals_by_status[appeal["status"]].discard(appeal["id"])
+    appeal["status"] = status
+    _appeals_by_status[status].add(appeal["id"])
+    if status == "pending":
+        heapq.heappush(_appeal_queue, (appeal["created_at"], appeal["id"]))
+
+def latest_appealable_action(user_id: int) -> Optional[int]:
+    entries = history_store.get(user_id, [])
+    for i in range(len(entries) - 1, -1, -1):
+        if entries[i].get("type") in APPEALABLE_HISTORY_TYPES:
+            return i
+    return None
+
+def open_appeal(user_id: int, ticket_channel_id: Optional[int] = None) -> Dict[str, Any]:
+    """File an appeal against the user's latest moderation action (if any); reuses an open one."""
+    global appeal_counter
+    for appeal in appeals_store.get(user_id, ()):
+        if appeal["status"] in ("pending", "reviewing"):
+            if ticket_channel_id and not appeal.get("ticket_channel"):
+                appeal["ticket_channel"] = ticket_channel_id
+            return appeal
+    index = latest_appealable_action(user_id)
+    action = history_store[user_id][index] if index is not None else {}
+    appeal_counter += 1
+    appeal = {
+        "id": appeal_counter,
+        "user_id": user_id,
+        "status": "pending",
+        "created_at": time.time(),
+        "history_index": index,
+        "action_type": action.get("type"),
+        "action": action.get("action"),
+        "action_at": action.get("timestamp"),
+        "moderator": action.get("by"),
+        "ticket_channel": ticket_channel_id,
+        "reviewer": None,
+        "decided_at": None,
+        "note": ""
+    }
+    appeals_store.setdefault(user_id, []).append(appeal)
+    _index_appeal(appeal)
+    heapq.heappush(_appeal_queue, (appeal["created_at"], appeal["id"]))
+    request_save()
+    return appeal
+
+def next_appeal(reviewer_id: int) -> Optional[Dict[str, Any]]:
+    """Pop the oldest pending appeal not about the reviewer's own action and mark it reviewing."""
+    skipped = []
+    found = None
+    while _appeal_queue:
+        created_at, appeal_id = heapq.heappop(_appeal_queue)
+        appeal = _appeals_by_id.get(appeal_id)
+        if appeal is None or appeal["status"] != "pending":
+            continue  # stale heap entry
+        if appeal.get("moderator") == reviewer_id:
+            skipped.append((created_at, appeal_id))
+            continue
+        found = appeal
+        break
+    for item in skipped:
+        heapq.heappush(_appeal_queue, item)
+    if found is not None:
+        found["reviewer"] = reviewer_id
+        _set_appeal_status(found, "reviewing")
+        request_save()
+    return found
+
+def appealed_history_entry(appeal: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    entries = history_store.get(appeal["user_id"], [])
+    index = appeal.get("history_index")
+    if index is not None and index < len(entries) and entries[index].get("timestamp") == appeal.get("action_at"):
+        return entries[index]
+    # history merged on load can shift positions; fall back to the action's own timestamp
+    return next((e for e in entries if e.get("timestamp") == appeal.get("action_at")
+                 and e.get("type") == appeal.get("action_type")), None)
+
+def decide_appeal(appeal: Dict[str, Any], outcome: str, by_id: int, note: str):
+    """Record the outcome on the appeal and write it back to the appealed history entry."""
+    appeal["reviewer"] = by_id
+    appeal["decided_at"] = time.time()
+    appeal["note"] = note
+    _set_appeal_status(appeal, outcome)
+    entry = appealed_history_entry(appeal)
+    if entry is not None:
+        entry["appeal"] = {"id": appeal["id"], "outcome": outcome, "by": by_id}
+    add_history_entry(appeal["user_id"], "appeal", f"Appeal #{appeal['id']} {outcome}: {appeal.get('action') or 'no linked action'}",
+                      by_id, extra=note)
+    request_save()
+
+def appeals_matching(status: Optional[str] = None, moderator_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Appeals filtered through the status/moderator indexes, oldest first."""
+    ids: Optional[set] = None
+    if status:
+        ids = _appeals_by_status.get(status, set())
+    if moderator_id:
+        by_mod = _appeals_by_moderator.get(moderator_id, set())
+        ids = by_mod if ids is None else ids & by_mod
+    if ids is None:
+        ids = set(_appeals_by_id)
+    return sorted((_appeals_by_id[i] for i in ids), key=lambda a: a["created_at"])
+
+# ================== VEHICLE INDEX ==================
+# vehicle_store is keyed by owner; the registry browser and bulk tools need it by plate and by
+# make/state/usage. Keys are (plate, user_id), kept sorted so a page cursor is just the last
+# key shown: the next page starts at bisect_right(keys, cursor), however the store changed.
+VEHICLE_INDEX_FIELDS = ("make", "state", "usage")
+VEHICLE_FIELDS = ("year", "make", "model", "color", "plate", "state", "usage")
+VEHICLE_PAGE_SIZE = 10
+VEHICLE_IMPORT_MAX_BYTES = 5 * 1024 * 1024
+VEHICLE_IMPORT_MAX_ROWS = 50_000
+VEHICLE_PLATE_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9 -]{0,9}$")
+
+VehicleKey = Tuple[str, int]
+vehicle_keys: List[VehicleKey] = []
+vehicle_rows: Dict[VehicleKey, List[Dict[str, Any]]] = {}
+vehicle_field_index: Dict[str, Dict[str, List[VehicleKey]]] = {field: {} for field in VEHICLE_INDEX_FIELDS}
+
+def vehicle_key(user_id: int, row: Dict[str, Any]) -> VehicleKey:
+    return (str(row.get("plate") or "").lower(), user_id)
+
+def _index_add(keys: List[VehicleKey], key: VehicleKey) -> bool:
+    i = bisect.bisect_left(keys, key)
+    if i == len(keys) or keys[i] != key:
+        keys.insert(i, key)
+        return True
+    return False
+
+def _index_remove(keys: List[VehicleKey], key: VehicleKey):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+def index_vehicle(user_id: int, row: Dict[str, Any]):
+    key = vehicle_key(user_id, row)
+    vehicle_rows.setdefault(key, []).append(row)
+    if _index_add(vehicle_keys, key):
+        plate_index.add(str(row.get("plate") or ""), key[0])
+    for field in VEHICLE_INDEX_FIELDS:
+        value = str(row.get(field) or "").lower()
+        if value not in vehicle_field_index[field]:
+            vehicle_value_index[field].add(value)
+        _index_add(vehicle_field_index[field].setdefault(value, []), key)
+
+def unindex_vehicle_plate(user_id: int, plate: str):
+    key = (plate.lower(), user_id)
+    for row in vehicle_rows.pop(key, []):
+        for field in VEHICLE_INDEX_FIELDS:
+            value = str(row.get(field) or "").lower()
+            keys = vehicle_field_index[field].get(value)
+            if keys is not None:
+                _index_remove(keys, key)
+                if not keys:
+                    del vehicle_field_index[field][value]
+                    vehicle_value_index[field].remove(value)
+        plate_index.remove(str(row.get("plate") or ""), key[0])
+    _index_remove(vehicle_keys, key)
+
+def build_vehicle_index(store: Dict[int, List[Dict[str, Any]]]):
+    """Fresh index structures for `store`; reads no live index, so it can run off the event loop.
+    install_vehicle_index() swaps the result in."""
+    rows_by_key: Dict[VehicleKey, List[Dict[str, Any]]] = {}
+    field_index: Dict[str, Dict[str, List[VehicleKey]]] = {field: {} for field in VEHICLE_INDEX_FIELDS}
+    for user_id, rows in store.items():
+        for row in rows:
+            key = vehicle_key(user_id, row)
+            rows_by_key.setdefault(key, []).append(row)
+            for field in VEHICLE_INDEX_FIELDS:
+                field_index[field].setdefault(str(row.get(field) or "").lower(), []).append(key)
+    for index in field_index.values():
+        for value, keys in index.items():
+            index[value] = sorted(set(keys))
+    value_index = {field: PrefixIndex(v for v in index if v) for field, index in field_index.items()}
+    plates = PrefixIndex((str(rows[0].get("plate") or ""), key[0]) for key, rows in rows_by_key.items())
+    return sorted(rows_by_key), rows_by_key, field_index, value_index, plates
+
+def install_vehicle_index(built):
+    global plate_index
+    keys, rows_by_key, field_index, value_index, plate_index = built
+    vehicle_keys[:] = keys
+    vehicle_rows.clear()
+    vehicle_rows.update(rows_by_key)
+    vehicle_field_index.update(field_index)
+    vehicle_value_index.update(value_index)
+
+def rebuild_vehicle_index():
+    install_vehicle_index(build_vehicle_index(vehicle_store))
+
+def _owner_keys(owner_id: int) -> List[VehicleKey]:
+    return sorted({vehicle_key(owner_id, row) for row in vehicle_store.get(owner_id, ())})
+
+def vehicle_page(filters: Dict[str, str], cursor: Optional[VehicleKey] = None, limit: int = VEHICLE_PAGE_SIZE,
+                 owner_id: Optional[int] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], Optional[VehicleKey]]:
+    """Up to `limit` (user_id, row) pairs after `cursor`, plus the cursor for the next page
+    (None on the last page). Walks the smallest matching index and checks the other filters per row."""
+    filters = {field: value.lower() for field, value in filters.items() if value}
+    keys = vehicle_keys if owner_id is None else _owner_keys(owner_id)
+    for field, value in filters.items():
+        candidate = vehicle_field_index[field].get(value, [])
+        if len(candidate) < len(keys):
+            keys = candidate
+    def matching_rows(key: VehicleKey) -> List[Dict[str, Any]]:
+        if owner_id is not None and key[1] != owner_id:
+            return []  # a field index walked in place of the owner's keys lists everyone's rows
+        return [row for row in vehicle_rows.get(key, ())
+                if all(str(row.get(field) or "").lower() == value for field, value in filters.items())]
+
+    start = bisect.bisect_right(keys, cursor) if cursor is not None else 0
+    page: List[Tuple[int, Dict[str, Any]]] = []
+    for i in range(start, len(keys)):
+        key = keys[i]
+        page.extend((key[1], row) for row in matching_rows(key))
+        if len(page) >= limit:
+            # Only hand out a cursor if a later key still matches, so "Next" never opens an empty page
+            more = any(matching_rows(keys[j]) for j in range(i + 1, len(keys)))
+            return page, (key if more else None)
+    return page, None
+
+def vehicle_filter_count(filters: Dict[str, str], owner_id: Optional[int] = None) -> int:
+    filters = {field: value.lower() for field, value in filters.items() if value}
+    if owner_id is not None:
+        return sum(
+            1 for row in vehicle_store.get(owner_id, ())
+            if all(str(row.get(f) or "").lower() == v for f, v in filters.items())
+        )
+    if not filters:
+        return sum(len(rows) for rows in vehicle_rows.values())
+    field, value = min(filters.items(), key=lambda fv: len(vehicle_field_index[fv[0]].get(fv[1], ())))
+    return sum(
+        1 for key in vehicle_field_index[field].get(value, ())
+        for row in vehicle_rows.get(key, ())
+        if all(str(row.get(f) or "").lower() == v for f, v in filters.items())
+    )
+
+def validate_vehicle(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, str]], str]:
+    """Normalise a vehicle from a form or import row; returns (vehicle, "") or (None, reason)."""
+    vehicle = {field: str(raw.get(field) or "").strip() for field in VEHICLE_FIELDS}
+    missing = [field for field in VEHICLE_FIELDS if not vehicle[field]]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    if not vehicle["year"].isdigit() or not 1900 <= int(vehicle["year"]) <= datetime.utcnow().year + 1:
+        return None, f"invalid year {vehicle['year']!r}"
+    if not VEHICLE_PLATE_RE.match(vehicle["plate"]):
+        return None, f"invalid plate {vehicle['plate']!r}"
+    vehicle["plate"] = vehicle["plate"].upper()
+    for field in ("make", "model", "color", "state", "usage"):
+        if len(vehicle[field]) > 32 or "\n" in vehicle[field]:
+            return None, f"{field} too long"
+    return vehicle, ""
+
+def plate_owner(plate: str) -> Optional[int]:
+    i = bisect.bisect_left(vehicle_keys, (plate.lower(), -1))
+    if i < len(vehicle_keys) and vehicle_keys[i][0] == plate.lower():
+        return vehicle_keys[i][1]
+    return None
+
+async def import_vehicles(lines, fmt: str, dry_run: bool = False) -> Tuple[int, int, List[str]]:
+    """Stream CSV (with a header row) or JSONL lines into the store.
+
+    `lines` is an async iterator of bytes lines. Valid rows are collected while the file streams
+    in and inserted together only once it has been read to the end, so a failed download imports
+    nothing; they are then persisted with one storage write. Invalid rows are skipped. Returns
+    (imported, skipped, first few errors).
+    """
+    header: Optional[List[str]] = None
+    imported = skipped = 0
+    errors: List[str] = []
+    seen: Dict[str, int] = {}
+    rows: List[Tuple[int, int, Dict[str, str]]] = []  # (line, user_id, vehicle)
+    line_no = 0
+    async for raw_line in lines:
+        line_no += 1
+        text = raw_line.decode("utf-8-sig" if line_no == 1 else "utf-8", errors="replace").strip()
+        if not text:
+            continue
+        if imported + skipped >= VEHICLE_IMPORT_MAX_ROWS:
+            errors.append(f"stopped after {VEHICLE_IMPORT_MAX_ROWS} rows")
+            break
+        try:
+            if fmt == "csv":
+                cells = next(csv.reader([text]))
+                if header is None:
+                    header = [c.strip().lower() for c in cells]
+                    if "user_id" not in header:
+                        return 0, 0, ["CSV header must include user_id"]
+                    continue
+                raw = dict(zip(header, cells))
+            else:
+                raw = json.loads(text)
+                if not isinstance(raw, dict):
+                    raise ValueError("not an object")
+            user_id = int(str(raw.get("user_id", "")).strip())
+        except Exception:
+            skipped += 1
+            if len(errors) < 10:
+                errors.append(f"line {line_no}: unreadable row")
+            continue
+        vehicle, reason = validate_vehicle(raw)
+        if vehicle is not None:
+            owner = seen.get(vehicle["plate"], plate_owner(vehicle["plate"]))
+            if owner is not None:
+                vehicle, reason = None, f"plate {vehicle['plate']} already registered to {owner}"
+        if vehicle is None:
+            skipped += 1
+            if len(errors) < 10:
+                errors.append(f"line {line_no}: {reason}")
+            continue
+        seen[vehicle["plate"]] = user_id
+        imported += 1
+        rows.append((line_no, user_id, vehicle))
+        if line_no % 500 == 0:
+            await asyncio.sleep(0)
+    if dry_run:
+        return imported, skipped, errors
+    for i, (line_no, user_id, vehicle) in enumerate(rows, 1):
+        owner = plate_owner(vehicle["plate"])  # registered while the file streamed, or between batches
+        if owner is not None:
+            imported -= 1
+            skipped += 1
+            if len(errors) < 10:
+                errors.append(f"line {line_no}: plate {vehicle['plate']} already registered to {owner}")
+            continue
+        _insert_vehicle_local(user_id, vehicle)
+        if i % 500 == 0:
+            await asyncio.sleep(0)
+    if imported:
+        await persist()
+    return imported, skipped, errors
+
+# ================== INFRACTION LEDGER ==================
+def rebuild_infraction_index():
+    global infraction_counter
+    _infraction_expiry.clear()
+    _infractions_by_id.clear()
+    civilian_infractions.clear()
+    for user_id, entries in infraction_ledger.items():
+        for entry in entries:
+            _infractions_by_id[entry["id"]] = entry
+            if entry.get("active"):
+                _infraction_expiry.append((entry["expires_at"], user_id, entry["id"]))
+                civilian_infractions[user_id] = civilian_infractions.get(user_id, 0) + 1
+    heapq.heapify(_infraction_expiry)
+    infraction_counter = max(_infractions_by_id, default=0)
+
+def next_infraction_level(user_id: int) -> int:
+    return min(civilian_infractions.get(user_id, 0) + 1, len(INFRACT_ROLE_IDS))
+
+def record_infraction(user_id: int, by_id: int, reason: str, proof: str) -> Dict[str, Any]:
+    global infraction_counter
+    infraction_counter += 1
+    now = time.time()
+    entry = {
+        "id": infraction_counter,
+        "level": next_infraction_level(user_id),
+        "reason": reason,
+        "proof": proof,
+        "by": by_id,
+        "issued_at": now,
+        "expires_at": now + INFRACTION_EXPIRY_DAYS * 86400,
+        "active": True
+    }
+    infraction_ledger.setdefault(user_id, []).append(entry)
+    _infractions_by_id[entry["id"]] = entry
+    heapq.heappush(_infraction_expiry, (entry["expires_at"], user_id, entry["id"]))
+    civilian_infractions[user_id] = civilian_infractions.get(user_id, 0) + 1
+    add_history_entry(user_id, "infraction", f"Session Warning {entry['level']}: {reason}", by_id, extra=proof)
+    request_save()
+    return entry
+
+def expire_infractions(now: float) -> Dict[int, int]:
+    """Deactivate every warning past its expiry; returns {user_id: remaining active count}."""
+    affected: Dict[int, int] = {}
+    while _infraction_expiry and _infraction_expiry[0][0] <= now:
+        _, user_id, infraction_id = heapq.heappop(_infraction_expiry)
+        entry = _infractions_by_id.get(infraction_id)
+        if not entry or not entry.get("active"):
+            continue
+        entry["active"] = False
+        remaining = civilian_infractions.get(user_id, 1) - 1
+        if remaining > 0:
+            civilian_infractions[user_id] = remaining
+        else:
+            civilian_infractions.pop(user_id, None)
+        affected[user_id] = max(remaining, 0)
+    if affected:
+        request_save()
+    return affected
+
+def infraction_total(user_id: int) -> int:
+    return len(infraction_ledger.get(user_id, ()))
+
+async def apply_infraction_decay(guild: discord.Guild, affected: Dict[int, int]) -> int:
+    calls = []
+    members, _ = await resolve_members(guild, list(affected))
+    for member in members:
+        expired_roles = [r for r in member.roles if r.id in infract_role_ids(guild.id)[affected[member.id]:]]
+        if expired_roles:
+            calls.append(functools.partial(member.remove_roles, *expired_roles, reason="Session warning expired"))
+    failed = await run_batched(calls, size=INFRACTION_DECAY_BATCH)
+    return len(calls) - failed
+
+@scheduler.handler("infraction_decay")
+async def run_infraction_decay(payload: Dict[str, Any]):
+    affected = expire_infractions(time.time())
+    if not affected:
+        return
+    for guild in bot.guilds:
+        try:
+            await apply_infraction_decay(guild, affected)
+        except Exception:
+            pass
+
 # ================== AUTOCOMPLETE HANDLERS ==================
+AUTOCOMPLETE_LIMIT = 25  # Discord shows at most 25 choices
+_WORD_START_RE = re.compile(r"(?<=[\s\-/(_])[^\s\-/(_]")
+
+class PrefixIndex:
+    """Autocomplete source kept as a sorted array of (token, label, value), searched with bisect.
+
+    Each label is indexed under its full lowercased text and under every later word, so "gre"
+    and "down" both find "Greenville Downtown" (and "log" finds "action_log_channel"). A query costs
+    O(log n + 25); add/remove keep the array sorted as the data changes.
+    """
+
+    def __init__(self, items=(), keep_order: bool = False):
+        self._entries: List[Tuple[str, str, str]] = []
+        self._default: Optional[List[Tuple[str, str]]] = None
+        self.rebuild(items)
+        if keep_order:
+            # Short static lists: show them in their declared order before anything is typed
+            self._default = [(label, value) for label, value in self._pairs(items)][:AUTOCOMPLETE_LIMIT]
+
+    @staticmethod
+    def _pairs(items):
+        return [(item, item) if isinstance(item, str) else (str(item[0]), str(item[1])) for item in items]
+
+    @staticmethod
+    def _tokens(label: str) -> List[str]:
+        text = label.lower()
+        return [text] + [text[m.start():] for m in _WORD_START_RE.finditer(text)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def rebuild(self, items):
+        self._entries = sorted(
+            (token, label, value) for label, value in self._pairs(items) for token in self._tokens(label)
+        )
+
+    def add(self, label: str, value: Optional[str] = None):
+        value = label if value is None else value
+        for token in self._tokens(label):
+            entry = (token, label, value)
+            i = bisect.bisect_left(self._entries, entry)
+            if i == len(self._entries) or self._entries[i] != entry:
+                self._entries.insert(i, entry)
+
+    def remove(self, label: str, value: Optional[str] = None):
+        value = label if value is None else value
+        for token in self._tokens(label):
+            entry = (token, label, value)
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def search(self, current: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[Tuple[str, str]]:
+        query = current.strip().lower()
+        if not query and self._default is not None:
+            return self._default[:limit]
+        results: List[Tuple[str, str]] = []
+        seen = set()
+        entries = self._entries
+        for i in range(bisect.bisect_left(entries, (query,)), len(entries)):
+            token, label, value = entries[i]
+            if not token.startswith(query):
+                break
+            if (label, value) not in seen:
+                seen.add((label, value))
+                results.append((label, value))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def choices(self, current: str) -> List[app_commands.Choice[str]]:
+        return [app_commands.Choice(name=label[:100], value=value[:100]) for label, value in self.search(current)]
+
+frp_index = PrefixIndex(FRP_OPTIONS, keep_order=True)
+leo_index = PrefixIndex(LEO_OPTIONS, keep_order=True)
+house_index = PrefixIndex(HOUSE_OPTIONS, keep_order=True)
+aorp_index = PrefixIndex(AORP_OPTIONS, keep_order=True)
+peacetime_index = PrefixIndex(PEACETIME_OPTIONS, keep_order=True)
+
 async def frp_ac(interaction: discord.Interaction, current: str):
-    return [app_commands.Choice(name=o, value=o) for o in FRP_OPTIONS if current.lower() in o.lower()][:25]
+    return frp_index.choices(current)
 
 async def leo_ac(interaction: discord.Interaction, current: str):
-    return [app_commands.Choice(name=o, value=o) for o in LEO_OPTIONS if current.lower() in o.lower()][:25]
+    return leo_index.choices(current)
 
 async def hc_ac(interaction: discord.Interaction, current: str):
-    return [app_commands.Choice(name=o, value=o) for o in HOUSE_OPTIONS if current.lower() in o.lower()][:25]
+    return house_index.choices(current)
 
 async def aorp_ac(interaction: discord.Interaction, current: str):
-    return [app_commands.Choice(name=o, value=o) for o in AORP_OPTIONS if current.lower() in o.lower()][:25]
+    return aorp_index.choices(current)
 
 async def peacetime_ac(interaction: discord.Interaction, current: str):
-    return [app_commands.Choice(name=o, value=o) for o in PEACETIME_OPTIONS if current.lower() in o.lower()][:25]
+    return peacetime_index.choices(current)
+
+# Dynamic sources, kept in step by the stores that own the data (see index_vehicle)
+plate_index = PrefixIndex()  # registered plates across all members
+vehicle_value_index: Dict[str, PrefixIndex] = {field: PrefixIndex() for field in VEHICLE_INDEX_FIELDS}
+
+# ================== EMBED TEMPLATES ==================
+_FORMATTER = string.Formatter()
+
+class TemplateEmbed(discord.Embed):
+    """An Embed rendered from a template. to_dict() (called by discord.py on every send) returns
+    the payload it was rendered from instead of serialising the embed again, so rendered embeds
+    are sent as they are; build a plain discord.Embed for anything that needs changing."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._payload)
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "TemplateEmbed":
+        # The constructor and setters cover everything a builder can produce, and are cheaper
+        # than Embed.from_dict, which probes (and raises KeyError for) every part it might hold
+        embed = cls(title=payload.get("title"), description=payload.get("description"), url=payload.get("url"),
+                    colour=payload.get("color"), timestamp=discord.utils.parse_time(payload.get("timestamp")))
+        for field in payload.get("fields", ()):
+            embed.add_field(name=field["name"], value=field["value"], inline=field.get("inline", True))
+        if "author" in payload:
+            author = payload["author"]
+            embed.set_author(name=author.get("name"), url=author.get("url"), icon_url=author.get("icon_url"))
+        if "footer" in payload:
+            embed.set_footer(text=payload["footer"].get("text"), icon_url=payload["footer"].get("icon_url"))
+        if "image" in payload:
+            embed.set_image(url=payload["image"].get("url"))
+        if "thumbnail" in payload:
+            embed.set_thumbnail(url=payload["thumbnail"].get("url"))
+        embed._payload = payload
+        return embed
+
+class EmbedTemplate:
+    """An embed built once by its builder and kept as its to_dict() payload.
+
+    A template without placeholders renders to one shared TemplateEmbed. Strings may carry
+    `{name}` placeholders; render() then copies only the containers on the way to those strings,
+    fills them and returns a new TemplateEmbed, so the literal parts are never rebuilt.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+        self._payload: Optional[Dict[str, Any]] = None
+        self._slots: List[Tuple[Tuple[Any, ...], List[Tuple[str, Optional[str], str]]]] = []
+        self._static: Optional[TemplateEmbed] = None
+
+    def _build(self):
+        payload = self.builder().to_dict()
+        slots: List[Tuple[Tuple[Any, ...], List[Tuple[str, Optional[str], str]]]] = []
+
+        def visit(node, path):
+            for key, value in (node.items() if isinstance(node, dict) else enumerate(node)):
+                if isinstance(value, str):
+                    # Pre-split into (literal, field, spec) parts: joining them is several times
+                    # faster than str.format_map re-parsing a long description on every render
+                    parts = [(literal, field, spec or "") for literal, field, spec, _ in _FORMATTER.parse(value)]
+                    if any(field is not None for _, field, _ in parts):
+                        slots.append((path + (key,), parts))
+                elif isinstance(value, (dict, list)):
+                    visit(value, path + (key,))
+
+        visit(payload, ())
+        self._payload, self._slots = payload, slots
+        if not slots:
+            self._static = TemplateEmbed.from_payload(payload)
+
+    def render(self, **values: Any) -> discord.Embed:
+        if self._payload is None:
+            self._build()
+        if self._static is not None:
+            return self._static
+        data = dict(self._payload)
+        for path, parts in self._slots:
+            node = data
+            for key in path[:-1]:
+                # Copy each container on the way down; everything off the path stays shared
+                child = node[key]
+                child = node[key] = list(child) if isinstance(child, list) else dict(child)
+                node = child
+            out = []
+            for literal, field, spec in parts:
+                out.append(literal)
+                if field is not None:
+                    out.append(format(values[field], spec))
+            node[path[-1]] = "".join(out)
+        return TemplateEmbed.from_payload(data)
+
+embed_templates: Dict[str, EmbedTemplate] = {}
+
+def embed_template(name: str):
+    """Register an embed builder as a template; it runs once, on first render."""
+    def decorator(builder):
+        embed_templates[name] = EmbedTemplate(builder)
+        return builder
+    return decorator
+
+def render_embed(name: str, **values: Any) -> discord.Embed:
+    return embed_templates[name].render(**values)
 
 # ================== EMBED BUILDERS ==================
+@embed_template("panel")
 def build_panel_embed() -> discord.Embed:
     embed = discord.Embed(
         title="__**HexVille | Server Support**__",
@@ -349,10 +2536,9 @@ def build_panel_embed() -> discord.Embed:
     )
     return embed
 
-def build_staff_info_embeds() -> List[discord.Embed]:
-    embeds: List[discord.Embed] = []
-
-    embed1 = discord.Embed(
+@embed_template("staff_info_rules")
+def _staff_info_rules_embed() -> discord.Embed:
+    return discord.Embed(
         title=f"{HEART} __**HexVille | Employee Information**__ {HEART}",
         description=(
             "Greetings, and congratulations on making it to the staff team of HexVille. "
@@ -381,9 +2567,10 @@ def build_staff_info_embeds() -> List[discord.Embed]:
         ),
         color=BOT_COLOR
     )
-    embeds.append(embed1)
 
-    embed2 = discord.Embed(
+@embed_template("staff_info_channels")
+def _staff_info_channels_embed() -> discord.Embed:
+    return discord.Embed(
         title="__**Staff Channel Usage**__",
         description=(
             f"{DOT} #staff-announcements: All staff-related announcements.\n"
@@ -408,9 +2595,10 @@ def build_staff_info_embeds() -> List[discord.Embed]:
         ),
         color=BOT_COLOR
     )
-    embeds.append(embed2)
 
-    embed3 = discord.Embed(
+@embed_template("staff_info_commands")
+def _staff_info_commands_embed() -> discord.Embed:
+    return discord.Embed(
         title="__**Session & Moderation Commands**__",
         description=(
             "__**Session Commands**__\n"
@@ -430,9 +2618,9 @@ def build_staff_info_embeds() -> List[discord.Embed]:
         ),
         color=BOT_COLOR
     )
-    embeds.append(embed3)
 
-    return embeds
+def build_staff_info_embeds() -> List[discord.Embed]:
+    return [render_embed(name) for name in ("staff_info_rules", "staff_info_channels", "staff_info_commands")]
 
 async def _get_mute_gif_bytes() -> Optional[bytes]:
     global _mute_gif_bytes
@@ -449,19 +2637,58 @@ async def _get_mute_gif_bytes() -> Optional[bytes]:
     except Exception:
         return None
 
-async def send_mute_prompt(channel: discord.abc.Messageable):
+def _cdn_url_expiry(url: str) -> float:
+    # Discord attachment links are signed; `ex` is the expiry as a hex unix timestamp
+    try:
+        return float(int(urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)["ex"][0], 16))
+    except Exception:
+        return time.time() + 12 * 3600
+
+async def send_mute_prompt(channel: discord.abc.Messageable) -> Optional[discord.Message]:
+    global _mute_gif_cdn
     embed = discord.Embed(
         description="<:bell:1459329848161075200> Tired of __pings__? **Mute this channel**.",
         color=BOT_COLOR
     )
+    # Upload the GIF once, then point later prompts at its CDN link until it nears expiry
+    if _mute_gif_cdn and _mute_gif_cdn[1] - time.time() > 3600:
+        embed.set_image(url=_mute_gif_cdn[0])
+        return await send_queued(channel, PRIORITY_USER_POST, embed=embed)
     gif_bytes = await _get_mute_gif_bytes()
     if gif_bytes:
         file = discord.File(io.BytesIO(gif_bytes), filename="mute.gif")
         embed.set_image(url="attachment://mute.gif")
-        await channel.send(embed=embed, file=file)
-        return
+        msg = await send_queued(channel, PRIORITY_USER_POST, embed=embed, file=file)
+        url = (msg.embeds[0].image.url if msg.embeds else None) or (msg.attachments[0].url if msg.attachments else None)
+        if url:
+            _mute_gif_cdn = (url, _cdn_url_expiry(url))
+        return msg
     embed.set_image(url=MUTE_GIF_URL)
-    await channel.send(embed=embed)
+    return await send_queued(channel, PRIORITY_USER_POST, embed=embed)
+
+def note_mute_hint_message(channel: discord.abc.Messageable):
+    """Count a message in a mute-hint channel; post a prompt once the cooldown has passed and
+    the previous prompt has scrolled out of view."""
+    state = mute_hint_state.get(channel.id)
+    if state is None:
+        state = mute_hint_state[channel.id] = {"last_at": float("-inf"), "since": MUTE_HINT_SCROLL_MESSAGES, "pending": False}
+    state["since"] += 1
+    if state["pending"] or state["since"] < MUTE_HINT_SCROLL_MESSAGES:
+        return
+    if time.monotonic() - state["last_at"] < MUTE_HINT_COOLDOWN_SECONDS:
+        return
+    state["pending"] = True
+    asyncio.get_running_loop().call_later(MUTE_HINT_DEBOUNCE_SECONDS, lambda: spawn(_post_mute_hint(channel, state)))
+
+async def _post_mute_hint(channel: discord.abc.Messageable, state: Dict[str, Any]):
+    try:
+        await send_mute_prompt(channel)
+        state["last_at"] = time.monotonic()
+        state["since"] = 0
+    except Exception:
+        pass
+    finally:
+        state["pending"] = False
 
 def build_ticket_embed(user: discord.Member, ticket_type: str, priority: str = "Normal") -> discord.Embed:
     return discord.Embed(
@@ -480,6 +2707,7 @@ def build_ticket_embed(user: discord.Member, ticket_type: str, priority: str = "
 def build_casefile_embed(user: discord.Member) -> discord.Embed:
     strikes = staff_strikes.get(user.id, 0)
     civ = civilian_infractions.get(user.id, 0)
+    civ_total = infraction_total(user.id)
     notes = notes_store.get(user.id, [])
     history_entries = history_store.get(user.id, [])
 
@@ -493,7 +2721,7 @@ def build_casefile_embed(user: discord.Member) -> discord.Embed:
 
     embed = discord.Embed(title=f"📁 Casefile — {user.display_name}", color=BOT_COLOR)
     embed.add_field(name="Staff Strikes", value=str(strikes), inline=False)
-    embed.add_field(name="Civilian Infractions", value=str(civ), inline=False)
+    embed.add_field(name="Civilian Infractions", value=f"{civ} active / {civ_total} total", inline=False)
     embed.add_field(name="Internal Notes", value=note_text, inline=False)
     embed.add_field(name="Recent History", value=hist_text, inline=False)
     return embed
@@ -506,22 +2734,58 @@ IMG_RELEASE = "https://cdn.discordapp.com/attachments/1459425676305371186/145958
 IMG_REINVITES = "https://cdn.discordapp.com/attachments/1459425676305371186/1459581334082289825/session-reinvites.png"
 IMG_END = "https://cdn.discordapp.com/attachments/1459425676305371186/1459581333599686696/sessionend-hexville.png"
 
-@bot.tree.command(name="startup", description="Begin session startup")
-@app_commands.describe(goal="Reactions required to progress")
-async def startup(interaction: discord.Interaction, goal: int = 6):
-    if not is_staff(interaction):
-        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
-    await interaction.response.defer(ephemeral=True)
-    session_log[interaction.channel.id] = {"start": datetime.utcnow(), "host": interaction.user.mention, "host_id": interaction.user.id}
+@embed_template("session_startup")
+def _session_startup_embed() -> discord.Embed:
     embed = discord.Embed(
         title=f"{HEART} __**HexVille, Session Startup**__",
         description=(
-            f"{DOT} A session is **currently being commenced** by **{interaction.user.mention}**, in order to start, we require **{goal}+ Reactions**!\n\n"
+            f"{DOT} A session is **currently being commenced** by **{{host}}**, in order to start, we require **{{goal}}+ Reactions**!\n\n"
             f"{DOT}Before participating in any official **HexVille** sessions, please ensure you've read the rules, registered your vehicle via the `/registervehicle` command, and reviewed the Blacklisted Vehicle List."
         ),
         color=BOT_COLOR
     )
-    embed.set_image(url=IMG_STARTUP)
+    return embed.set_image(url=IMG_STARTUP)
+
+@embed_template("session_reinvites")
+def _session_reinvites_embed() -> discord.Embed:
+    embed = discord.Embed(title=f"{HEART} __**HexVille, Re-Invites**__", description=f"{ORANGE}React with {CHECK_EMOJI} to release the session link.", color=BOT_COLOR)
+    return embed.set_image(url=IMG_REINVITES)
+
+@embed_template("session_release")
+def _session_release_embed() -> discord.Embed:
+    embed = discord.Embed(title=f"{HEART} __**HexVille, Session Release**__", description="__Session Information__\n{session_info}", color=BOT_COLOR)
+    return embed.set_image(url=IMG_RELEASE)
+
+@embed_template("session_end")
+def _session_end_embed() -> discord.Embed:
+    embed = discord.Embed(title=f"{HEART} __**HexVille, Session End**__", description=f"{ORANGE}{{user}} has ended the session.\n-# HexVille Staff Team", color=BOT_COLOR)
+    return embed.set_image(url=IMG_END)
+
+@embed_template("session_log")
+def _session_log_embed() -> discord.Embed:
+    return discord.Embed(
+        title="📘 Session Log",
+        description=(
+            f"{DOT} **Start Time:** {{start}}\n"
+            f"{DOT} **End Time:** {{end}}\n"
+            f"{DOT} **Total Time:** {{total}}\n"
+            f"{DOT} **Session Host:** {{host}}\n"
+            f"{DOT} **Session Co-Host(s):** {{cohosts}}\n"
+            f"{DOT} **Session Supervisor(s):** {{supervisors}}\n"
+            f"{DOT} **Additional Notes:** {{notes}}"
+        ),
+        color=BOT_COLOR
+    )
+
+@bot.tree.command(name="startup", description="Begin session startup")
+@app_commands.describe(goal="Reactions required to progress")
+@traced
+async def startup(interaction: discord.Interaction, goal: int = 6):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    session_log[interaction.channel.id] = {"start": datetime.utcnow(), "host": interaction.user.mention, "host_id": interaction.user.id}
+    embed = render_embed("session_startup", host=interaction.user.mention, goal=goal)
     msg = await interaction.channel.send("@everyone", embed=embed)
     try:
         await msg.add_reaction(CHECK_EMOJI)
@@ -535,12 +2799,12 @@ async def startup(interaction: discord.Interaction, goal: int = 6):
 
 @app_commands.autocomplete(frp=frp_ac, leo=leo_ac, hc=hc_ac, aorp=aorp_ac, peacetime=peacetime_ac)
 @bot.tree.command(name="reinvites", description="Send session reinvites")
+@traced
 async def reinvites(interaction: discord.Interaction, link: str, goal: int, frp: str, leo: str, hc: str, aorp: str, peacetime: str):
     if not is_staff(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
     await interaction.response.defer(ephemeral=True)
-    embed = discord.Embed(title=f"{HEART} __**HexVille, Re-Invites**__", description=f"{ORANGE}React with {CHECK_EMOJI} to release the session link.", color=BOT_COLOR)
-    embed.set_image(url=IMG_REINVITES)
+    embed = render_embed("session_reinvites")
     msg = await interaction.channel.send("@everyone", embed=embed)
     try:
         await msg.add_reaction(CHECK_EMOJI)
@@ -560,17 +2824,18 @@ async def reinvites(interaction: discord.Interaction, link: str, goal: int, frp:
 
 @app_commands.autocomplete(frp=frp_ac, leo=leo_ac, hc=hc_ac, aorp=aorp_ac, peacetime=peacetime_ac)
 @bot.tree.command(name="release", description="Release session to Civilians")
+@traced
 async def release(interaction: discord.Interaction, link: str, frp: str, leo: str, hc: str, aorp: str, peacetime: str):
     if not is_staff(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
     await interaction.response.defer(ephemeral=True)
     s = {"frp": frp, "leo": leo, "house": hc, "aorp": aorp, "peacetime": peacetime}
-    embed = discord.Embed(title=f"{HEART} __**HexVille, Session Release**__", description=f"__Session Information__\n{session_info(s)}", color=BOT_COLOR)
-    embed.set_image(url=IMG_RELEASE)
-    await interaction.channel.send(f"<@&{CIVILIAN_ROLE_ID}>", embed=embed, view=None)
+    embed = render_embed("session_release", session_info=session_info(s))
+    await interaction.channel.send(f"<@&{guild_cfg(interaction.guild)['civilian_role']}>", embed=embed, view=None)
     await interaction.followup.send("Session released to Civilians.", ephemeral=True)
 
 @bot.tree.command(name="end", description="End the session")
+@traced
 async def end(interaction: discord.Interaction):
     if not is_staff(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -581,31 +2846,103 @@ async def end(interaction: discord.Interaction):
     if data:
         start_time = data.get("start")
         total_time = end_time - start_time if start_time else "N/A"
-        log_channel = interaction.guild.get_channel(SESSION_LOG_CHANNEL_ID)
-        embed_log = discord.Embed(
-            title="📘 Session Log",
-            description=(
-                f"{DOT} **Start Time:** {start_time or 'N/A'}\n"
-                f"{DOT} **End Time:** {end_time}\n"
-                f"{DOT} **Total Time:** {total_time}\n"
-                f"{DOT} **Session Host:** {data.get('host', 'N/A')}\n"
-                f"{DOT} **Session Co-Host(s):** {data.get('cohosts', 'N/A')}\n"
-                f"{DOT} **Session Supervisor(s):** {data.get('supervisors', 'N/A')}\n"
-                f"{DOT} **Additional Notes:** {data.get('notes', 'N/A')}"
-            ),
-            color=BOT_COLOR
+        log_channel = interaction.guild.get_channel(guild_cfg(interaction.guild)["session_log_channel"])
+        embed_log = render_embed(
+            "session_log",
+            start=start_time or "N/A",
+            end=end_time,
+            total=total_time,
+            host=data.get("host", "N/A"),
+            cohosts=data.get("cohosts", "N/A"),
+            supervisors=data.get("supervisors", "N/A"),
+            notes=data.get("notes", "N/A")
         )
         if log_channel:
-            await log_channel.send(embed=embed_log)
+            await send_queued(log_channel, PRIORITY_LOG, embed=embed_log)
         session_log.pop(channel_id, None)
-    embed = discord.Embed(title=f"{HEART} __**HexVille, Session End**__", description=f"{ORANGE}{interaction.user.mention} has ended the session.\n-# HexVille Staff Team", color=BOT_COLOR)
-    embed.set_image(url=IMG_END)
+    embed = render_embed("session_end", user=interaction.user.mention)
     await interaction.channel.send(embed=embed)
     sessions.pop(interaction.channel.id, None)
     await interaction.followup.send("Session ended.", ephemeral=True)
 
+# ================== TICKET ACTIVITY ==================
+def touch_ticket(channel_id: int, ts: Optional[float] = None):
+    ticket_activity[channel_id] = ts if ts is not None else time.time()
+    ticket_activity.move_to_end(channel_id)
+    if ticket_warned.pop(channel_id, None) is not None:
+        request_save()
+
+def forget_ticket(channel_id: int):
+    ticket_activity.pop(channel_id, None)
+    ticket_warned.pop(channel_id, None)
+
+def is_open_ticket(channel: discord.abc.GuildChannel) -> bool:
+    topic = getattr(channel, "topic", None) or ""
+    return "ticket_owner:" in topic and "status:open" in topic
+
+def seed_ticket_activity(guild: discord.Guild):
+    """Index open tickets from channel metadata only (no history fetches)."""
+    category = guild.get_channel(get_guild_config(guild.id)["ticket_category"])
+    if category is None:
+        return
+    for channel in category.text_channels:
+        if not is_open_ticket(channel):
+            continue
+        last_id = channel.last_message_id
+        if channel.id in ticket_activity and ticket_warned.get(channel.id) == last_id:
+            continue  # nothing was said since our warning: keep the pre-warning activity time
+        ticket_warned.pop(channel.id, None)
+        last = discord.utils.snowflake_time(last_id) if last_id else channel.created_at
+        ticket_activity[channel.id] = max(last.timestamp(), ticket_activity.get(channel.id, 0.0))
+    for channel_id in [cid for cid in ticket_activity if bot.get_channel(cid) is None]:
+        forget_ticket(channel_id)
+    # Keep the index ordered oldest first after merging persisted and seeded times
+    for channel_id, _ in sorted(ticket_activity.items(), key=lambda kv: kv[1]):
+        ticket_activity.move_to_end(channel_id)
+
+@scheduler.handler("ticket_sweep")
+async def sweep_idle_tickets(payload: Dict[str, Any]):
+    now = time.time()
+    warn_before = now - TICKET_IDLE_WARN_HOURS * 3600
+    close_before = now - TICKET_IDLE_CLOSE_HOURS * 3600
+    stale = []
+    for channel_id, ts in ticket_activity.items():
+        if ts > warn_before:
+            break  # ordered oldest first: everything after this is fresh
+        stale.append((channel_id, ts))
+
+    for channel_id, ts in stale:
+        channel = bot.get_channel(channel_id)
+        if channel is None or not is_open_ticket(channel):
+            forget_ticket(channel_id)
+            continue
+        if channel_id in ticket_warned:
+            if ts <= close_before:
+                await close_ticket_channel(
+                    channel, channel.guild,
+                    f"Auto-close (inactive {TICKET_IDLE_CLOSE_HOURS}h)",
+                    f"Ticket inactive for {TICKET_IDLE_CLOSE_HOURS} hours"
+                )
+            continue
+        embed = discord.Embed(
+            title="⏳ Ticket Inactive",
+            description=(
+                f"{BLUEARROW} This ticket has had no activity for **{TICKET_IDLE_WARN_HOURS} hours**.\n"
+                f"{BLUEARROW} It will be closed <t:{int(ts + TICKET_IDLE_CLOSE_HOURS * 3600)}:R> unless someone replies."
+            ),
+            color=BOT_COLOR
+        )
+        try:
+            warning = await send_queued(channel, PRIORITY_USER_POST, embed=embed)
+            ticket_warned[channel_id] = warning.id
+        except Exception:
+            continue
+    if stale:
+        request_save()
+
 # ================== PANEL & TICKET SYSTEM ==================
-PANEL_EMBED = build_panel_embed()
+def get_panel_embed() -> discord.Embed:
+    return render_embed("panel")
 
 class SessionButton(ui.View):
     def __init__(self, link: str):
@@ -618,7 +2955,8 @@ class TicketCloseView(ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
-    @ui.button(label="Close Ticket", style=discord.ButtonStyle.danger, emoji="🔒")
+    @ui.button(label="Close Ticket", style=discord.ButtonStyle.danger, emoji="🔒", custom_id="hexville:ticket:close")
+    @traced
     async def close_ticket(self, interaction: discord.Interaction, button: ui.Button):
         channel = interaction.channel
         if not channel:
@@ -632,51 +2970,59 @@ class TicketCloseView(ui.View):
                 owner_id = None
 
         is_owner = (interaction.user.id == owner_id)
-        is_staff_user = has_role(interaction.user, ADMIN_ROLE_ID) or has_role(interaction.user, HIGHCOMMAND_ROLE_ID) or has_role(interaction.user, OWNERSHIP_ROLE_ID) or has_role(interaction.user, STAFF_TEAM_ROLE_ID)
+        is_staff_user = is_ticket_staff(interaction.user)
 
         if not (is_owner or is_staff_user):
             return await interaction.response.send_message("Only the ticket owner or staff can close this ticket.", ephemeral=True)
 
         await interaction.response.send_message("Ticket will be closed in 5 seconds...", ephemeral=True)
 
-        button.disabled = True
+        # This view instance is shared by every ticket, so disable the button on a throwaway copy
+        closed = ui.View(timeout=None)
+        closed.add_item(ui.Button(label=button.label, style=button.style, emoji=button.emoji, custom_id=button.custom_id, disabled=True))
+        closed.stop()
         try:
-            await interaction.message.edit(view=self)
+            await interaction.message.edit(view=closed)
         except Exception:
             pass
 
-        try:
-            await asyncio.sleep(5)
+        await asyncio.sleep(5)
+        if not await close_ticket_channel(channel, interaction.guild, interaction.user.mention, f"Ticket closed by {interaction.user}"):
+            await interaction.followup.send("Failed to delete the channel. Please check bot permissions.", ephemeral=True)
 
-            # Send transcript to ACTION_LOG_CHANNEL
-            try:
-                await send_transcript(channel, interaction.guild)
-            except Exception:
-                pass
+async def close_ticket_channel(channel: discord.TextChannel, guild: discord.Guild, closed_by: str, reason: str) -> bool:
+    """Shared close path: transcript, log, auto-unclaim, delete. Returns False if the delete failed."""
+    # Send transcript to ACTION_LOG_CHANNEL
+    try:
+        await send_transcript(channel, guild)
+    except Exception:
+        pass
 
-            # Log close action
-            embed_log = discord.Embed(
-                title="🎫 Ticket Closed",
-                description=(f"{ORANGE}**Ticket Channel:** {channel.name}\n{ORANGE}**Closed By:** {interaction.user.mention}"),
-                color=BOT_COLOR,
-                timestamp=datetime.utcnow()
-            )
-            await log_action(interaction.guild, embed_log)
-        except Exception:
-            pass
+    try:
+        embed_log = discord.Embed(
+            title="🎫 Ticket Closed",
+            description=(f"{ORANGE}**Ticket Channel:** {channel.name}\n{ORANGE}**Closed By:** {closed_by}"),
+            color=BOT_COLOR,
+            timestamp=datetime.utcnow()
+        )
+        await log_action(guild, embed_log)
+    except Exception:
+        pass
 
+    forget_ticket(channel.id)
+    try:
+        # Auto-unclaim: set status closed and remove claimed_by
         try:
-            # Attempt to remove claimed_by/status before deletion (auto-unclaim)
-            try:
-                if channel.topic:
-                    new_topic = remove_claim_and_set_closed(channel.topic)
-                    await channel.edit(topic=new_topic)
-            except Exception:
-                pass
-
-            await channel.delete(reason=f"Ticket closed by {interaction.user}")
+            if channel.topic:
+                new_topic = remove_claim_and_set_closed(channel.topic)
+                await channel.edit(topic=new_topic)
         except Exception:
-            await interaction.followup.send("Failed to delete the channel. Please check bot permissions.", ephemeral=True)
+            pass
+
+        await channel.delete(reason=reason)
+        return True
+    except Exception:
+        return False
 
 def remove_claim_and_set_closed(topic: str) -> str:
     parts = [p.strip() for p in topic.split("|")]
@@ -698,17 +3044,19 @@ class TicketTypeSelect(ui.Select):
             discord.SelectOption(label="Support Ticket", description="General support or technical help", emoji="🎫"),
             discord.SelectOption(label="Partnership Request", description="Request a partnership", emoji="🤝")
         ]
-        super().__init__(placeholder="Select a ticket type...", min_values=1, max_values=1, options=options)
+        super().__init__(placeholder="Select a ticket type...", min_values=1, max_values=1, options=options, custom_id="hexville:panel:ticket_type")
 
+    @traced
     async def callback(self, interaction: discord.Interaction):
         global ticket_counter
+        ticket_type = self.values[0]  # read before awaiting: the select instance is shared
         await interaction.response.defer(ephemeral=True)
 
-        ticket_type = self.values[0]
         user = interaction.user
         guild = interaction.guild
 
-        category = guild.get_channel(TICKET_CATEGORY_ID)
+        cfg = get_guild_config(guild.id)
+        category = guild.get_channel(cfg["ticket_category"])
         if category is None:
             return await interaction.followup.send("Ticket category not found. Please contact an administrator.", ephemeral=True)
 
@@ -721,16 +3069,16 @@ class TicketTypeSelect(ui.Select):
         safe_username = "".join(c for c in user.name if c.isalnum() or c in ("-", "_")).lower() or f"user{user.id}"
         channel_name = f"{safe_username}-{ticket_counter}"
 
-        # Determine priority: VIP_VEHICLE_ROLE_ID (server booster) => High
-        priority = "High" if any(r.id == VIP_VEHICLE_ROLE_ID for r in user.roles) else "Normal"
+        # Determine priority: VIP vehicle role (server booster) => High
+        priority = "High" if has_role(user, cfg["vip_vehicle_role"]) else "Normal"
 
         overwrites: Dict[Union[discord.Role, discord.Member], discord.PermissionOverwrite] = {}
         overwrites[guild.default_role] = discord.PermissionOverwrite(view_channel=False, send_messages=False, read_message_history=False)
         overwrites[user] = discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
 
         # Staff roles allowed to view initially: Admin, HighCommand, Ownership, StaffTeam
-        for rid in (ADMIN_ROLE_ID, HIGHCOMMAND_ROLE_ID, OWNERSHIP_ROLE_ID, STAFF_TEAM_ROLE_ID):
-            role = guild.get_role(rid)
+        for key in ("admin_role", "highcommand_role", "ownership_role", "staff_team_role"):
+            role = guild.get_role(cfg[key])
             if role:
                 overwrites[role] = discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
 
@@ -752,14 +3100,16 @@ class TicketTypeSelect(ui.Select):
             return await interaction.followup.send(f"Failed to create ticket channel: {e}", ephemeral=True)
 
         # Ping staff (force role mentions)
-        staff_ping = f"<@&{STAFF_TEAM_ROLE_ID}> <@&{OWNERSHIP_ROLE_ID}>"
+        staff_ping = f"<@&{cfg['staff_team_role']}> <@&{cfg['ownership_role']}>"
         allowed = discord.AllowedMentions(roles=True, users=True, everyone=False, replied_user=False)
 
         try:
-            await channel.send(content=staff_ping, embed=build_ticket_embed(user, ticket_type, priority), view=TicketCloseView(), allowed_mentions=allowed)
+            await channel.send(content=staff_ping, embed=build_ticket_embed(user, ticket_type, priority), view=persistent_view("ticket_close"), allowed_mentions=allowed)
         except Exception:
             await channel.send(content=staff_ping, embed=build_ticket_embed(user, ticket_type, priority), allowed_mentions=allowed)
 
+        touch_ticket(channel.id)
+
         # Ensure topic is set (some environments may require an explicit edit)
         try:
             await channel.edit(topic=topic)
@@ -775,6 +3125,8 @@ class TicketTypeSelect(ui.Select):
             )
             await log_action(guild, embed_log)
             add_history_entry(user.id, "ticket_open", f"Opened ticket {channel.name} ({ticket_type})", user.id, extra="via panel")
+            if ticket_type == "Moderation Appeal":
+                open_appeal(user.id, channel.id)
         except Exception:
             pass
 
@@ -793,6 +3145,7 @@ class RoleEditModal(ui.Modal, title="Edit Control Role"):
         super().__init__()
         self.role_id = role_id
 
+    @traced
     async def on_submit(self, interaction: discord.Interaction):
         if not is_developer(interaction):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -821,65 +3174,128 @@ class RoleEditModal(ui.Modal, title="Edit Control Role"):
             await interaction.response.send_message("Failed to update role.", ephemeral=True)
 
 class AutomodPanelView(ui.View):
-    def __init__(self, guild_id: int):
+    # Buttons act on interaction.guild, so one registered instance serves every guild's panel
+    def __init__(self):
         super().__init__(timeout=None)
-        self.guild_id = guild_id
 
-    @ui.button(label="Toggle Enabled", style=discord.ButtonStyle.primary)
+    @ui.button(label="Toggle Enabled", style=discord.ButtonStyle.primary, custom_id="hexville:automod:toggle_enabled")
+    @traced
     async def toggle_enabled(self, interaction: discord.Interaction, button: ui.Button):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         settings = get_automod_settings(interaction.guild.id)
         settings["enabled"] = not settings["enabled"]
+        invalidate_message_plan(interaction.guild.id)
+        request_save()
         status = "enabled" if settings["enabled"] else "disabled"
         await interaction.response.send_message(f"AutoMod {status}.", ephemeral=True)
 
-    @ui.button(label="Toggle Invites", style=discord.ButtonStyle.secondary)
+    @ui.button(label="Toggle Invites", style=discord.ButtonStyle.secondary, custom_id="hexville:automod:toggle_invites")
+    @traced
     async def toggle_invites(self, interaction: discord.Interaction, button: ui.Button):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         settings = get_automod_settings(interaction.guild.id)
         settings["block_invites"] = not settings["block_invites"]
+        request_save()
         status = "on" if settings["block_invites"] else "off"
         await interaction.response.send_message(f"Invite blocking {status}.", ephemeral=True)
 
-    @ui.button(label="Toggle Links", style=discord.ButtonStyle.secondary)
+    @ui.button(label="Toggle Links", style=discord.ButtonStyle.secondary, custom_id="hexville:automod:toggle_links")
+    @traced
     async def toggle_links(self, interaction: discord.Interaction, button: ui.Button):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         settings = get_automod_settings(interaction.guild.id)
         settings["block_links"] = not settings["block_links"]
+        request_save()
         status = "on" if settings["block_links"] else "off"
         await interaction.response.send_message(f"Link blocking {status}.", ephemeral=True)
 
-    @ui.button(label="Edit Blocked Words", style=discord.ButtonStyle.primary)
+    @ui.button(label="Edit Blocked Words", style=discord.ButtonStyle.primary, custom_id="hexville:automod:edit_words")
+    @traced
     async def edit_words(self, interaction: discord.Interaction, button: ui.Button):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         await interaction.response.send_modal(AutomodWordsModal())
 
-    @ui.button(label="Edit Limits", style=discord.ButtonStyle.primary)
+    @ui.button(label="Edit Limits", style=discord.ButtonStyle.primary, custom_id="hexville:automod:edit_limits")
+    @traced
     async def edit_limits(self, interaction: discord.Interaction, button: ui.Button):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         await interaction.response.send_modal(AutomodLimitsModal())
 
+    @ui.button(label="Edit Link Domains", style=discord.ButtonStyle.primary, custom_id="hexville:automod:edit_domains")
+    @traced
+    async def edit_domains(self, interaction: discord.Interaction, button: ui.Button):
+        if not is_ownership_plus(interaction.user):
+            return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+        await interaction.response.send_modal(AutomodDomainsModal())
+
+    @ui.select(cls=ui.ChannelSelect, placeholder="Exempt channels (none selected clears the list)", min_values=0, max_values=25,
+               channel_types=[discord.ChannelType.text, discord.ChannelType.news], custom_id="hexville:automod:exempt_channels")
+    @traced
+    async def exempt_channels(self, interaction: discord.Interaction, select: ui.ChannelSelect):
+        if not is_ownership_plus(interaction.user):
+            return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+        settings = get_automod_settings(interaction.guild.id)
+        settings["exempt_channels"] = [c.id for c in select.values]
+        invalidate_message_plan(interaction.guild.id)
+        request_save()
+        names = ", ".join(c.mention for c in select.values) or "None"
+        await interaction.response.send_message(f"AutoMod exempt channels: {names}", ephemeral=True)
+
 class AutomodWordsModal(ui.Modal, title="AutoMod Blocked Words"):
     words = ui.TextInput(label="Words (comma-separated)", required=False, max_length=400, placeholder="word1, word2")
 
+    @traced
     async def on_submit(self, interaction: discord.Interaction):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         settings = get_automod_settings(interaction.guild.id)
         raw = self.words.value.strip()
         settings["block_words"] = [w.strip().lower() for w in raw.split(",") if w.strip()] if raw else []
+        request_save()
         await interaction.response.send_message("Blocked words updated.", ephemeral=True)
 
+class AutomodDomainsModal(ui.Modal, title="AutoMod Link Domains"):
+    # Add/remove rather than replace, so lists can grow past what one modal field holds
+    allow_add = ui.TextInput(label="Allow: add", style=discord.TextStyle.paragraph, required=False, placeholder="roblox.com, cdn.discordapp.com")
+    allow_remove = ui.TextInput(label="Allow: remove", style=discord.TextStyle.paragraph, required=False)
+    deny_add = ui.TextInput(label="Deny: add", style=discord.TextStyle.paragraph, required=False, placeholder="grabify.link")
+    deny_remove = ui.TextInput(label="Deny: remove", style=discord.TextStyle.paragraph, required=False)
+
+    @staticmethod
+    def _domains(raw: str) -> List[str]:
+        return [d for d in (normalize_domain(part) for part in re.split(r"[\s,]+", raw)) if d]
+
+    @staticmethod
+    def _apply(current: List[str], add: List[str], remove: List[str]) -> List[str]:
+        removed = set(remove)
+        merged = dict.fromkeys(d for d in current if d not in removed)
+        merged.update(dict.fromkeys(add))
+        return list(merged)
+
+    @traced
+    async def on_submit(self, interaction: discord.Interaction):
+        if not is_ownership_plus(interaction.user):
+            return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+        settings = get_automod_settings(interaction.guild.id)
+        settings["allow_domains"] = self._apply(settings["allow_domains"], self._domains(self.allow_add.value), self._domains(self.allow_remove.value))
+        settings["deny_domains"] = self._apply(settings["deny_domains"], self._domains(self.deny_add.value), self._domains(self.deny_remove.value))
+        _link_policies.pop(interaction.guild.id, None)
+        request_save()
+        await interaction.response.send_message(
+            f"Link domains updated: {len(settings['allow_domains'])} allowed, {len(settings['deny_domains'])} denied.", ephemeral=True
+        )
+
 class AutomodLimitsModal(ui.Modal, title="AutoMod Limits"):
     max_mentions = ui.TextInput(label="Max mentions", required=False, placeholder="5")
     max_caps_percent = ui.TextInput(label="Max caps percent", required=False, placeholder="70")
     max_caps_min = ui.TextInput(label="Min letters for caps check", required=False, placeholder="12")
 
+    @traced
     async def on_submit(self, interaction: discord.Interaction):
         if not is_ownership_plus(interaction.user):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -890,6 +3306,7 @@ class AutomodLimitsModal(ui.Modal, title="AutoMod Limits"):
             settings["max_caps_percent"] = int(self.max_caps_percent.value.strip())
         if self.max_caps_min.value.strip().isdigit():
             settings["max_caps_min"] = int(self.max_caps_min.value.strip())
+        request_save()
         await interaction.response.send_message("Limits updated.", ephemeral=True)
 
 class SupportLinkView(ui.View):
@@ -899,7 +3316,7 @@ class SupportLinkView(ui.View):
             ui.Button(
                 label="Support",
                 style=discord.ButtonStyle.link,
-                url=f"https://discord.com/channels/{guild_id}/{SUPPORT_CHANNEL_ID}"
+                url=f"https://discord.com/channels/{guild_id}/{get_guild_config(guild_id)['support_channel']}"
             )
         )
 
@@ -909,8 +3326,9 @@ class StaffInfoSelect(ui.Select):
             discord.SelectOption(label="How to host a session?", description="Coming soon"),
             discord.SelectOption(label="How to handle a ticket?", description="Coming soon")
         ]
-        super().__init__(placeholder="Select an option...", min_values=1, max_values=1, options=options)
+        super().__init__(placeholder="Select an option...", min_values=1, max_values=1, options=options, custom_id="hexville:staff_info:select")
 
+    @traced
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.send_message("Coming soon.", ephemeral=True)
 
@@ -918,30 +3336,32 @@ class ControlPanelView(ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
-    @ui.button(label="Send Staff Information Embed", style=discord.ButtonStyle.primary)
+    @ui.button(label="Send Staff Information Embed", style=discord.ButtonStyle.primary, custom_id="hexville:control:staff_info")
+    @traced
     async def send_staff_info(self, interaction: discord.Interaction, button: ui.Button):
         if not is_developer(interaction):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
-        channel = interaction.guild.get_channel(STAFF_INFO_CHANNEL_ID) if interaction.guild else None
+        channel = interaction.guild.get_channel(guild_cfg(interaction.guild)["staff_info_channel"]) if interaction.guild else None
         if not channel:
             return await interaction.response.send_message("Staff info channel not found.", ephemeral=True)
         try:
             embeds = build_staff_info_embeds()
-            await channel.send(embed=embeds[0], view=StaffInfoView())
+            await channel.send(embed=embeds[0], view=persistent_view("staff_info"))
             for embed in embeds[1:]:
                 await channel.send(embed=embed)
             await interaction.response.send_message("Staff information posted.", ephemeral=True)
         except Exception:
             await interaction.response.send_message("Failed to post staff information.", ephemeral=True)
 
-    @ui.button(label="Grant Role", style=discord.ButtonStyle.success)
+    @ui.button(label="Grant Role", style=discord.ButtonStyle.success, custom_id="hexville:control:grant_role")
+    @traced
     async def grant_role(self, interaction: discord.Interaction, button: ui.Button):
         if not is_developer(interaction):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         role = interaction.guild.get_role(CONTROL_CENTER_ROLE_ID) if interaction.guild else None
         if not role:
             return await interaction.response.send_message("Role not found.", ephemeral=True)
-        member = interaction.guild.get_member(interaction.user.id) if interaction.guild else None
+        member = interaction.user if isinstance(interaction.user, discord.Member) else None
         if not member:
             return await interaction.response.send_message("Member not found.", ephemeral=True)
         try:
@@ -950,14 +3370,15 @@ class ControlPanelView(ui.View):
         except Exception:
             await interaction.response.send_message("Failed to grant role.", ephemeral=True)
 
-    @ui.button(label="Remove Role", style=discord.ButtonStyle.danger)
+    @ui.button(label="Remove Role", style=discord.ButtonStyle.danger, custom_id="hexville:control:remove_role")
+    @traced
     async def remove_role(self, interaction: discord.Interaction, button: ui.Button):
         if not is_developer(interaction):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
         role = interaction.guild.get_role(CONTROL_CENTER_ROLE_ID) if interaction.guild else None
         if not role:
             return await interaction.response.send_message("Role not found.", ephemeral=True)
-        member = interaction.guild.get_member(interaction.user.id) if interaction.guild else None
+        member = interaction.user if isinstance(interaction.user, discord.Member) else None
         if not member:
             return await interaction.response.send_message("Member not found.", ephemeral=True)
         try:
@@ -966,7 +3387,8 @@ class ControlPanelView(ui.View):
         except Exception:
             await interaction.response.send_message("Failed to remove role.", ephemeral=True)
 
-    @ui.button(label="Edit Role Name/Color", style=discord.ButtonStyle.primary)
+    @ui.button(label="Edit Role Name/Color", style=discord.ButtonStyle.primary, custom_id="hexville:control:edit_role")
+    @traced
     async def edit_role(self, interaction: discord.Interaction, button: ui.Button):
         if not is_developer(interaction):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -975,7 +3397,8 @@ class ControlPanelView(ui.View):
             return await interaction.response.send_message("Role not found.", ephemeral=True)
         await interaction.response.send_modal(RoleEditModal(role_id=role.id))
 
-    @ui.button(label="Toggle Hoist", style=discord.ButtonStyle.secondary)
+    @ui.button(label="Toggle Hoist", style=discord.ButtonStyle.secondary, custom_id="hexville:control:toggle_hoist")
+    @traced
     async def toggle_hoist(self, interaction: discord.Interaction, button: ui.Button):
         if not is_developer(interaction):
             return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -994,18 +3417,46 @@ class StaffInfoView(ui.View):
         super().__init__(timeout=None)
         self.add_item(StaffInfoSelect())
 
+# One instance per view class, registered with bot.add_view in setup_hook. discord.py's view
+# store routes component interactions by (component type, custom_id), so old panels and close
+# buttons keep working after a restart, and sending reuses these instances instead of
+# building a view per message.
+PERSISTENT_VIEW_TYPES = {
+    "panel": PanelView,
+    "ticket_close": TicketCloseView,
+    "control_panel": ControlPanelView,
+    "staff_info": StaffInfoView,
+    "automod_panel": AutomodPanelView
+}
+persistent_views: Dict[str, ui.View] = {}
+
+def register_persistent_views():
+    for name, view_cls in PERSISTENT_VIEW_TYPES.items():
+        if name not in persistent_views:
+            persistent_views[name] = view_cls()
+            bot.add_view(persistent_views[name])
+
+def persistent_view(name: str) -> ui.View:
+    view = persistent_views.get(name)
+    if view is None:
+        register_persistent_views()
+        view = persistent_views[name]
+    return view
+
 @bot.tree.command(name="panel", description="Send the HexVille support panel")
+@traced
 async def panel(interaction: discord.Interaction):
     if not is_staff(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
     await interaction.response.defer(ephemeral=True)
     try:
-        await interaction.channel.send(embed=PANEL_EMBED, view=PanelView())
+        await interaction.channel.send(embed=get_panel_embed(), view=persistent_view("panel"))
         await interaction.followup.send("Support panel posted.", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"Failed to post panel: {e}", ephemeral=True)
 
 @bot.tree.command(name="control-panel", description="Developer-only control panel")
+@traced
 async def control_panel(interaction: discord.Interaction):
     if not is_developer(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -1019,12 +3470,13 @@ async def control_panel(interaction: discord.Interaction):
         color=BOT_COLOR
     )
     try:
-        await interaction.channel.send(embed=embed, view=ControlPanelView())
+        await interaction.channel.send(embed=embed, view=persistent_view("control_panel"))
         await interaction.followup.send("Control panel posted.", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"Failed to post control panel: {e}", ephemeral=True)
 
 @bot.tree.command(name="automodpanel", description="Configure AutoMod (Ownership+)")
+@traced
 async def automodpanel(interaction: discord.Interaction):
     if not is_ownership_plus(interaction.user):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -1034,27 +3486,146 @@ async def automodpanel(interaction: discord.Interaction):
     invite_status = "On" if settings["block_invites"] else "Off"
     link_status = "On" if settings["block_links"] else "Off"
     words = ", ".join(settings["block_words"]) or "None"
+    exempt = ", ".join(f"<#{c}>" for c in settings["exempt_channels"]) or "None"
+    allowed = ", ".join(settings["allow_domains"][:10]) or "None"
+    if len(settings["allow_domains"]) > 10:
+        allowed += f" …and {len(settings['allow_domains']) - 10} more"
+    denied = ", ".join(settings["deny_domains"][:10]) or "None"
+    if len(settings["deny_domains"]) > 10:
+        denied += f" …and {len(settings['deny_domains']) - 10} more"
     embed = discord.Embed(
         title="__**HexVille | AutoMod Panel**__",
         description=(
             f"{BLUEARROW} **Status:** {status}\n"
             f"{BLUEARROW} **Invite Blocking:** {invite_status}\n"
             f"{BLUEARROW} **Link Blocking:** {link_status}\n"
+            f"{BLUEARROW} **Allowed Domains:** {allowed}\n"
+            f"{BLUEARROW} **Denied Domains:** {denied}\n"
             f"{BLUEARROW} **Max Mentions:** {settings['max_mentions']}\n"
             f"{BLUEARROW} **Caps Limit:** {settings['max_caps_percent']}% (min {settings['max_caps_min']} letters)\n"
-            f"{BLUEARROW} **Blocked Words:** {words}"
+            f"{BLUEARROW} **Blocked Words:** {words}\n"
+            f"{BLUEARROW} **Exempt Channels:** {exempt}"
         ),
         color=BOT_COLOR
     )
     try:
-        await interaction.channel.send(embed=embed, view=AutomodPanelView(interaction.guild.id))
+        await interaction.channel.send(embed=embed, view=persistent_view("automod_panel"))
         await interaction.followup.send("AutoMod panel posted.", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"Failed to post AutoMod panel: {e}", ephemeral=True)
 
-# ================== MODERATION COMMANDS (Ownership+) ==================
-@bot.tree.command(name="ban", description="Ban a member (Ownership+)")
+mediablock_group = app_commands.Group(name="mediablock", description="AutoMod media blocklist (Ownership+)")
+
+@mediablock_group.command(name="add", description="Block a file and, for images, close copies of it (Ownership+)")
+@app_commands.describe(file="File or image to block", label="Why it is blocked")
+@traced
+async def mediablock_add(interaction: discord.Interaction, file: discord.Attachment, label: Optional[str] = None):
+    if not is_ownership_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    if file.size > MEDIA_HASH_MAX_BYTES:
+        return await interaction.followup.send(
+            f"Files over {MEDIA_HASH_MAX_BYTES // (1024 * 1024)} MB are not checked, so blocking this one would have no effect.",
+            ephemeral=True)
+    hashes = await attachment_hashes(file)
+    if hashes is None:
+        return await interaction.followup.send("Couldn't read that file.", ephemeral=True)
+    digest, phash = hashes
+    block_media(interaction.guild.id, digest, phash, label or "No label", interaction.user.id, file.filename)
+    match = "exact file and close copies" if phash is not None else "exact file only"
+    embed = discord.Embed(
+        title="🚫 Media Blocked",
+        description=(
+            f"{BLUEARROW} **File:** {file.filename}\n"
+            f"{BLUEARROW} **SHA-256:** `{digest[:16]}`\n"
+            f"{BLUEARROW} **Matches:** {match}\n"
+            f"{BLUEARROW} **Label:** {label or 'No label'}\n"
+            f"{BLUEARROW} **By:** {interaction.user.mention}"
+        ),
+        color=BOT_COLOR
+    )
+    await interaction.followup.send(embed=embed, ephemeral=True)
+    await log_action(interaction.guild, embed)
+
+@mediablock_group.command(name="remove", description="Unblock a file by its SHA-256 (Ownership+)")
+@app_commands.describe(sha256="SHA-256 shown by /mediablock list (a unique prefix is enough)")
+@traced
+async def mediablock_remove(interaction: discord.Interaction, sha256: str):
+    if not is_ownership_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    prefix = sha256.strip().lower()
+    matches = [d for d in media_blocklist.get(interaction.guild.id, {}) if d.startswith(prefix)] if prefix else []
+    if len(matches) != 1:
+        message = "No blocked file matches that hash." if not matches else "That prefix matches several files; give more of the hash."
+        return await interaction.response.send_message(message, ephemeral=True)
+    unblock_media(interaction.guild.id, matches[0])
+    await interaction.response.send_message(f"Unblocked `{matches[0][:16]}`.", ephemeral=True)
+
+@mediablock_group.command(name="list", description="List blocked files (Ownership+)")
+@traced
+async def mediablock_list(interaction: discord.Interaction):
+    if not is_ownership_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    entries = media_blocklist.get(interaction.guild.id, {})
+    lines = [
+        f"{ORANGE}`{digest[:16]}` {entry.get('filename') or 'file'} — {entry.get('label') or 'No label'}"
+        f"{'' if entry.get('phash') is not None else ' *(exact)*'}"
+        for digest, entry in list(entries.items())[:20]
+    ]
+    embed = discord.Embed(title="🚫 Blocked Media", description="\n".join(lines) or "No blocked files.", color=BOT_COLOR)
+    embed.set_footer(text=f"{len(entries)} blocked")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+bot.tree.add_command(mediablock_group)
+
+# ================== GUILD CONFIG ==================
+def format_config_value(key: str, value: int) -> str:
+    if key.endswith("_role"):
+        return f"<@&{value}>"
+    return f"<#{value}>"
+
+guild_config_key_index = PrefixIndex(GUILD_CONFIG_DEFAULTS, keep_order=True)
+
+async def guild_config_key_ac(interaction: discord.Interaction, current: str):
+    return guild_config_key_index.choices(current)
+
+@app_commands.autocomplete(key=guild_config_key_ac)
+@bot.tree.command(name="guildconfig", description="View or change this server's bot configuration (Server admins)")
+@app_commands.describe(key="Setting to change (omit to view all)", value="Channel/role ID or mention, or 'reset' for the default")
+@traced
+async def guildconfig(interaction: discord.Interaction, key: Optional[str] = None, value: Optional[str] = None):
+    guild = interaction.guild
+    if not guild:
+        return await interaction.response.send_message("Guild not found.", ephemeral=True)
+    if not (interaction.user.guild_permissions.administrator or is_developer(interaction)):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    cfg = get_guild_config(guild.id)
+    overrides = guild_config_overrides.get(guild.id, {})
+    if key is None:
+        lines = [
+            f"{BLUEARROW} **{k}:** {format_config_value(k, v)}{'' if k in overrides else ' *(default)*'}"
+            for k, v in cfg.items()
+        ]
+        embed = discord.Embed(title=f"__**{guild.name} | Configuration**__", description="\n".join(lines), color=BOT_COLOR)
+        return await interaction.response.send_message(embed=embed, ephemeral=True)
+    if key not in GUILD_CONFIG_DEFAULTS:
+        return await interaction.response.send_message("Unknown setting.", ephemeral=True)
+    if value is None:
+        return await interaction.response.send_message(f"**{key}:** {format_config_value(key, cfg[key])}", ephemeral=True)
+    if value.strip().lower() == "reset":
+        set_guild_config(guild.id, key, None)
+    else:
+        match = re.search(r"\d{15,20}", value)
+        if not match:
+            return await interaction.response.send_message("Value must be a channel/role ID or mention.", ephemeral=True)
+        set_guild_config(guild.id, key, int(match.group(0)))
+    new_value = get_guild_config(guild.id)[key]
+    await interaction.response.send_message(f"**{key}** set to {format_config_value(key, new_value)}.", ephemeral=True)
+
+# ================== MODERATION COMMANDS (Ownership+) ==================
+@bot.tree.command(name="ban", description="Ban a member (Ownership+)")
 @app_commands.describe(member="Member to ban", reason="Reason for ban", delete_message_days="Delete days of messages (0-7)")
+@traced
 async def ban(interaction: discord.Interaction, member: discord.Member, reason: Optional[str] = None, delete_message_days: int = 0):
     if not is_ownership_plus(interaction.user):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -1073,6 +3644,7 @@ async def ban(interaction: discord.Interaction, member: discord.Member, reason:
             color=BOT_COLOR,
             timestamp=datetime.utcnow()
         )
+        add_history_entry(member.id, "ban", f"Banned: {reason or 'No reason provided'}", interaction.user.id)
         await log_action(interaction.guild, embed)
         await interaction.followup.send("User banned.", ephemeral=True)
     except Exception:
@@ -1080,6 +3652,7 @@ async def ban(interaction: discord.Interaction, member: discord.Member, reason:
 
 @bot.tree.command(name="kick", description="Kick a member (Ownership+)")
 @app_commands.describe(member="Member to kick", reason="Reason for kick")
+@traced
 async def kick(interaction: discord.Interaction, member: discord.Member, reason: Optional[str] = None):
     if not is_ownership_plus(interaction.user):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -1096,6 +3669,7 @@ async def kick(interaction: discord.Interaction, member: discord.Member, reason:
             color=BOT_COLOR,
             timestamp=datetime.utcnow()
         )
+        add_history_entry(member.id, "kick", f"Kicked: {reason or 'No reason provided'}", interaction.user.id)
         await log_action(interaction.guild, embed)
         await interaction.followup.send("User kicked.", ephemeral=True)
     except Exception:
@@ -1103,6 +3677,7 @@ async def kick(interaction: discord.Interaction, member: discord.Member, reason:
 
 @bot.tree.command(name="mute", description="Timeout a member (Ownership+)")
 @app_commands.describe(member="Member to mute", minutes="Duration in minutes", reason="Reason for mute")
+@traced
 async def mute(interaction: discord.Interaction, member: discord.Member, minutes: int, reason: Optional[str] = None):
     if not is_ownership_plus(interaction.user):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -1123,6 +3698,7 @@ async def mute(interaction: discord.Interaction, member: discord.Member, minutes
             color=BOT_COLOR,
             timestamp=datetime.utcnow()
         )
+        add_history_entry(member.id, "mute", f"Muted {minutes}m: {reason or 'No reason provided'}", interaction.user.id)
         await log_action(interaction.guild, embed)
         await interaction.followup.send("User muted.", ephemeral=True)
     except Exception:
@@ -1130,6 +3706,7 @@ async def mute(interaction: discord.Interaction, member: discord.Member, minutes
 
 @bot.tree.command(name="infract", description="Issue a session warning (Staff+)")
 @app_commands.describe(user="User to infract", reason="Reason for infraction", proof="Proof (link or details)")
+@traced
 async def infract(interaction: discord.Interaction, user: discord.Member, reason: str, proof: str):
     if not is_staff(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
@@ -1139,33 +3716,19 @@ async def infract(interaction: discord.Interaction, user: discord.Member, reason
     if not guild:
         return await interaction.followup.send("Guild not found.", ephemeral=True)
 
-    role1 = guild.get_role(INFRACT_1_ROLE_ID)
-    role2 = guild.get_role(INFRACT_2_ROLE_ID)
-    role3 = guild.get_role(INFRACT_3_ROLE_ID)
-    if not role1 or not role2 or not role3:
+    infract_roles = [guild.get_role(rid) for rid in infract_role_ids(guild.id)]
+    if not all(infract_roles):
         return await interaction.followup.send("Infraction roles not found.", ephemeral=True)
 
-    user_roles = {r.id for r in user.roles}
-    target_role = None
-    level = 1
-    if INFRACT_1_ROLE_ID in user_roles and INFRACT_2_ROLE_ID not in user_roles and INFRACT_3_ROLE_ID not in user_roles:
-        target_role = role2
-        level = 2
-    elif INFRACT_2_ROLE_ID in user_roles and INFRACT_3_ROLE_ID not in user_roles:
-        target_role = role3
-        level = 3
-    elif INFRACT_3_ROLE_ID in user_roles:
-        target_role = role3
-        level = 3
-    else:
-        target_role = role1
-        level = 1
-
+    # Escalation comes from the ledger's active (non-expired) warnings, not from held roles
+    level = next_infraction_level(user.id)
+    missing = [r for r in infract_roles[:level] if r not in user.roles]
     try:
-        if target_role and target_role not in user.roles:
-            await user.add_roles(target_role, reason=f"Session warning {level}")
+        if missing:
+            await user.add_roles(*missing, reason=f"Session warning {level}")
     except Exception:
         return await interaction.followup.send("Failed to apply infraction role.", ephemeral=True)
+    entry = record_infraction(user.id, interaction.user.id, reason, proof)
 
     embed = discord.Embed(
         title=f"{BLUEARROW} Session Warning {level}",
@@ -1173,7 +3736,8 @@ async def infract(interaction: discord.Interaction, user: discord.Member, reason
             f"{BLUEARROW} **User:** {user.mention} ({user.id})\n"
             f"{BLUEARROW} **Issued By:** {interaction.user.mention}\n"
             f"{BLUEARROW} **Reason:** {reason}\n"
-            f"{BLUEARROW} **Proof:** {proof}"
+            f"{BLUEARROW} **Proof:** {proof}\n"
+            f"{BLUEARROW} **Expires:** <t:{int(entry['expires_at'])}:R>"
         ),
         color=BOT_COLOR,
         timestamp=datetime.utcnow()
@@ -1186,64 +3750,251 @@ async def infract(interaction: discord.Interaction, user: discord.Member, reason
         pass
 
     await interaction.followup.send(f"Issued Session Warning {level}.", ephemeral=True)
+
+@bot.tree.command(name="infractions", description="Show a member's session warning ledger (Staff+)")
+@app_commands.describe(user="User to inspect")
+@traced
+async def infractions(interaction: discord.Interaction, user: discord.Member):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    entries = infraction_ledger.get(user.id, [])
+    lines = []
+    for e in entries[-10:]:
+        status = f"expires <t:{int(e['expires_at'])}:R>" if e.get("active") else "expired"
+        lines.append(f"{ORANGE}**#{e['id']}** Warning {e['level']} — <t:{int(e['issued_at'])}:d> by <@{e['by']}> ({status})\n> {e['reason']}")
+    embed = discord.Embed(
+        title=f"📒 Infractions — {user.display_name}",
+        description="\n".join(lines) or "No infractions recorded.",
+        color=BOT_COLOR
+    )
+    embed.set_footer(text=f"{civilian_infractions.get(user.id, 0)} active / {infraction_total(user.id)} total")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="close", description="Close the current ticket")
+@traced
 async def close(interaction: discord.Interaction):
     channel = interaction.channel
     if not channel or not channel.topic or "ticket_owner:" not in channel.topic:
         return await interaction.response.send_message("This is not a ticket channel.", ephemeral=True)
 
     await interaction.response.send_message("Ticket will be closed in 5 seconds...", ephemeral=True)
+    await asyncio.sleep(5)
+    if not await close_ticket_channel(channel, interaction.guild, interaction.user.mention, f"Ticket closed by {interaction.user}"):
+        await interaction.followup.send("Failed to delete the ticket channel. Check bot permissions.", ephemeral=True)
 
+# ================== SCHEDULED ACTIONS ==================
+def schedule_role_lift(member: discord.Member, role_id: int, seconds: float, reason: str,
+                       restore_role_ids: Optional[List[int]] = None) -> str:
+    payload = {"guild_id": member.guild.id, "user_id": member.id, "role_id": role_id, "reason": reason}
+    if restore_role_ids:
+        payload["restore_role_ids"] = restore_role_ids
+    return scheduler.schedule_in("lift_role", seconds, payload, job_id=f"lift_role:{member.guild.id}:{member.id}:{role_id}")
+
+@scheduler.handler("lift_role")
+async def _lift_role(payload: Dict[str, Any]):
+    guild = bot.get_guild(payload["guild_id"])
+    if not guild:
+        return
+    member = await resolve_member(guild, payload["user_id"])
+    if member is None:
+        return
+    restore = [guild.get_role(rid) for rid in payload.get("restore_role_ids", [])]
+    roles = [r for r in member.roles if r.id != payload["role_id"] and not r.is_default()]
+    roles += [r for r in restore if r and r not in roles]
     try:
-        await asyncio.sleep(5)
-
-        # Send transcript to ACTION_LOG_CHANNEL
-        try:
-            await send_transcript(channel, interaction.guild)
-        except Exception:
-            pass
-
-        embed_log = discord.Embed(
-            title="🎫 Ticket Closed",
-            description=(f"{ORANGE}**Ticket Channel:** {channel.name}\n{ORANGE}**Closed By:** {interaction.user.mention}"),
-            color=BOT_COLOR,
-            timestamp=datetime.utcnow()
-        )
-        await log_action(interaction.guild, embed_log)
+        await member.edit(roles=roles, reason=payload.get("reason") or "Scheduled role expiry")
+    except Exception:
+        return
+    embed = discord.Embed(
+        title="⏱️ Role Expired",
+        description=f"{ORANGE}**User:** {member.mention} ({member.id})\n{ORANGE}**Role:** <@&{payload['role_id']}>",
+        color=BOT_COLOR,
+        timestamp=datetime.utcnow()
+    )
+    try:
+        await log_action(guild, embed)
     except Exception:
         pass
 
+@scheduler.handler("reminder")
+async def _send_reminder(payload: Dict[str, Any]):
+    channel = bot.get_channel(payload["channel_id"])
+    if not channel:
+        return
+    allowed = discord.AllowedMentions(users=True, roles=False, everyone=False)
     try:
-        # Auto-unclaim: set status closed and remove claimed_by
-        try:
-            if channel.topic:
-                new_topic = remove_claim_and_set_closed(channel.topic)
-                await channel.edit(topic=new_topic)
-        except Exception:
-            pass
-
-        await channel.delete(reason=f"Ticket closed by {interaction.user}")
+        await send_queued(channel, PRIORITY_USER_POST, content=f"<@{payload['user_id']}> ⏰ {payload['message']}", allowed_mentions=allowed)
     except Exception:
-        await interaction.followup.send("Failed to delete the ticket channel. Check bot permissions.", ephemeral=True)
+        pass
 
-# ================== HELP COMMAND (Grouped + Dynamic Permission Detection) ==================
-@bot.tree.command(name="help", description="Show all available commands and their permissions")
-async def help_command(interaction: discord.Interaction):
-    user = interaction.user
-    can_register = True  # example: civilians can register
-    can_low = has_role(user, STAFF_TEAM_ROLE_ID) or has_role(user, ADMIN_ROLE_ID) or has_role(user, HIGHCOMMAND_ROLE_ID) or has_role(user, OWNERSHIP_ROLE_ID)
-    can_high = has_role(user, HIGHCOMMAND_ROLE_ID) or has_role(user, OWNERSHIP_ROLE_ID) or has_role(user, ADMIN_ROLE_ID)
-    can_ownership = has_role(user, OWNERSHIP_ROLE_ID) or has_role(user, ADMIN_ROLE_ID)
-    can_dev = has_role(user, ADMIN_ROLE_ID)  # treat ADMIN_ROLE_ID as bot developer for this example
+@bot.tree.command(name="remind", description="Schedule a reminder ping in this channel (Staff+)")
+@app_commands.describe(minutes="Minutes from now", message="Reminder text")
+@traced
+async def remind(interaction: discord.Interaction, minutes: int, message: str):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    if minutes <= 0:
+        return await interaction.response.send_message("Minutes must be greater than 0.", ephemeral=True)
+    job_id = scheduler.schedule_in("reminder", minutes * 60, {
+        "channel_id": interaction.channel.id,
+        "user_id": interaction.user.id,
+        "message": message[:1500]
+    })
+    await interaction.response.send_message(f"Reminder set for <t:{int(scheduler.jobs[job_id]['run_at'])}:R>.", ephemeral=True)
 
-    def yn(v: bool) -> str:
-        return "Yes" if v else "No"
+@bot.tree.command(name="civsuspend", description="Temporarily suspend a civilian (Staff+)")
+@app_commands.describe(member="Member to suspend", hours="Duration in hours", reason="Reason for suspension")
+@traced
+async def civsuspend(interaction: discord.Interaction, member: discord.Member, hours: int, reason: Optional[str] = None):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    if hours <= 0:
+        return await interaction.followup.send("Hours must be greater than 0.", ephemeral=True)
+    role = interaction.guild.get_role(guild_cfg(interaction.guild)["civilian_suspension_role"])
+    if not role:
+        return await interaction.followup.send("Suspension role not found.", ephemeral=True)
+    try:
+        await member.add_roles(role, reason=reason or "Civilian suspension")
+    except Exception:
+        return await interaction.followup.send("Failed to apply suspension role.", ephemeral=True)
+    job_id = schedule_role_lift(member, role.id, hours * 3600, "Civilian suspension expired")
+    add_history_entry(member.id, "suspension", f"Civilian suspension ({hours}h)", interaction.user.id, extra=reason or "")
+    embed = discord.Embed(
+        title="⛔ Civilian Suspension",
+        description=(
+            f"{BLUEARROW} **User:** {member.mention} ({member.id})\n"
+            f"{BLUEARROW} **By:** {interaction.user.mention}\n"
+            f"{BLUEARROW} **Lifts:** <t:{int(scheduler.jobs[job_id]['run_at'])}:R>\n"
+            f"{BLUEARROW} **Reason:** {reason or 'No reason provided'}"
+        ),
+        color=BOT_COLOR,
+        timestamp=datetime.utcnow()
+    )
+    await log_action(interaction.guild, embed)
+    await interaction.followup.send("Member suspended.", ephemeral=True)
+
+# ================== STAFF DISCIPLINE ==================
+# Termination and suspension touch up to ~25 roles per member. The final role list is worked out
+# locally and applied with a single member.edit(roles=...), so each member costs one API call
+# instead of one add_roles/remove_roles per role.
+STAFF_STRIKE_KEYS = ("staff_strike_1_role", "staff_strike_2_role", "staff_strike_3_role")
+STAFF_BULK_MAX = 25  # members per /terminate or /suspend
+
+def staff_role_edit(member: discord.Member, add_ids=(), drop_ids=()) -> Tuple[List[discord.Role], List[discord.Role]]:
+    """Role list for one member.edit: staff roles and `drop_ids` removed, `add_ids` added.
+    Returns (final roles, staff roles removed)."""
+    removed = remove_all_staff_roles(member)
+    drop = STAFF_ROLE_IDS | set(drop_ids)
+    roles = [r for r in member.roles if not r.is_default() and r.id not in drop]
+    for role_id in add_ids:
+        role = member.guild.get_role(role_id)
+        if role and role not in roles:
+            roles.append(role)
+    return roles, removed
+
+def parse_member_ids(text: str) -> List[int]:
+    ids: List[int] = []
+    for match in re.findall(r"\d{15,20}", text):
+        if int(match) not in ids:
+            ids.append(int(match))
+    return ids
+
+def can_discipline(actor: discord.Member, member: discord.Member) -> bool:
+    if member.id == actor.id or member.bot:
+        return False
+    return is_ownership_plus(actor) or not is_highcommand_plus(member)
+
+async def suspend_staff(member: discord.Member, by: discord.Member, hours: int, reason: str, strike: bool):
+    cfg = member_cfg(member)
+    strikes = min(staff_strikes.get(member.id, 0) + (1 if strike else 0), len(STAFF_STRIKE_KEYS))
+    add_ids = [cfg["staff_suspension_role"]]
+    if strikes:
+        add_ids.append(cfg[STAFF_STRIKE_KEYS[strikes - 1]])
+    roles, removed = staff_role_edit(member, add_ids, [cfg[k] for k in STAFF_STRIKE_KEYS])
+    # Re-suspending must not forget the roles stripped the first time
+    job = scheduler.jobs.get(f"lift_role:{member.guild.id}:{member.id}:{cfg['staff_suspension_role']}")
+    restore = [r.id for r in removed]
+    if job:
+        restore += [rid for rid in job["payload"].get("restore_role_ids", []) if rid not in restore]
+    await member.edit(roles=roles, reason=f"Staff suspension by {by}: {reason}")
+    staff_strikes[member.id] = strikes
+    schedule_role_lift(member, cfg["staff_suspension_role"], hours * 3600, "Staff suspension expired", restore_role_ids=restore)
+    add_history_entry(member.id, "staff_suspension", f"Staff suspension ({hours}h){' + strike ' + str(strikes) if strike else ''}: {reason}", by.id)
+
+async def terminate_staff(member: discord.Member, by: discord.Member, reason: str, blacklist: bool):
+    cfg = member_cfg(member)
+    drop = [cfg["staff_suspension_role"]] + [cfg[k] for k in STAFF_STRIKE_KEYS]
+    roles, _ = staff_role_edit(member, [cfg["staff_blacklist_role"]] if blacklist else [], drop)
+    await member.edit(roles=roles, reason=f"Staff termination by {by}: {reason}")
+    scheduler.cancel(f"lift_role:{member.guild.id}:{member.id}:{cfg['staff_suspension_role']}")
+    staff_strikes.pop(member.id, None)
+    add_history_entry(member.id, "termination", f"Terminated{' and blacklisted' if blacklist else ''}: {reason}", by.id)
+
+async def discipline_members(interaction: discord.Interaction, members_text: str, action: str, apply) -> Optional[str]:
+    """Shared bulk flow: resolve targets, one role edit each in rate-limit-friendly batches, log once."""
+    guild = interaction.guild
+    ids = parse_member_ids(members_text)
+    if not ids:
+        return "Give at least one member mention or ID."
+    if len(ids) > STAFF_BULK_MAX:
+        return f"At most {STAFF_BULK_MAX} members at a time."
+    members, missing = await resolve_members(guild, ids)
+    targets = [m for m in members if can_discipline(interaction.user, m)]
+    skipped = len(members) - len(targets)
+    failed = await run_batched([functools.partial(apply, m) for m in targets])
+    if targets:
+        embed = discord.Embed(
+            title=f"⛔ Staff {action}",
+            description=(
+                f"{BLUEARROW} **Members:** {', '.join(m.mention for m in targets)}\n"
+                f"{BLUEARROW} **By:** {interaction.user.mention}"
+            ),
+            color=BOT_COLOR,
+            timestamp=datetime.utcnow()
+        )
+        await log_action(guild, embed)
+    parts = [f"{action}: {len(targets) - failed}."]
+    if failed:
+        parts.append(f"Failed: {failed}.")
+    if skipped:
+        parts.append(f"Skipped (not allowed): {skipped}.")
+    if missing:
+        parts.append(f"Not found: {len(missing)}.")
+    return " ".join(parts)
+
+@bot.tree.command(name="suspend", description="Suspend staff members (High Command+)")
+@app_commands.describe(members="Member mentions or IDs", hours="Duration in hours", reason="Reason for suspension",
+                       strike="Also issue a staff strike")
+@traced
+async def suspend(interaction: discord.Interaction, members: str, hours: int, reason: str, strike: bool = False):
+    if not interaction.guild or not is_highcommand_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    if hours <= 0:
+        return await interaction.response.send_message("Hours must be greater than 0.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    result = await discipline_members(interaction, members, "Suspended",
+                                      lambda m: suspend_staff(m, interaction.user, hours, reason, strike))
+    await interaction.followup.send(result, ephemeral=True)
+
+@bot.tree.command(name="terminate", description="Remove staff members from the team (High Command+)")
+@app_commands.describe(members="Member mentions or IDs", reason="Reason for termination", blacklist="Also blacklist from staff")
+@traced
+async def terminate(interaction: discord.Interaction, members: str, reason: str, blacklist: bool = False):
+    if not interaction.guild or not is_highcommand_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    result = await discipline_members(interaction, members, "Terminated",
+                                      lambda m: terminate_staff(m, interaction.user, reason, blacklist))
+    await interaction.followup.send(result, ephemeral=True)
 
-    embed = discord.Embed(title="__**All Command Information**__", color=BOT_COLOR)
+# ================== HELP COMMAND (Grouped + Dynamic Permission Detection) ==================
+@embed_template("help")
+def _help_embed() -> discord.Embed:
     desc_lines = []
 
     # Civilian Commands
-    desc_lines.append(f"{BLUEARROW} **/register** — Register as a civilian\n> Can Use: {yn(can_register)}")
+    desc_lines.append(f"{BLUEARROW} **/register** — Register as a civilian\n> Can Use: {{register}}")
     desc_lines.append("")
 
     # Public Commands
@@ -1251,34 +4002,59 @@ async def help_command(interaction: discord.Interaction):
     desc_lines.append("")
 
     # Staff Team (Low Command)
-    desc_lines.append(f"{BLUEARROW} **/warn** — Issue a warning to a user\n> Can Use: {yn(can_low)}")
-    desc_lines.append(f"{BLUEARROW} **/panel** — Open support panel (staff only)\n> Can Use: {yn(is_staff(interaction))}")
+    desc_lines.append(f"{BLUEARROW} **/warn** — Issue a warning to a user\n> Can Use: {{low}}")
+    desc_lines.append(f"{BLUEARROW} **/panel** — Open support panel (staff only)\n> Can Use: {{staff}}")
     desc_lines.append("")
 
     # High Command
-    desc_lines.append(f"{BLUEARROW} **/strike** — Issue a strike to a user\n> Can Use: {yn(can_high)}")
-    desc_lines.append(f"{BLUEARROW} **/claim** — Claim a support ticket\n> Can Use: {yn(can_high)}")
-    desc_lines.append(f"{BLUEARROW} **/close** — Close a ticket\n> Can Use: {yn(can_high)}")
+    desc_lines.append(f"{BLUEARROW} **/strike** — Issue a strike to a user\n> Can Use: {{high}}")
+    desc_lines.append(f"{BLUEARROW} **/claim** — Claim a support ticket\n> Can Use: {{high}}")
+    desc_lines.append(f"{BLUEARROW} **/close** — Close a ticket\n> Can Use: {{high}}")
     desc_lines.append("")
 
     # Ownership Team
-    desc_lines.append(f"{BLUEARROW} **/admin** — Administrative controls\n> Can Use: {yn(can_ownership)}")
+    desc_lines.append(f"{BLUEARROW} **/admin** — Administrative controls\n> Can Use: {{ownership}}")
     desc_lines.append("")
 
     # Developer
-    desc_lines.append(f"{BLUEARROW} **/devonly** — Developer-only commands\n> Can Use: {yn(can_dev)}")
+    desc_lines.append(f"{BLUEARROW} **/devonly** — Developer-only commands\n> Can Use: {{dev}}")
     desc_lines.append("")
 
     # Ticket & Utility
     desc_lines.append(f"{BLUEARROW} **/whois** — Show full information about a user\n> Can Use: Yes")
 
-    embed.description = "\n".join(desc_lines)
+    return discord.Embed(title="__**All Command Information**__", description="\n".join(desc_lines), color=BOT_COLOR)
+
+@bot.tree.command(name="help", description="Show all available commands and their permissions")
+@traced
+async def help_command(interaction: discord.Interaction):
+    user = interaction.user
+    cfg = member_cfg(user)
+    can_register = True  # example: civilians can register
+    can_low = is_ticket_staff(user)
+    can_high = is_highcommand_plus(user)
+    can_ownership = is_ownership_plus(user)
+    can_dev = has_role(user, cfg["admin_role"])  # treat the admin role as bot developer for this example
+
+    def yn(v: bool) -> str:
+        return "Yes" if v else "No"
+
+    embed = render_embed(
+        "help",
+        register=yn(can_register),
+        low=yn(can_low),
+        staff=yn(is_staff(interaction)),
+        high=yn(can_high),
+        ownership=yn(can_ownership),
+        dev=yn(can_dev)
+    )
     await interaction.response.send_message(embed=embed)
 
 # ================== CLAIM COMMAND ==================
 @bot.tree.command(name="claim", description="Claim the current ticket (High Command+)")
+@traced
 async def claim(interaction: discord.Interaction):
-    if not (has_role(interaction.user, HIGHCOMMAND_ROLE_ID) or has_role(interaction.user, OWNERSHIP_ROLE_ID) or has_role(interaction.user, ADMIN_ROLE_ID)):
+    if not is_highcommand_plus(interaction.user):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
 
     channel = interaction.channel
@@ -1306,7 +4082,8 @@ async def claim(interaction: discord.Interaction):
         pass
 
     guild = interaction.guild
-    allowed_role_ids = {HIGHCOMMAND_ROLE_ID, OWNERSHIP_ROLE_ID, ADMIN_ROLE_ID}
+    cfg = get_guild_config(guild.id)
+    allowed_role_ids = {cfg["highcommand_role"], cfg["ownership_role"], cfg["admin_role"]}
 
     # Build new overwrites dict from scratch
     overwrites: Dict[Union[discord.Role, discord.Member], discord.PermissionOverwrite] = {}
@@ -1320,19 +4097,19 @@ async def claim(interaction: discord.Interaction):
         owner_id = None
 
     # Allow HighCommand/Ownership/Admin roles to view+send
-    for rid in (HIGHCOMMAND_ROLE_ID, OWNERSHIP_ROLE_ID, ADMIN_ROLE_ID):
+    for rid in allowed_role_ids:
         role = guild.get_role(rid)
         if role:
             overwrites[role] = discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
 
     # Staff Team: view but not send
-    staff_role = guild.get_role(STAFF_TEAM_ROLE_ID)
+    staff_role = guild.get_role(cfg["staff_team_role"])
     if staff_role and staff_role.id not in allowed_role_ids:
         overwrites[staff_role] = discord.PermissionOverwrite(view_channel=True, send_messages=False, read_message_history=True)
 
     # Ticket owner member overwrite (deny send)
     if owner_id:
-        owner_member = guild.get_member(owner_id)
+        owner_member = await resolve_member(guild, owner_id)
         if owner_member:
             overwrites[owner_member] = discord.PermissionOverwrite(view_channel=True, send_messages=False, read_message_history=True)
 
@@ -1369,61 +4146,206 @@ async def claim(interaction: discord.Interaction):
     except:
         pass
 
+# ================== ATTACHMENT ARCHIVE ==================
+# Ticket attachments are copied here before the channel, and with it Discord's copies, is deleted.
+# Files are named by their SHA-256, so an image posted in several tickets is stored once.
+ATTACHMENT_ARCHIVE_DIR = os.getenv("ATTACHMENT_ARCHIVE_DIR", "attachments")
+ATTACHMENT_ARCHIVE_URL = os.getenv("ATTACHMENT_ARCHIVE_URL", "").rstrip("/")  # public base transcripts link to
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)))
+ATTACHMENT_CONCURRENCY = 4          # downloads in flight across all closing tickets
+ATTACHMENT_CHUNK_BYTES = 64 * 1024  # read/hash/write unit; a download never holds more than this in memory
+SHA256_HEX_RE = re.compile(r"[0-9a-f]{64}")
+# The archive is served by its own listener, so it can be published without exposing /metrics.
+ATTACHMENT_SERVER_HOST = os.getenv("ATTACHMENT_SERVER_HOST", "127.0.0.1")
+ATTACHMENT_SERVER_PORT = int(os.getenv("ATTACHMENT_SERVER_PORT", "0"))  # 0: the archive is not served
+ATTACHMENT_INLINE_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}  # everything else downloads
+attachment_slots = asyncio.Semaphore(ATTACHMENT_CONCURRENCY)
+
+def attachment_path(digest: str) -> str:
+    return os.path.join(ATTACHMENT_ARCHIVE_DIR, digest[:2], digest)
+
+def attachment_link(attachment: discord.Attachment, digest: Optional[str]) -> str:
+    if digest is None:
+        return attachment.url
+    if ATTACHMENT_ARCHIVE_URL:
+        return f"{ATTACHMENT_ARCHIVE_URL}/{digest}/{urllib.parse.quote(attachment.filename)}"
+    return f"{attachment.filename} (sha256:{digest})"
+
+async def handle_attachment(request: web.Request) -> web.StreamResponse:
+    digest, name = request.match_info["digest"], request.match_info["name"]
+    path = attachment_path(digest) if SHA256_HEX_RE.fullmatch(digest) else None
+    if path is None or not os.path.exists(path):
+        raise web.HTTPNotFound()
+    # The name comes from the URL and the bytes from a ticket member: never serve them as active content
+    content_type = mimetypes.guess_type(name)[0]
+    inline = content_type in ATTACHMENT_INLINE_TYPES
+    headers = {
+        "Content-Type": content_type if inline else "application/octet-stream",
+        "Content-Disposition": f"{'inline' if inline else 'attachment'}; filename*=UTF-8''{urllib.parse.quote(name)}",
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "default-src 'none'; sandbox"
+    }
+    return web.FileResponse(path, headers=headers)
+
+async def start_attachment_server() -> Optional[web.AppRunner]:
+    if not ATTACHMENT_SERVER_PORT:
+        return None
+    app = web.Application()
+    app.router.add_get("/attachments/{digest}/{name}", handle_attachment)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, ATTACHMENT_SERVER_HOST, ATTACHMENT_SERVER_PORT).start()
+    except OSError:
+        await runner.cleanup()
+        return None
+    return runner
+
+# Storage-thread helpers: the file, and the hash of what has been written to it, live off the loop
+def _open_attachment_tmp() -> Tuple[str, Any]:
+    tmp_dir = os.path.join(ATTACHMENT_ARCHIVE_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=tmp_dir)
+    return path, os.fdopen(fd, "wb")
+
+def _write_attachment_chunk(f, hasher, chunk: bytes):
+    hasher.update(chunk)
+    f.write(chunk)
+
+def _commit_attachment(tmp_path: str, digest: str) -> bool:
+    """Move a finished download into place; False if that content was already archived."""
+    final = attachment_path(digest)
+    if os.path.exists(final):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(final), exist_ok=True)
+    os.replace(tmp_path, final)
+    return True
+
+def _discard_attachment_tmp(f, tmp_path: str):
+    f.close()
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+async def archive_attachment(session: aiohttp.ClientSession, attachment: discord.Attachment) -> Optional[str]:
+    """Stream one attachment into the archive; returns its SHA-256, or None if it was skipped or failed."""
+    if attachment.size > ATTACHMENT_MAX_BYTES:
+        ATTACHMENTS_ARCHIVED.inc("too_large")
+        return None
+    async with attachment_slots:
+        tmp_path, f = await storage.run(_open_attachment_tmp)
+        hasher = hashlib.sha256()
+        try:
+            received = 0
+            async with session.get(attachment.url) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.content.iter_chunked(ATTACHMENT_CHUNK_BYTES):
+                    received += len(chunk)
+                    if received > ATTACHMENT_MAX_BYTES:
+                        raise ValueError("attachment is larger than its advertised size")
+                    await storage.run(_write_attachment_chunk, f, hasher, chunk)
+            await storage.run(f.close)
+            digest = hasher.hexdigest()
+            stored = await storage.run(_commit_attachment, tmp_path, digest)
+        except Exception:
+            await storage.run(_discard_attachment_tmp, f, tmp_path)
+            ATTACHMENTS_ARCHIVED.inc("failed")
+            return None
+    ATTACHMENTS_ARCHIVED.inc("stored" if stored else "duplicate")
+    return digest
+
+async def archive_attachments(attachments: List[discord.Attachment]) -> Dict[int, str]:
+    """attachment id -> SHA-256 for every attachment that made it into the archive."""
+    if not attachments:
+        return {}
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        digests = await asyncio.gather(*(archive_attachment(session, a) for a in attachments))
+    return {a.id: digest for a, digest in zip(attachments, digests) if digest}
+
 # ================== TRANSCRIPT FUNCTION ==================
+TRANSCRIPT_MAX_MESSAGES = int(os.getenv("TRANSCRIPT_MAX_MESSAGES", "20000"))  # newest kept if a ticket has more
+TRANSCRIPT_INLINE_POSTS = 5  # short transcripts are also posted as text; longer ones only as the file
+
+def transcript_record(message: discord.Message) -> Dict[str, Any]:
+    """Plain-data copy of a message for workers.render_transcript; attachment links are filled in once archived."""
+    return {
+        "timestamp": message.created_at.isoformat(timespec="seconds"),
+        "author": str(message.author),
+        "author_id": message.author.id,
+        "content": message.content or "",
+        "attachments": []
+    }
+
+async def post_transcript(log_channel: discord.TextChannel, header: discord.Embed, path: str, size: int,
+                          filename: str, chunks: List[str]):
+    try:
+        if size <= log_channel.guild.filesize_limit:
+            await send_queued(log_channel, PRIORITY_TRANSCRIPT, embed=header, file=discord.File(path, filename=filename))
+        else:
+            header.add_field(name="Transcript", value=f"{size / 1e6:.1f} MB, over this server's upload limit", inline=False)
+            await send_queued(log_channel, PRIORITY_TRANSCRIPT, embed=header)
+    except Exception:
+        pass
+    finally:
+        await discard_artifact(path)
+    for chunk in chunks:
+        post_queued(log_channel, PRIORITY_TRANSCRIPT, content=f"```{chunk}```")
+
 async def send_transcript(channel: discord.TextChannel, guild: discord.Guild):
-    msgs = []
+    # Records are taken page by page as history arrives, so no Message objects are kept around
+    records, with_files = [], []
     try:
-        async for m in channel.history(limit=500, oldest_first=True):
-            timestamp = m.created_at.isoformat(timespec="seconds")
-            author = f"{m.author} ({m.author.id})"
-            content = m.content or ""
+        async for m in channel.history(limit=TRANSCRIPT_MAX_MESSAGES):
+            records.append(transcript_record(m))
             if m.attachments:
-                att_texts = " ".join(a.url for a in m.attachments)
-                content = f"{content}\n[Attachments: {att_texts}]"
-            msgs.append(f"[{timestamp}] {author}: {content}")
+                with_files.append((records[-1], m.attachments))
     except Exception:
         pass
+    records.reverse()
 
-    transcript_text = "\n".join(msgs) or "No messages found."
+    # Archive before returning: the caller deletes the channel, and the CDN links die with it
+    archived = await archive_attachments([a for _, attachments in with_files for a in attachments])
+    for record, attachments in with_files:
+        record["attachments"] = [(a.filename, attachment_link(a, archived.get(a.id))) for a in attachments]
 
-    log_channel = guild.get_channel(ACTION_LOG_CHANNEL)
+    log_channel = guild.get_channel(get_guild_config(guild.id)["action_log_channel"])
     if not log_channel:
         return
 
+    path, size, chunks = await render_artifact(
+        "transcript", workers.render_transcript, f"Transcript — {channel.name}", await pack_records(records),
+        TRANSCRIPT_INLINE_POSTS)
     header = discord.Embed(title=f"Transcript — {channel.name}", description=f"Ticket closed at {datetime.utcnow().isoformat(timespec='seconds')}", color=BOT_COLOR, timestamp=datetime.utcnow())
-    await log_channel.send(embed=header)
-
-    max_len = 1900
-    current = ""
-    for line in transcript_text.splitlines():
-        if len(current) + len(line) + 1 > max_len:
-            await log_channel.send(f"```{current}```")
-            current = line + "\n"
-        else:
-            current += line + "\n"
-    if current:
-        await log_channel.send(f"```{current}```")
+    header.set_footer(text=f"{len(records)} messages" if records else "No messages found.")
+    # History is already read, so the ticket can be deleted while these posts drain
+    spawn(post_transcript(log_channel, header, path, size, f"transcript-{channel.name}.html", chunks))
 
 # ================== WHOIS COMMAND ==================
 @bot.tree.command(name="whois", description="Show full information about a user")
 @app_commands.describe(member="Member to inspect")
+@traced
 async def whois(interaction: discord.Interaction, member: Optional[discord.Member] = None):
     if member is None:
         member = interaction.user  # type: ignore
 
     strikes = staff_strikes.get(member.id, 0)
     civ_infractions = civilian_infractions.get(member.id, 0)
+    civ_total = infraction_total(member.id)
     notes = notes_store.get(member.id, [])
     history_entries = history_store.get(member.id, [])
     vehicles = vehicle_store.get(member.id, [])
-    unregisters = unregister_uses.get(member.id, 0)
+    unregisters = remaining_unregister_uses_for(member.id, member)
 
     roles = ", ".join(r.name for r in member.roles if r.name != "@everyone") or "None"
+    cfg = member_cfg(member)
     is_staff_flag = any(r.id in STAFF_ROLE_IDS for r in member.roles)
-    is_highcommand_flag = any(r.id == HIGHCOMMAND_ROLE_ID for r in member.roles)
-    is_ownership_flag = any(r.id == OWNERSHIP_ROLE_ID for r in member.roles)
-    is_admin_flag = any(r.id == ADMIN_ROLE_ID for r in member.roles)
-    is_booster = any(r.id == VIP_VEHICLE_ROLE_ID for r in member.roles)
+    is_highcommand_flag = has_role(member, cfg["highcommand_role"])
+    is_ownership_flag = has_role(member, cfg["ownership_role"])
+    is_admin_flag = has_role(member, cfg["admin_role"])
+    is_booster = has_role(member, cfg["vip_vehicle_role"])
 
     note_text = "None"
     if notes:
@@ -1435,7 +4357,9 @@ async def whois(interaction: discord.Interaction, member: Optional[discord.Membe
 
     vehicle_text = "None"
     if vehicles:
-        vehicle_text = "\n".join(f"{v.get('year','N/A')} {v.get('make','N/A')} {v.get('model','N/A')} — {v.get('plate','N/A')} ({v.get('state','N/A')})" for v in vehicles)
+        vehicle_text = "\n".join(f"{v.get('year','N/A')} {v.get('make','N/A')} {v.get('model','N/A')} — {v.get('plate','N/A')} ({v.get('state','N/A')})" for v in vehicles[:10])
+        if len(vehicles) > 10:
+            vehicle_text += f"\n…and {len(vehicles) - 10} more (see /vehicles browse)"
 
     embed = discord.Embed(title=f"🔎 Whois — {member.display_name}", color=BOT_COLOR, timestamp=datetime.utcnow())
     embed.add_field(name="User", value=f"{member.mention} ({member.id})", inline=False)
@@ -1446,7 +4370,7 @@ async def whois(interaction: discord.Interaction, member: Optional[discord.Membe
     embed.add_field(name="Admin/Dev?", value=str(is_admin_flag), inline=True)
     embed.add_field(name="Server Booster (High Priority)?", value=str(is_booster), inline=True)
     embed.add_field(name="Staff Strikes", value=str(strikes), inline=False)
-    embed.add_field(name="Civilian Infractions", value=str(civ_infractions), inline=False)
+    embed.add_field(name="Civilian Infractions", value=f"{civ_infractions} active / {civ_total} total", inline=False)
     embed.add_field(name="Registered Vehicles", value=vehicle_text, inline=False)
     embed.add_field(name="Unregister Uses Remaining", value=str(unregisters), inline=False)
     embed.add_field(name="Internal Notes (last 10)", value=note_text, inline=False)
@@ -1454,12 +4378,355 @@ async def whois(interaction: discord.Interaction, member: Optional[discord.Membe
 
     await interaction.response.send_message(embed=embed)
 
-# ================== SERVER AD & COMING SOON ==================
-@bot.tree.command(name="serverad", description="Post the official server advertisement (Staff only)")
-async def serverad(interaction: discord.Interaction):
+# ================== CASEFILE COMMAND ==================
+def casefile_record(user: discord.abc.User) -> Dict[str, Any]:
+    """Everything on file for a user as plain data; rows are copied so the worker gets a consistent snapshot."""
+    return {
+        "user": str(user),
+        "user_id": user.id,
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "staff_strikes": staff_strikes.get(user.id, 0),
+        "active_infractions": civilian_infractions.get(user.id, 0),
+        "infractions": [dict(e) for e in infraction_ledger.get(user.id, [])],
+        "notes": [dict(n) for n in notes_store.get(user.id, [])],
+        "history": [dict(h) for h in history_store.get(user.id, [])],
+        "appeals": [dict(a) for a in appeals_store.get(user.id, [])],
+        "vehicles": [dict(v) for v in vehicle_store.get(user.id, [])]
+    }
+
+@bot.tree.command(name="casefile", description="Show a member's casefile and attach the full record (Staff+)")
+@app_commands.describe(member="Member to look up", fmt="Format of the full record")
+@app_commands.rename(fmt="format")
+@app_commands.choices(fmt=[
+    app_commands.Choice(name="HTML", value="html"),
+    app_commands.Choice(name="JSON", value="json")
+])
+@traced
+async def casefile(interaction: discord.Interaction, member: discord.Member, fmt: Optional[app_commands.Choice[str]] = None):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    ext = fmt.value if fmt else "html"
+    path, size = await render_artifact("casefile", workers.render_casefile, ext, casefile_record(member))
+    try:
+        embed = build_casefile_embed(member)
+        if size > interaction.guild.filesize_limit:
+            embed.set_footer(text="Full record is larger than this server's upload limit.")
+            return await interaction.followup.send(embed=embed, ephemeral=True)
+        file = discord.File(path, filename=f"casefile-{member.id}.{ext}")
+        await interaction.followup.send(embed=embed, file=file, ephemeral=True)
+    finally:
+        await discard_artifact(path)
+
+# ================== APPEAL COMMANDS ==================
+def build_appeal_embed(appeal: Dict[str, Any]) -> discord.Embed:
+    lines = [
+        f"{BLUEARROW} **User:** <@{appeal['user_id']}> ({appeal['user_id']})",
+        f"{BLUEARROW} **Status:** {appeal['status'].title()}",
+        f"{BLUEARROW} **Filed:** <t:{int(appeal['created_at'])}:R>",
+        f"{BLUEARROW} **Appealed action:** {appeal.get('action') or 'No moderation action on record'}",
+    ]
+    if appeal.get("moderator"):
+        lines.append(f"{BLUEARROW} **Moderator:** <@{appeal['moderator']}> ({appeal.get('action_at')} UTC)")
+    if appeal.get("ticket_channel"):
+        lines.append(f"{BLUEARROW} **Ticket:** <#{appeal['ticket_channel']}>")
+    if appeal.get("reviewer"):
+        lines.append(f"{BLUEARROW} **Reviewer:** <@{appeal['reviewer']}>")
+    if appeal.get("note"):
+        lines.append(f"{BLUEARROW} **Note:** {appeal['note']}")
+    return discord.Embed(title=f"🛡️ Appeal #{appeal['id']}", description="\n".join(lines), color=BOT_COLOR)
+
+appeals_group = app_commands.Group(name="appeals", description="Moderation appeal queue (Staff+)")
+
+@appeals_group.command(name="next", description="Take the oldest pending appeal (Staff+)")
+@traced
+async def appeals_next(interaction: discord.Interaction):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    appeal = next_appeal(interaction.user.id)
+    if appeal is None:
+        return await interaction.response.send_message("No pending appeals.", ephemeral=True)
+    await interaction.response.send_message(embed=build_appeal_embed(appeal), ephemeral=True)
+
+@appeals_group.command(name="decide", description="Accept or deny an appeal (Staff+)")
+@app_commands.describe(appeal_id="Appeal number", outcome="Decision", note="Reason shown to the member")
+@app_commands.choices(outcome=[
+    app_commands.Choice(name="Accept", value="accepted"),
+    app_commands.Choice(name="Deny", value="denied")
+])
+@traced
+async def appeals_decide(interaction: discord.Interaction, appeal_id: int, outcome: app_commands.Choice[str], note: str):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    appeal = _appeals_by_id.get(appeal_id)
+    if appeal is None:
+        return await interaction.response.send_message("Appeal not found.", ephemeral=True)
+    if appeal["status"] not in ("pending", "reviewing"):
+        return await interaction.response.send_message(f"Appeal #{appeal_id} was already {appeal['status']}.", ephemeral=True)
+    if appeal.get("moderator") == interaction.user.id:
+        return await interaction.response.send_message("You can't decide an appeal of your own action.", ephemeral=True)
+    decide_appeal(appeal, outcome.value, interaction.user.id, note)
+    embed = build_appeal_embed(appeal)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+    guild = interaction.guild
+    if guild:
+        await log_action(guild, embed)
+        channel = guild.get_channel(appeal["ticket_channel"]) if appeal.get("ticket_channel") else None
+        if channel:
+            post_queued(channel, PRIORITY_USER_POST, embed=embed)
+        member = await resolve_member(guild, appeal["user_id"])
+        if member:
+            await safe_dm(member, discord.Embed(
+                title=f"Your appeal was {outcome.value}",
+                description=f"{BLUEARROW} **Action:** {appeal.get('action') or 'N/A'}\n{BLUEARROW} **Note:** {note}",
+                color=BOT_COLOR
+            ))
+
+@appeals_group.command(name="list", description="List appeals by status or moderator (Staff+)")
+@app_commands.describe(status="Only appeals with this status", moderator="Only appeals of this moderator's actions")
+@app_commands.choices(status=[app_commands.Choice(name=s.title(), value=s) for s in APPEAL_STATUSES])
+@traced
+async def appeals_list(interaction: discord.Interaction, status: Optional[app_commands.Choice[str]] = None,
+                       moderator: Optional[discord.Member] = None):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    appeals = appeals_matching(status.value if status else None, moderator.id if moderator else None)
+    lines = [
+        f"{ORANGE}**#{a['id']}** {a['status'].title()} — <@{a['user_id']}> · {a.get('action_type') or 'no action'} · <t:{int(a['created_at'])}:R>"
+        for a in appeals[:15]
+    ]
+    embed = discord.Embed(title="🛡️ Appeals", description="\n".join(lines) or "No appeals found.", color=BOT_COLOR)
+    embed.set_footer(text=f"{len(appeals)} matching · {len(_appeals_by_status['pending'])} pending")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+bot.tree.add_command(appeals_group)
+
+# ================== VEHICLE REGISTRY ==================
+class VehicleBrowserView(ui.View):
+    """Prev/Next over vehicle_page(); only the page on screen is rendered, each on demand."""
+
+    def __init__(self, owner_id: int, filters: Dict[str, str], member: Optional[discord.Member] = None):
+        super().__init__(timeout=300)
+        self.owner_id = owner_id
+        self.filters = filters
+        self.member = member
+        self.starts: List[Optional[VehicleKey]] = [None]  # start cursor of every page visited
+        self.next_cursor: Optional[VehicleKey] = None
+
+    def render(self) -> discord.Embed:
+        member_id = self.member.id if self.member else None
+        rows, self.next_cursor = vehicle_page(self.filters, self.starts[-1], owner_id=member_id)
+        lines = [
+            f"{DOT} **{row.get('plate', 'N/A')}** ({row.get('state', 'N/A')}) — {row.get('year', 'N/A')} "
+            f"{row.get('make', 'N/A')} {row.get('model', 'N/A')}, {row.get('color', 'N/A')} · {row.get('usage', 'N/A')} · <@{user_id}>"
+            for user_id, row in rows
+        ]
+        shown = ", ".join(f"{k}: {v}" for k, v in self.filters.items() if v)
+        if self.member:
+            shown = f"owner: {self.member.display_name}" + (f", {shown}" if shown else "")
+        embed = discord.Embed(
+            title="🚗 Vehicle Registry",
+            description="\n".join(lines) or "No vehicles match.",
+            color=BOT_COLOR
+        )
+        embed.set_footer(text=f"Page {len(self.starts)} · {vehicle_filter_count(self.filters, member_id)} matching · {shown or 'all vehicles'}")
+        self.previous_page.disabled = len(self.starts) == 1
+        self.next_page.disabled = self.next_cursor is None
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("Unauthorized.", ephemeral=True)
+            return False
+        return True
+
+    @ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    @traced
+    async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
+        if len(self.starts) > 1:
+            self.starts.pop()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @ui.button(label="Next", style=discord.ButtonStyle.primary)
+    @traced
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        if self.next_cursor is not None:
+            self.starts.append(self.next_cursor)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+async def vehicle_field_ac(field: str, current: str) -> List[app_commands.Choice[str]]:
+    return vehicle_value_index[field].choices(current)
+
+async def plate_ac(interaction: discord.Interaction, current: str):
+    return plate_index.choices(current)
+
+async def vehicle_make_ac(interaction: discord.Interaction, current: str):
+    return await vehicle_field_ac("make", current)
+
+async def vehicle_state_ac(interaction: discord.Interaction, current: str):
+    return await vehicle_field_ac("state", current)
+
+async def vehicle_usage_ac(interaction: discord.Interaction, current: str):
+    return await vehicle_field_ac("usage", current)
+
+vehicles_group = app_commands.Group(name="vehicles", description="Vehicle registry tools (Staff+)")
+
+@vehicles_group.command(name="browse", description="Browse registered vehicles (Staff+)")
+@app_commands.describe(owner="Only this member's vehicles", make="Only this make", state="Only this state", usage="Only this usage")
+@app_commands.autocomplete(make=vehicle_make_ac, state=vehicle_state_ac, usage=vehicle_usage_ac)
+@traced
+async def vehicles_browse(interaction: discord.Interaction, owner: Optional[discord.Member] = None, make: Optional[str] = None,
+                          state: Optional[str] = None, usage: Optional[str] = None):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    view = VehicleBrowserView(interaction.user.id, {"make": make or "", "state": state or "", "usage": usage or ""}, owner)
+    await interaction.response.send_message(embed=view.render(), view=view, ephemeral=True)
+
+@vehicles_group.command(name="lookup", description="Find who a plate is registered to (Staff+)")
+@app_commands.describe(plate="License plate")
+@app_commands.autocomplete(plate=plate_ac)
+@traced
+async def vehicles_lookup(interaction: discord.Interaction, plate: str):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    owner_id = plate_owner(plate.strip())
+    if owner_id is None:
+        return await interaction.response.send_message("No vehicle is registered with that plate.", ephemeral=True)
+    row = vehicle_rows[(plate.strip().lower(), owner_id)][0]
+    embed = discord.Embed(
+        title=f"🚗 {row.get('plate', 'N/A')}",
+        description=(
+            f"{BLUEARROW} **Owner:** <@{owner_id}> ({owner_id})\n"
+            f"{BLUEARROW} **Vehicle:** {row.get('year', 'N/A')} {row.get('make', 'N/A')} {row.get('model', 'N/A')} ({row.get('color', 'N/A')})\n"
+            f"{BLUEARROW} **State / Usage:** {row.get('state', 'N/A')} / {row.get('usage', 'N/A')}\n"
+            f"{BLUEARROW} **Registered:** {row.get('registered_at', 'N/A')} UTC"
+        ),
+        color=BOT_COLOR
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@vehicles_group.command(name="export", description="Export registered vehicles as CSV or JSONL (Staff+)")
+@app_commands.describe(fmt="File format", make="Only this make", state="Only this state", usage="Only this usage")
+@app_commands.rename(fmt="format")
+@app_commands.choices(fmt=[
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="JSONL", value="jsonl")
+])
+@app_commands.autocomplete(make=vehicle_make_ac, state=vehicle_state_ac, usage=vehicle_usage_ac)
+@traced
+async def vehicles_export(interaction: discord.Interaction, fmt: app_commands.Choice[str], make: Optional[str] = None,
+                          state: Optional[str] = None, usage: Optional[str] = None):
     if not is_staff(interaction):
         return await interaction.response.send_message("Unauthorized.", ephemeral=True)
     await interaction.response.defer(ephemeral=True)
+    filters = {"make": make or "", "state": state or "", "usage": usage or ""}
+    rows: List[Tuple[int, Dict[str, Any]]] = []
+    cursor: Optional[VehicleKey] = None
+    while True:
+        page, cursor = vehicle_page(filters, cursor, limit=1000)
+        rows.extend(page)
+        if cursor is None:
+            break
+        await asyncio.sleep(0)
+    columns = VEHICLE_FIELDS + ("registered_at",)
+    path, size = await render_artifact("vehicles", workers.render_vehicles, fmt.value, columns, await pack_records(rows))
+    try:
+        if size > interaction.guild.filesize_limit:
+            return await interaction.followup.send("The export is larger than this server's upload limit; narrow it with a filter.", ephemeral=True)
+        file = discord.File(path, filename=f"vehicles.{fmt.value}")
+        await interaction.followup.send(f"Exported {len(rows)} vehicles.", file=file, ephemeral=True)
+    finally:
+        await discard_artifact(path)
+
+@vehicles_group.command(name="import", description="Import vehicles from a CSV or JSONL file (Ownership+)")
+@app_commands.describe(file="CSV with a user_id,year,make,model,color,plate,state,usage header, or JSONL",
+                       dry_run="Only validate the file")
+@traced
+async def vehicles_import(interaction: discord.Interaction, file: discord.Attachment, dry_run: bool = False):
+    if not is_ownership_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    name = file.filename.lower()
+    fmt = "csv" if name.endswith(".csv") else "jsonl" if name.endswith((".jsonl", ".ndjson")) else None
+    if fmt is None:
+        return await interaction.response.send_message("File must be .csv or .jsonl.", ephemeral=True)
+    if file.size > VEHICLE_IMPORT_MAX_BYTES:
+        return await interaction.response.send_message("File is too large.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(file.url) as resp:
+                resp.raise_for_status()
+                imported, skipped, errors = await import_vehicles(resp.content, fmt, dry_run=dry_run)
+    except Exception:
+        return await interaction.followup.send("Failed to read the file.", ephemeral=True)
+    verb = "Validated" if dry_run else "Imported"
+    lines = [f"{verb} {imported} vehicles, skipped {skipped}."] + [f"{DOT} {e}" for e in errors]
+    await interaction.followup.send("\n".join(lines)[:2000], ephemeral=True)
+    if imported and not dry_run and interaction.guild:
+        embed = discord.Embed(title="🚗 Vehicle Registration Action", color=BOT_COLOR, timestamp=datetime.utcnow())
+        embed.add_field(name="User", value=f"{interaction.user.mention} ({interaction.user.id})", inline=False)
+        embed.add_field(name="Action", value=f"Bulk import ({imported} vehicles from {file.filename})", inline=False)
+        await log_vehicle_action(interaction.guild, embed)
+
+bot.tree.add_command(vehicles_group)
+
+# ================== VEHICLE REGISTRATION ==================
+async def own_plate_ac(interaction: discord.Interaction, current: str):
+    current = current.lower()
+    plates = [str(r.get("plate", "")) for r in vehicle_store.get(interaction.user.id, ())]
+    return [app_commands.Choice(name=p, value=p) for p in plates if current in p.lower()][:25]
+
+@bot.tree.command(name="registervehicle", description="Register a vehicle for sessions")
+@app_commands.describe(year="Model year", make="Manufacturer", model="Model", color="Color", plate="License plate",
+                       state="Plate state", usage="Personal, commercial, ...")
+@app_commands.autocomplete(usage=vehicle_usage_ac)
+@traced
+async def registervehicle(interaction: discord.Interaction, year: int, make: str, model: str, color: str,
+                          plate: str, state: str, usage: str):
+    member = interaction.user
+    if not interaction.guild or not isinstance(member, discord.Member):
+        return await interaction.response.send_message("Use this command in the server.", ephemeral=True)
+    vehicle, reason = validate_vehicle({"year": year, "make": make, "model": model, "color": color,
+                                        "plate": plate, "state": state, "usage": usage})
+    if vehicle is None:
+        return await interaction.response.send_message(f"Invalid vehicle: {reason}.", ephemeral=True)
+    row, reason = try_register_vehicle(member, vehicle)
+    if row is None:
+        return await interaction.response.send_message(reason, ephemeral=True)
+    # The write may queue behind other storage work, so answer the interaction before waiting on it
+    await interaction.response.defer(ephemeral=True)
+    await persist()
+    await interaction.followup.send(
+        f"Registered **{row['year']} {row['make']} {row['model']}** ({row['plate']}). "
+        f"Slots used: {vehicle_slots_used(member.id)}/{max_vehicle_slots_for(member)}.",
+        ephemeral=True
+    )
+    await db_log_vehicle_action(member, "Register", row, interaction.guild)
+
+@bot.tree.command(name="unregistervehicle", description="Unregister one of your vehicles")
+@app_commands.describe(plate="Plate of the vehicle to remove")
+@app_commands.autocomplete(plate=own_plate_ac)
+@traced
+async def unregistervehicle(interaction: discord.Interaction, plate: str):
+    member = interaction.user
+    if not interaction.guild or not isinstance(member, discord.Member):
+        return await interaction.response.send_message("Use this command in the server.", ephemeral=True)
+    row, reason = try_unregister_vehicle(member, plate.strip())
+    if row is None:
+        return await interaction.response.send_message(reason, ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    await persist()
+    remaining = remaining_unregister_uses_for(member.id, member)
+    await interaction.followup.send(
+        f"Unregistered **{row.get('plate')}**."
+        + ("" if is_vip_vehicle(member) else f" Unregister uses left: {remaining}."),
+        ephemeral=True
+    )
+    await db_log_vehicle_action(member, "Unregister", row, interaction.guild)
+
+# ================== SERVER AD & COMING SOON ==================
+@embed_template("serverad")
+def _serverad_embed() -> discord.Embed:
     embed = discord.Embed(
         title="**__HexVille Official Server Advertisement__** 🫂",
         description=(
@@ -1474,101 +4741,443 @@ async def serverad(interaction: discord.Interaction):
         ),
         color=BOT_COLOR
     )
-    embed.set_image(url="https://cdn.discordapp.com/attachments/1431352916286902285/1458956254310437096/HexVille_1.png")
-    await interaction.channel.send(embed=embed)
-    await interaction.followup.send("Server advertisement posted.", ephemeral=True)
+    return embed.set_image(url="https://cdn.discordapp.com/attachments/1431352916286902285/1458956254310437096/HexVille_1.png")
 
-@bot.tree.command(name="comingsoon", description="Show coming soon embed")
-async def comingsoon(interaction: discord.Interaction):
-    await interaction.response.defer(ephemeral=True)
+@embed_template("comingsoon")
+def _comingsoon_embed() -> discord.Embed:
     embed = discord.Embed(
         title="__**Coming Soon**__",
         description=f"<:crane:1459330223131721769>  This section is currently **__under-construction__**, please come back again later! <:crane:1459330223131721769>",
         color=BOT_COLOR
     )
-    embed.set_image(url="https://media.discordapp.net/attachments/1459323143989497918/1459423962298847388/HexVille_3.png")
-    await interaction.channel.send(embed=embed)
-    await interaction.followup.send("Shown coming soon.", ephemeral=True)
+    return embed.set_image(url="https://media.discordapp.net/attachments/1459323143989497918/1459423962298847388/HexVille_3.png")
 
-@bot.tree.command(name="prequirements", description="Show partnership requirements")
-async def prequirements(interaction: discord.Interaction):
-    await interaction.response.defer(ephemeral=True)
-    embed = discord.Embed(
+@embed_template("prequirements")
+def _prequirements_embed() -> discord.Embed:
+    return discord.Embed(
         description=(
             "<:exclamation:1459330299052949586> __**Partnership Requirements**__\n\n"
             f"{BLUEARROW}30 members minimum — **to complete a partnership.**\n"
             f"{BLUEARROW}30-100 members — **no ping**\n"
             f"{BLUEARROW}100-250 members — **here ping**\n"
             f"{BLUEARROW}250 members — **everyone ping**\n\n"
-            f"-# If you are eligble for partnerships, and you are interested, please open a ticket within the <#{SUPPORT_CHANNEL_ID}> channel!"
+            "-# If you are eligble for partnerships, and you are interested, please open a ticket within the <#{support_channel}> channel!"
         ),
         color=BOT_COLOR
     )
+
+@bot.tree.command(name="serverad", description="Post the official server advertisement (Staff only)")
+@traced
+async def serverad(interaction: discord.Interaction):
+    if not is_staff(interaction):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    await interaction.channel.send(embed=render_embed("serverad"))
+    await interaction.followup.send("Server advertisement posted.", ephemeral=True)
+
+@bot.tree.command(name="comingsoon", description="Show coming soon embed")
+@traced
+async def comingsoon(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    await interaction.channel.send(embed=render_embed("comingsoon"))
+    await interaction.followup.send("Shown coming soon.", ephemeral=True)
+
+@bot.tree.command(name="prequirements", description="Show partnership requirements")
+@traced
+async def prequirements(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    embed = render_embed("prequirements", support_channel=guild_cfg(interaction.guild)["support_channel"])
     await interaction.channel.send(embed=embed, view=SupportLinkView(interaction.guild.id))
     await interaction.followup.send("Partnership requirements posted.", ephemeral=True)
 
+# ================== RAID DETECTION ==================
+class JoinRateDetector:
+    """Per-guild sliding-window join counter. Each join costs amortized O(1)."""
+
+    def __init__(self, window: float, threshold: int, young_threshold: int):
+        self.window = window
+        self.threshold = threshold
+        self.young_threshold = young_threshold
+        self._joins: Dict[int, deque] = {}
+        self._young: Dict[int, int] = {}
+
+    def record(self, guild_id: int, now: float, member_id: int, young: bool) -> bool:
+        joins = self._joins.get(guild_id)
+        if joins is None:
+            joins = self._joins[guild_id] = deque()
+            self._young[guild_id] = 0
+        joins.append((now, member_id, young))
+        if young:
+            self._young[guild_id] += 1
+        cutoff = now - self.window
+        while joins and joins[0][0] < cutoff:
+            _, _, was_young = joins.popleft()
+            if was_young:
+                self._young[guild_id] -= 1
+        return len(joins) >= self.threshold or self._young[guild_id] >= self.young_threshold
+
+    def recent_member_ids(self, guild_id: int) -> List[int]:
+        return [member_id for _, member_id, _ in self._joins.get(guild_id, ())]
+
+    def reset(self, guild_id: int):
+        self._joins.pop(guild_id, None)
+        self._young.pop(guild_id, None)
+
+join_detector = JoinRateDetector(RAID_JOIN_WINDOW_SECONDS, RAID_JOIN_THRESHOLD, RAID_YOUNG_JOIN_THRESHOLD)
+
+def is_young_account(member: discord.Member) -> bool:
+    age = datetime.now(timezone.utc) - member.created_at
+    return age < timedelta(days=RAID_YOUNG_ACCOUNT_DAYS)
+
+def is_raid_lockdown(guild_id: int) -> bool:
+    state = raid_state.get(guild_id)
+    return bool(state and state.get("active"))
+
+def raid_snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+    """What a lift needs after a restart: the pre-lockdown overwrites and AutoMod values."""
+    return {
+        "started": state["started"].isoformat(),
+        "overwrites": dict(state["overwrites"]),
+        "automod": dict(state["automod"]),
+        "quarantined": state["quarantined"]
+    }
+
+def restore_raid_state(guild_id: int, saved: Dict[str, Any]):
+    if guild_id in raid_state:
+        return
+    raid_state[guild_id] = {
+        "active": True,
+        "started": datetime.fromisoformat(saved["started"]),
+        "overwrites": {int(c): previous for c, previous in saved["overwrites"].items()},
+        "automod": saved["automod"],
+        "pending": [],
+        "quarantined": saved.get("quarantined", 0),
+        "flush_task": None
+    }
+    get_automod_settings(guild_id).update(RAID_AUTOMOD_OVERRIDES)
+    if f"raid_lift:{guild_id}" not in scheduler.jobs:
+        extend_raid_lockdown(guild_id)
+
+def public_text_channels(guild: discord.Guild) -> List[discord.TextChannel]:
+    ticket_category = get_guild_config(guild.id)["ticket_category"]
+    return [
+        c for c in guild.text_channels
+        if c.category_id != ticket_category and c.permissions_for(guild.default_role).send_messages
+    ]
+
+async def enter_raid_lockdown(guild: discord.Guild, reason: str, by: str = "Raid detector"):
+    if is_raid_lockdown(guild.id):
+        extend_raid_lockdown(guild.id)
+        return
+    settings = get_automod_settings(guild.id)
+    state = raid_state[guild.id] = {
+        "active": True,
+        "started": datetime.utcnow(),
+        "overwrites": {},
+        "automod": {k: settings[k] for k in RAID_AUTOMOD_OVERRIDES},
+        "pending": [],
+        "quarantined": 0,
+        "flush_task": None
+    }
+    settings.update(RAID_AUTOMOD_OVERRIDES)
+    invalidate_message_plan(guild.id)
+
+    default_role = guild.default_role
+    calls = []
+    for channel in public_text_channels(guild):
+        overwrite = channel.overwrites_for(default_role)
+        state["overwrites"][channel.id] = overwrite.send_messages
+        overwrite.send_messages = False
+        calls.append(functools.partial(channel.set_permissions, default_role, overwrite=overwrite, reason=f"Raid lockdown: {reason}"))
+    failed = await run_batched(calls)
+    request_save()
+
+    recent, _ = await resolve_members(guild, join_detector.recent_member_ids(guild.id))
+    for member in recent:
+        queue_raid_quarantine(member)
+
+    extend_raid_lockdown(guild.id)
+
+    embed = discord.Embed(
+        title="🚨 Raid Lockdown Enabled",
+        description=(
+            f"{BLUEARROW} **Trigger:** {reason}\n"
+            f"{BLUEARROW} **By:** {by}\n"
+            f"{BLUEARROW} **Channels Locked:** {len(calls) - failed}/{len(calls)}\n"
+            f"{BLUEARROW} **AutoMod:** tightened until lockdown ends"
+        ),
+        color=BOT_COLOR,
+        timestamp=datetime.utcnow()
+    )
+    try:
+        await log_action(guild, embed)
+    except Exception:
+        pass
+
+async def exit_raid_lockdown(guild: discord.Guild, by: str = "Raid detector"):
+    state = raid_state.get(guild.id)
+    if not state or not state.get("active"):
+        return
+    state["active"] = False
+    scheduler.cancel(f"raid_lift:{guild.id}")
+    await _flush_raid_quarantine(guild)
+
+    settings = get_automod_settings(guild.id)
+    # Only undo what the lockdown set: a value an admin changed since then stays as they left it
+    for key, previous in state["automod"].items():
+        if settings.get(key) == RAID_AUTOMOD_OVERRIDES[key]:
+            settings[key] = previous
+    invalidate_message_plan(guild.id)
+
+    default_role = guild.default_role
+    calls = []
+    for channel_id, previous in state["overwrites"].items():
+        channel = guild.get_channel(channel_id)
+        if not channel:
+            continue
+        overwrite = channel.overwrites_for(default_role)
+        overwrite.send_messages = previous
+        calls.append(functools.partial(
+            channel.set_permissions, default_role,
+            overwrite=None if overwrite.is_empty() else overwrite,
+            reason="Raid lockdown lifted"
+        ))
+    failed = await run_batched(calls)
+    join_detector.reset(guild.id)
+    raid_state.pop(guild.id, None)
+    request_save()
+
+    embed = discord.Embed(
+        title="✅ Raid Lockdown Lifted",
+        description=(
+            f"{BLUEARROW} **By:** {by}\n"
+            f"{BLUEARROW} **Channels Restored:** {len(calls) - failed}/{len(calls)}\n"
+            f"{BLUEARROW} **Members Quarantined:** {state['quarantined']}"
+        ),
+        color=BOT_COLOR,
+        timestamp=datetime.utcnow()
+    )
+    try:
+        await log_action(guild, embed)
+    except Exception:
+        pass
+
+def extend_raid_lockdown(guild_id: int):
+    # Re-scheduling under the same id pushes the lift back; the old heap entry goes stale
+    scheduler.schedule_in("raid_lift", RAID_LOCKDOWN_MINUTES * 60, {"guild_id": guild_id}, job_id=f"raid_lift:{guild_id}")
+
+@scheduler.handler("raid_lift")
+async def _raid_auto_lift(payload: Dict[str, Any]):
+    guild = bot.get_guild(payload["guild_id"])
+    if guild and is_raid_lockdown(guild.id):
+        await exit_raid_lockdown(guild)
+
+def queue_raid_quarantine(member: discord.Member):
+    state = raid_state.get(member.guild.id)
+    if not state or not state.get("active"):
+        return
+    state["pending"].append(member)
+    task = state.get("flush_task")
+    if task is None or task.done():
+        state["flush_task"] = asyncio.create_task(_delayed_raid_flush(member.guild))
+
+async def _delayed_raid_flush(guild: discord.Guild):
+    await asyncio.sleep(RAID_QUARANTINE_FLUSH_SECONDS)
+    await _flush_raid_quarantine(guild)
+
+async def _flush_raid_quarantine(guild: discord.Guild):
+    state = raid_state.get(guild.id)
+    if not state or not state["pending"]:
+        return
+    pending, state["pending"] = state["pending"], []
+    role = guild.get_role(get_guild_config(guild.id)["quarantine_role"])
+    if not role:
+        return
+    seen = set()
+    calls = []
+    for member in pending:
+        if member.id in seen or role in member.roles:
+            continue
+        seen.add(member.id)
+        calls.append(functools.partial(member.add_roles, role, reason="Raid lockdown quarantine"))
+    failed = await run_batched(calls)
+    state["quarantined"] += len(calls) - failed
+
+@bot.tree.command(name="raidmode", description="Manage raid lockdown (Ownership+)")
+@app_commands.describe(action="Enable, disable or inspect raid lockdown")
+@app_commands.choices(action=[
+    app_commands.Choice(name="Enable", value="on"),
+    app_commands.Choice(name="Disable", value="off"),
+    app_commands.Choice(name="Status", value="status")
+])
+@traced
+async def raidmode(interaction: discord.Interaction, action: app_commands.Choice[str]):
+    if not is_ownership_plus(interaction.user):
+        return await interaction.response.send_message("Unauthorized.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    guild = interaction.guild
+    if action.value == "on":
+        await enter_raid_lockdown(guild, "Manual lockdown", by=interaction.user.mention)
+        return await interaction.followup.send("Raid lockdown enabled.", ephemeral=True)
+    if action.value == "off":
+        if not is_raid_lockdown(guild.id):
+            return await interaction.followup.send("Raid lockdown is not active.", ephemeral=True)
+        await exit_raid_lockdown(guild, by=interaction.user.mention)
+        return await interaction.followup.send("Raid lockdown lifted.", ephemeral=True)
+    state = raid_state.get(guild.id)
+    if not state or not state.get("active"):
+        return await interaction.followup.send("Raid lockdown is not active.", ephemeral=True)
+    await interaction.followup.send(
+        f"Raid lockdown active since {state['started'].isoformat(timespec='seconds')} UTC — "
+        f"{len(state['overwrites'])} channels locked, {state['quarantined']} members quarantined, "
+        f"{len(state['pending'])} pending.",
+        ephemeral=True
+    )
+
 # ================== START BOT ==================
+def command_tree_hash(guild: Optional[discord.abc.Snowflake] = None) -> str:
+    payload = []
+    for cmd in bot.tree.get_commands(guild=guild):
+        try:
+            payload.append(cmd.to_dict(bot.tree))
+        except TypeError:  # discord.py < 2.4
+            payload.append(cmd.to_dict())
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+async def sync_commands_if_changed(force: bool = False) -> bool:
+    """Sync the command tree only when it differs from what was last synced for this target."""
+    guild_obj = discord.Object(id=int(TEST_GUILD_ID)) if TEST_GUILD_ID else None
+    target = f"{bot.application_id}:{guild_obj.id if guild_obj else 'global'}"
+    digest = command_tree_hash(guild_obj)
+    stored: Dict[str, str] = {}
+    try:
+        with open(COMMAND_HASH_FILE, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except Exception:
+        stored = {}
+    if not force and stored.get(target) == digest:
+        return False
+    try:
+        await bot.tree.sync(guild=guild_obj)
+    except Exception:
+        return False
+    stored[target] = digest
+    try:
+        with open(COMMAND_HASH_FILE, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+    except Exception:
+        pass
+    return True
+
+async def on_setup():
+    """Runs once per process from setup_hook, before the gateway connects."""
+    register_persistent_views()
+    await start_metrics_server()
+    await start_attachment_server()
+    spawn(load_persistence_async())
+    spawn(sync_commands_if_changed())
+
 @bot.event
 async def on_message(message: discord.Message):
     if message.author.bot:
         return
-    if message.guild and isinstance(message.author, discord.Member):
-        settings = get_automod_settings(message.guild.id)
-        if settings["enabled"] and not is_automod_exempt(message.author):
-            content = message.content or ""
-            should_delete = False
-            reason = ""
-            if settings["block_invites"] and contains_invite(content):
-                should_delete = True
-                reason = "Invite links are not allowed."
-            elif settings["block_links"] and contains_link(content):
-                should_delete = True
-                reason = "Links are not allowed."
-            elif settings["block_words"]:
-                lowered = content.lower()
-                if any(w in lowered for w in settings["block_words"]):
-                    should_delete = True
-                    reason = "That word is not allowed."
-            elif exceeds_caps(content, settings["max_caps_percent"], settings["max_caps_min"]):
-                should_delete = True
-                reason = "Please avoid excessive caps."
-            else:
-                mention_count = len(message.mentions) + len(message.role_mentions)
-                if message.mention_everyone:
-                    mention_count += 5
-                if settings["max_mentions"] and mention_count > settings["max_mentions"]:
-                    should_delete = True
-                    reason = "Too many mentions."
-            if should_delete:
-                try:
-                    await message.delete()
-                except Exception:
-                    pass
-                try:
-                    warn = await message.channel.send(f"{message.author.mention} {reason}")
-                    await asyncio.sleep(5)
-                    await warn.delete()
-                except Exception:
-                    pass
-                return
-    if message.channel and message.channel.id == MUTE_HINT_CHANNEL_ID:
-        try:
-            await send_mute_prompt(message.channel)
-        except Exception:
-            pass
-    await bot.process_commands(message)
+    if message.guild is None:
+        if bot.all_commands:
+            await bot.process_commands(message)
+        return
+    plan = _message_plans.get(message.guild.id) or message_plan(message.guild.id)
+    flags = plan["channels"].get(message.channel.id)
+    if flags is None:
+        flags = plan["channels"][message.channel.id] = channel_dispatch_flags(plan, message.channel)
+    if flags & DISPATCH_AUTOMOD:
+        author = message.author
+        if not isinstance(author, discord.Member) or any(author.get_role(role_id) for role_id in plan["exempt_roles"]):
+            flags &= ~DISPATCH_AUTOMOD
+    if flags:
+        await handle_message(message, plan, flags)
+
+@traced
+async def handle_message(message: discord.Message, plan: Dict[str, Any], flags: int):
+    if flags & DISPATCH_TICKET:
+        touch_ticket(message.channel.id)
+    if flags & DISPATCH_AUTOMOD:
+        started = time.perf_counter()
+        reason = evaluate_automod(message, plan["settings"])
+        AUTOMOD_SECONDS.observe(time.perf_counter() - started)
+        if not reason and message.attachments and media_blocklist.get(message.guild.id):
+            if await blocked_media(message):
+                reason = "That file is not allowed."
+        if reason:
+            AUTOMOD_ACTIONS.inc(reason)
+            try:
+                await message.delete()
+            except Exception:
+                pass
+            try:
+                await message.channel.send(f"{message.author.mention} {reason}", delete_after=5)
+            except Exception:
+                pass
+            return
+    if flags & DISPATCH_MUTE_HINT:
+        note_mute_hint_message(message.channel)
+    if flags & DISPATCH_COMMANDS:
+        await bot.process_commands(message)
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command: Union[app_commands.Command, app_commands.ContextMenu]):
+    started = interaction.extras.get("started")
+    if started is not None:
+        COMMAND_SECONDS.observe(time.perf_counter() - started, command.qualified_name)
+
+@bot.event
+@traced
+async def on_member_join(member: discord.Member):
+    guild = member.guild
+    tripped = join_detector.record(guild.id, time.monotonic(), member.id, is_young_account(member))
+    if is_raid_lockdown(guild.id):
+        if tripped:
+            extend_raid_lockdown(guild.id)
+        queue_raid_quarantine(member)
+        return
+    if tripped:
+        await enter_raid_lockdown(guild, f"{RAID_JOIN_THRESHOLD}+ joins or {RAID_YOUNG_JOIN_THRESHOLD}+ young accounts within {RAID_JOIN_WINDOW_SECONDS}s")
+
+@bot.event
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    plan = _message_plans.get(after.guild.id)
+    if plan and before.category_id != after.category_id:
+        plan["channels"].clear()  # threads under the moved channel change too
+
+@bot.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    plan = _message_plans.get(channel.guild.id)
+    if plan:
+        plan["channels"].pop(channel.id, None)
+    settings = automod_settings.get(channel.guild.id)
+    if settings and channel.id in settings["exempt_channels"]:
+        settings["exempt_channels"] = [c for c in settings["exempt_channels"] if c != channel.id]
+        request_save()
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    # Only dispatched for members in the gateway cache; an LRU-only entry ages out after MEMBER_LRU_TTL
+    member_lru.discard(after.guild.id, after.id)
+
+@bot.event
+async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+    member_lru.discard(payload.guild_id, payload.user.id)
 
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} (ID: {bot.user.id})")
-    try:
-        if TEST_GUILD_ID:
-            guild_obj = discord.Object(id=int(TEST_GUILD_ID))
-            await bot.tree.sync(guild=guild_obj)
-        else:
-            await bot.tree.sync()
-    except Exception:
-        pass
+    await persistence_ready.wait()
+    if "infraction_decay" not in scheduler.jobs:
+        scheduler.schedule("infraction_decay", time.time(), job_id="infraction_decay", every=INFRACTION_DECAY_MINUTES * 60)
+    if "ticket_sweep" not in scheduler.jobs:
+        scheduler.schedule("ticket_sweep", time.time(), job_id="ticket_sweep", every=TICKET_SWEEP_MINUTES * 60)
+    for guild in bot.guilds:
+        seed_ticket_activity(guild)
+    scheduler.start()
 
 if __name__ == "__main__":
     bot.run(TOKEN)
@@ -0,0 +1,11 @@
+"""Start the bot: python run.py
+
+Worker processes are started with spawn, which re-runs the launching script in each of them
+(as __mp_main__). This script does nothing at import, so a worker loads only workers.py;
+launched as `python main.py`, every worker would import the whole bot as well.
+"""
+
+if __name__ == "__main__":
+    import main
+
+    main.bot.run(main.TOKEN)
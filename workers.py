@@ -0,0 +1,208 @@
+"""CPU-bound work run in the bot's worker processes (see WORKER PROCESSES in main.py).
+
+Everything here takes and returns plain data, and the module imports neither discord.py nor
+main.py. Spawned workers also re-run the launching script, so they stay small only when the
+bot is started from run.py; under `python main.py` each one imports the whole bot. Renderers write their artifact to
+a file in the directory they are given and return its path, so large results never travel
+back through the pool's pipe.
+"""
+import contextlib
+import csv
+import hashlib
+import html
+import io
+import json
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow, media is matched by exact SHA-256 only
+    Image = None
+
+DHASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def init_worker(nice: int):
+    """Pool initializer: run below the bot's priority, so a busy worker never delays the event loop."""
+    try:
+        os.nice(nice)
+    except (AttributeError, OSError):
+        pass
+
+
+def dhash(data: bytes) -> Optional[int]:
+    """Difference hash of an image: similar pictures (rescaled, recompressed, lightly edited)
+    land a few bits apart. None if Pillow is missing or the bytes are not a readable image."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("L", (DHASH_SIZE * 4, DHASH_SIZE * 4))  # JPEG: decode at reduced scale
+            pixels = list(img.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            bits = bits << 1 | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def media_hashes(data: bytes, is_image: bool) -> Tuple[str, Optional[int]]:
+    """(SHA-256 hex digest, perceptual hash or None) for an attachment's bytes."""
+    return hashlib.sha256(data).hexdigest(), dhash(data) if is_image else None
+
+
+# ---------- rendering ----------
+TRANSCRIPT_CHUNK_CHARS = 1900  # one code-block post in the log channel
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title><style>
+body{{font-family:system-ui,sans-serif;background:#313338;color:#dbdee1;margin:2em}}
+h1{{font-size:1.3em}} h2{{font-size:1.1em;margin-top:1.5em}}
+.msg{{padding:.25em 0;border-bottom:1px solid #3f4147}} .ts{{color:#949ba4;font-size:.8em}}
+.author{{font-weight:600;color:#f2f3f5}} .id{{color:#949ba4;font-size:.8em}}
+.content{{white-space:pre-wrap}} a{{color:#00a8fc}}
+table{{border-collapse:collapse}} td,th{{border:1px solid #4e5058;padding:.25em .5em;text-align:left;vertical-align:top}}
+</style></head><body>
+<h1>{title}</h1>
+"""
+
+
+@contextlib.contextmanager
+def _artifact(directory: str, suffix: str):
+    """(path, text file) for a new artifact; the file is removed if rendering fails."""
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=suffix)
+    try:
+        with open(fd, "w", encoding="utf-8", newline="") as f:
+            yield path, f
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def unpack(batches: Sequence[bytes]) -> Iterator[Any]:
+    """Records from main.pack_records, one pickled batch at a time."""
+    for batch in batches:
+        yield from pickle.loads(batch)
+
+
+def transcript_line(record: Dict[str, Any]) -> str:
+    content = record["content"]
+    if record["attachments"]:
+        content = f"{content}\n[Attachments: {' '.join(link for _, link in record['attachments'])}]"
+    return f"[{record['timestamp']}] {record['author']} ({record['author_id']}): {content}"
+
+
+def render_transcript(directory: str, title: str, batches: Sequence[bytes],
+                      inline_posts: int) -> Tuple[str, int, List[str]]:
+    """Write a ticket transcript (records packed by main.pack_records) as a standalone HTML page.
+    Returns (path, size, chunks), where chunks is the plain-text transcript split into code-block
+    posts if it fits in `inline_posts` of them, else empty."""
+    records = list(unpack(batches))
+    with _artifact(directory, ".html") as (path, f):
+        f.write(HTML_HEAD.format(title=html.escape(title)))
+        f.write(f"<p>{len(records)} messages</p>\n")
+        for record in records:
+            links = "".join(
+                f'<div class="att">📎 <a href="{html.escape(link)}">{html.escape(name)}</a></div>'
+                if link.startswith(("http://", "https://")) else f'<div class="att">📎 {html.escape(link)}</div>'
+                for name, link in record["attachments"]
+            )
+            f.write(
+                f'<div class="msg"><span class="ts">{record["timestamp"]}</span> '
+                f'<span class="author">{html.escape(record["author"])}</span> <span class="id">{record["author_id"]}</span>'
+                f'<div class="content">{html.escape(record["content"])}</div>{links}</div>\n'
+            )
+        f.write("</body></html>\n")
+    chunks: List[str] = []
+    current = ""
+    for record in records:
+        for line in transcript_line(record).splitlines():
+            if len(current) + len(line) + 1 > TRANSCRIPT_CHUNK_CHARS:
+                chunks.append(current)
+                if len(chunks) >= inline_posts:
+                    return path, os.path.getsize(path), []
+                current = line + "\n"
+            else:
+                current += line + "\n"
+    if current:
+        chunks.append(current)
+    return path, os.path.getsize(path), chunks if len(chunks) <= inline_posts else []
+
+
+def _html_table(rows: Sequence[Dict[str, Any]]) -> str:
+    if not rows:
+        return "<p>None</p>\n"
+    columns: Dict[str, None] = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    head = "".join(f"<th>{html.escape(str(c))}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape('' if row.get(c) is None else str(row.get(c)))}</td>" for c in columns) + "</tr>\n"
+        for row in rows
+    )
+    return f"<table><tr>{head}</tr>\n{body}</table>\n"
+
+
+def render_casefile(directory: str, fmt: str, casefile: Dict[str, Any]) -> Tuple[str, int]:
+    """Write a member's full casefile as HTML or JSON. Scalar fields become a summary table and
+    list fields (infractions, notes, history, ...) one table each."""
+    with _artifact(directory, f".{fmt}") as (path, f):
+        if fmt == "json":
+            json.dump(casefile, f, indent=2, default=str)
+        else:
+            f.write(HTML_HEAD.format(title=html.escape(f"Casefile — {casefile['user']}")))
+            summary = {k: v for k, v in casefile.items() if not isinstance(v, list)}
+            f.write(_html_table([summary]))
+            for key, value in casefile.items():
+                if isinstance(value, list):
+                    f.write(f"<h2>{html.escape(key.replace('_', ' ').title())} ({len(value)})</h2>\n")
+                    f.write(_html_table(value))
+            f.write("</body></html>\n")
+    return path, os.path.getsize(path)
+
+
+def render_vehicles(directory: str, fmt: str, columns: Sequence[str], batches: Sequence[bytes]) -> Tuple[str, int]:
+    """Write (user_id, row) pairs, packed by main.pack_records, as CSV or JSONL."""
+    with _artifact(directory, f".{fmt}") as (path, f):
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(("user_id",) + tuple(columns))
+            for user_id, row in unpack(batches):
+                writer.writerow([user_id] + [row.get(c) or "" for c in columns])
+        else:
+            for user_id, row in unpack(batches):
+                f.write(json.dumps({"user_id": user_id, **{c: row.get(c) for c in columns}}))
+                f.write("\n")
+    return path, os.path.getsize(path)
+
+
+# ---------- persistence ----------
+def load_json_parts(path: str, batch: int) -> Optional[List[Tuple[str, str, bytes]]]:
+    """Parse a JSON object file and hand it back as (key, kind, pickled part) tuples, kind being
+    "dict", "list" or "value": each dict or list at the top level is split into parts of `batch`
+    items, so the caller can unpickle it a part at a time. None if the file is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    parts = []
+    for key, value in data.items():
+        if isinstance(value, (dict, list)):
+            kind = "dict" if isinstance(value, dict) else "list"
+            items = list(value.items()) if kind == "dict" else value
+            for start in range(0, max(len(items), 1), batch):
+                part = items[start:start + batch]
+                parts.append((key, kind, pickle.dumps(dict(part) if kind == "dict" else part, protocol=pickle.HIGHEST_PROTOCOL)))
+        else:
+            parts.append((key, "value", pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+    return parts